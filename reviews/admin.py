@@ -7,9 +7,8 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'price', 'created_at']
     
     
-# List of offensive words to filter
-"""BANNED_WORDS = BannedWord.objects.all()
-"""
+# Offensive reviews are flagged when saved (contains_banned_words), so the
+# filter is a plain indexed column lookup instead of scanning every banned word.
 class OffensiveContentFilter(admin.SimpleListFilter):
     title = 'offensive content'
     parameter_name = 'offensive'
@@ -22,15 +21,9 @@ class OffensiveContentFilter(admin.SimpleListFilter):
     
     def queryset(self, request, queryset):
         if self.value() == 'yes':
-            offensive_filter = Q()
-            for word in BANNED_WORDS:
-                offensive_filter |= Q(review_text__icontains=word)
-            return queryset.filter(offensive_filter)
+            return queryset.filter(contains_banned_words=True)
         elif self.value() == 'no':
-            offensive_filter = Q()
-            for word in BANNED_WORDS:
-                offensive_filter |= Q(review_text__icontains=word)
-            return queryset.exclude(offensive_filter)
+            return queryset.filter(contains_banned_words=False)
         return queryset
     
 class ReviewCommentInline(admin.TabularInline):
@@ -51,6 +44,7 @@ class ReviewAdmin(admin.ModelAdmin):
                     'likes_count_display']
     list_filter = ['visible', 'rating', 'sentiment', 'created_at', OffensiveContentFilter]
     list_editable = ('visible',)
+    list_select_related = ('product', 'user')
     search_fields = ['review_text', 'user__username', 'product__name', 'banned_words_found']
     inlines = [ReviewCommentInline]
     readonly_fields = ('sentiment', 'likes_count_display', 'created_at','sentiment_score', 'contains_banned_words', 'banned_words_found')
@@ -67,39 +61,40 @@ class ReviewAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-    
-    # Custom method to display likes count in admin
+
+    # Custom method to display likes count in admin (stored counter, no COUNT per row)
     def likes_count_display(self, obj):
-        return obj.likes_count()
+        return obj.helpful_count
     likes_count_display.short_description = 'Likes Count'
+    likes_count_display.admin_order_field = 'helpful_count'
 
-    # Custom method to check for offensive content
+    # Custom method to check for offensive content (precomputed on save)
     def has_offensive_content(self, obj):
-        banned_words = BannedWord.objects.values_list('word', flat=True)
-        return any(word.lower() in obj.review_text.lower() for word in banned_words)
+        return obj.contains_banned_words
 
     has_offensive_content.boolean = True
     has_offensive_content.short_description = 'Offensive?'
-    
-        # Add insights to the change list view
-def changelist_view(self, request, extra_context=None):
-    extra_context = extra_context or {}
-    
-    qs = self.get_queryset(request)
-    
-    banned_words = BannedWord.objects.values_list('word', flat=True)
-    offensive_filter = Q()
-    for word in banned_words:
-        offensive_filter |= Q(review_text__icontains=word)
-    extra_context['offensive_count'] = qs.filter(offensive_filter).count()
-    
-    extra_context['hidden_count'] = qs.filter(visible=False).count()
-    extra_context['low_rating_count'] = qs.filter(rating__in=[1, 2]).count()
-    
-    sentiment_stats = qs.values('sentiment').annotate(count=Count('sentiment'))
-    extra_context['sentiment_stats'] = {stat['sentiment']: stat['count'] for stat in sentiment_stats}
+    has_offensive_content.admin_order_field = 'contains_banned_words'
+
+    # Add insights to the change list view
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context.update(review_insights(Review.objects.all()))
+        return super().changelist_view(request, extra_context=extra_context)
 
-    return super().changelist_view(request, extra_context=extra_context)
+
+def review_insights(queryset):
+    """Offensive/hidden/low-rating counts and the sentiment mix, in one aggregate query."""
+    sentiments = ['Positive', 'Neutral', 'Negative']
+    totals = queryset.aggregate(
+        offensive_count=Count('pk', filter=Q(contains_banned_words=True)),
+        hidden_count=Count('pk', filter=Q(visible=False)),
+        low_rating_count=Count('pk', filter=Q(rating__in=[1, 2])),
+        **{sentiment: Count('pk', filter=Q(sentiment=sentiment)) for sentiment in sentiments}
+    )
+    counts = {sentiment: totals.pop(sentiment) for sentiment in sentiments}
+    totals['sentiment_stats'] = {sentiment: count for sentiment, count in counts.items() if count}
+    return totals
 
     
 @admin.register(ReviewComment)
@@ -0,0 +1,191 @@
+"""
+Bulk re-analysis of existing reviews.
+
+Every review stores the ``analyzer_version`` that produced its sentiment and
+banned-word fields.  Bump ``ANALYZER_VERSION`` whenever the analysis rules
+change (sentiment thresholds, matching semantics...) and run
+``python manage.py reanalyze_reviews``: it streams stale reviews in primary-key
+chunks, analyzes them across a process pool and writes the results back with
+``bulk_update``.  Finished rows carry the new version, so an interrupted run
+simply picks up where it stopped.
+
+Adding banned words does not need a full run: ``--new-words`` scans only for
+the new words and merges them into the existing results.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import os
+
+from django.db import connections, transaction
+
+from .daily_stats import record_sentiments
+from .moderation import BannedWordMatcher, max_severity, store_banned_word_matches
+from .sentiment import score_texts
+
+ANALYZER_VERSION = 1
+
+FULL_ANALYSIS_FIELDS = [
+    'sentiment', 'sentiment_score', 'sentiment_pending',
+    'contains_banned_words', 'banned_words_found', 'max_severity', 'analyzer_version',
+]
+
+_worker_matcher = None
+
+
+def _init_worker(banned_rows):
+    global _worker_matcher
+    _worker_matcher = BannedWordMatcher.from_rows(banned_rows)
+
+
+def analyze_rows(rows):
+    """
+    Analyze ``(pk, review_text)`` pairs.  Runs inside pool workers, so it must
+    not touch the database.
+    """
+    scores = score_texts([text for _, text in rows])
+    return [
+        (pk, label, polarity, _worker_matcher.find_matches(text))
+        for (pk, text), (label, polarity) in zip(rows, scores)
+    ]
+
+
+def iter_chunks(queryset, chunk_size):
+    """Stream ``(pk, review_text)`` chunks using keyset pagination on pk."""
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'review_text')[:chunk_size]
+        )
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def _write_full_results(rows, results):
+    """
+    Write the analysis of ``rows`` (``(pk, review_text)`` as read) back.  A
+    review edited while its chunk was analyzed keeps its new text and stays
+    stale, so the next run analyzes it again.  Returns the number written.
+    """
+    from .models import Review
+
+    analyzed = dict(rows)
+    with transaction.atomic():
+        # نعيد قراءة النص داخل المعاملة ونكتب فقط ما لم يتغير نصه منذ التحليل
+        current = Review.objects.select_for_update().filter(pk__in=list(analyzed)).values_list('pk', 'review_text')
+        unchanged = {pk for pk, text in current if analyzed[pk] == text}
+        results = [result for result in results if result[0] in unchanged]
+        _write_analysis(results)
+    return len(results)
+
+
+def _write_analysis(results):
+    from .models import Review
+
+    reviews = []
+    for pk, label, polarity, matches in results:
+        found = [match.word for match in matches]
+        reviews.append(Review(
+            pk=pk,
+            sentiment=label,
+            sentiment_score=polarity,
+            sentiment_pending=False,
+            contains_banned_words=bool(found),
+            banned_words_found=', '.join(found) if found else None,
+            max_severity=max_severity(matches),
+            analyzer_version=ANALYZER_VERSION,
+        ))
+    record_sentiments({review.pk: review.sentiment for review in reviews})
+    Review.objects.bulk_update(reviews, FULL_ANALYSIS_FIELDS)
+    store_banned_word_matches({pk: matches for pk, _, _, matches in results})
+
+
+def reanalyze_stale_reviews(chunk_size=1000, workers=None, progress=None):
+    """
+    Re-analyze every review whose ``analyzer_version`` is older than
+    ``ANALYZER_VERSION``.  ``workers=0`` runs in the current process.
+    Returns the number of reviews updated.
+    """
+    from .models import BannedWord, Review
+
+    banned_rows = list(BannedWord.objects.order_by('pk').values_list('pk', 'word', 'severity'))
+    stale = Review.objects.filter(analyzer_version__lt=ANALYZER_VERSION)
+    total = 0
+
+    if workers == 0:
+        _init_worker(banned_rows)
+        for rows in iter_chunks(stale, chunk_size):
+            total += _write_full_results(rows, analyze_rows(rows))
+            if progress:
+                progress(total)
+        return total
+
+    # Forked workers must not inherit open database connections.
+    workers = workers or os.cpu_count() or 1
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(banned_rows,)) as pool:
+        in_flight = deque()
+        max_in_flight = workers * 2
+        for rows in iter_chunks(stale, chunk_size):
+            in_flight.append((rows, pool.submit(analyze_rows, rows)))
+            # Keep a bounded number of chunks in flight so memory stays flat.
+            while len(in_flight) >= max_in_flight:
+                rows, future = in_flight.popleft()
+                total += _write_full_results(rows, future.result())
+                if progress:
+                    progress(total)
+        while in_flight:
+            rows, future = in_flight.popleft()
+            total += _write_full_results(rows, future.result())
+            if progress:
+                progress(total)
+    return total
+
+
+def scan_for_new_words(words, chunk_size=1000, progress=None):
+    """
+    Incremental mode: look only for ``words`` (typically just added) and merge
+    any hits into ``banned_words_found``, the match table and ``max_severity``.
+    Sentiment and ``analyzer_version`` are left alone.  Returns the number of
+    reviews that gained a match.
+    """
+    from .models import BannedWord, Review
+
+    known = {
+        word.lower(): (pk, severity)
+        for pk, word, severity in BannedWord.objects.values_list('pk', 'word', 'severity')
+    }
+    words = list(words)
+    matcher = BannedWordMatcher(
+        words,
+        [known.get(word.lower(), (None, None))[0] for word in words],
+        [known.get(word.lower(), (None, None))[1] for word in words],
+    )
+    if not len(matcher):
+        return 0
+
+    scanned = updated = 0
+    for rows in iter_chunks(Review.objects.all(), chunk_size):
+        hits = {pk: matches for pk, text in rows if (matches := matcher.find_matches(text))}
+        scanned += len(rows)
+        if hits:
+            changed = []
+            reviews = Review.objects.filter(pk__in=hits).only('pk', 'banned_words_found', 'max_severity')
+            for review in reviews:
+                existing = review.banned_words_found.split(', ') if review.banned_words_found else []
+                added = [match for match in hits[review.pk] if match.word not in existing]
+                if added:
+                    review.banned_words_found = ', '.join(existing + [match.word for match in added])
+                    review.contains_banned_words = True
+                    review.max_severity = max(review.max_severity, max_severity(added))
+                    changed.append(review)
+            Review.objects.bulk_update(changed, ['banned_words_found', 'contains_banned_words', 'max_severity'])
+            store_banned_word_matches(hits, replace=False)
+            updated += len(changed)
+        if progress:
+            progress(scanned)
+    return updated
@@ -0,0 +1,71 @@
+"""
+Columnar review listings (``?format=columnar``).
+
+Instead of a list of objects that repeats every key on every row, the page is
+sent as one array per field::
+
+    {"count": 2, "fields": ["id", "user", ...],
+     "columns": {"id": [7, 6], "user": [0, 1], ...},
+     "dictionaries": {"user": ["sara", "laith"], ...}}
+
+Fields with few distinct values (usernames, sentiment labels) are
+dictionary-encoded: their column holds indexes into ``dictionaries[field]``
+(``null`` stays ``null``).  Rows are read with ``values_list()``, so no model
+instances or serializers are involved.  The per-viewer fields of
+``ReviewSerializer`` (``has_report``, ``user_interacted``, ``user_voted``)
+are not available in this format; ``?fields=`` / ``?omit=`` apply as usual.
+"""
+from .serializers import sparse_field_names
+from .view_counter import view_buffer
+
+# Output field -> column read with values_list().
+COLUMNAR_FIELDS = {
+    'id': 'id',
+    'product': 'product_id',
+    'user': 'user__username',
+    'rating': 'rating',
+    'review_text': 'review_text',
+    'created_at': 'created_at',
+    'visible': 'visible',
+    'likes': 'helpful_count',
+    'dislikes': 'unhelpful_count',
+    'views': 'views',
+    'comments_count': 'comments_count',
+    'sentiment': 'sentiment',
+}
+DICTIONARY_FIELDS = ('user', 'sentiment')
+
+
+def columnar_fields(request):
+    requested = sparse_field_names(request, COLUMNAR_FIELDS)
+    return [name for name in COLUMNAR_FIELDS if name in requested]
+
+
+def columnar_queryset(queryset, fields, ordering):
+    """``values_list`` of the columns for ``fields`` plus those the keyset ``ordering`` needs (as named rows)."""
+    columns = [COLUMNAR_FIELDS[name] for name in fields]
+    columns += [name.lstrip('-') for name in ordering if name.lstrip('-') not in columns]
+    return queryset.values_list(*columns, named=True)
+
+
+def to_columnar(rows, fields):
+    columns = {}
+    dictionaries = {}
+    for name in fields:
+        values = [getattr(row, COLUMNAR_FIELDS[name]) for row in rows]
+        if name == 'views':
+            values = [value + view_buffer.pending(row.id) for value, row in zip(values, rows)]
+        if name in DICTIONARY_FIELDS:
+            index = {}
+            values = [None if value is None else index.setdefault(value, len(index)) for value in values]
+            dictionaries[name] = list(index)
+        columns[name] = values
+    return {'count': len(rows), 'fields': fields, 'columns': columns, 'dictionaries': dictionaries}
+
+
+def columnar_response(request, queryset, paginator, view):
+    """One keyset page of ``queryset`` in columnar form (cursor headers as for the row format)."""
+    fields = columnar_fields(request)
+    ordering = paginator.get_ordering(view)
+    rows = paginator.paginate_queryset(columnar_queryset(queryset, fields, ordering), request, view=view)
+    return paginator.get_paginated_response(to_columnar(rows, fields))
@@ -0,0 +1,147 @@
+"""
+Denormalized engagement counters on ``Review``.
+
+``helpful_count`` / ``unhelpful_count`` (likes / dislikes from the
+``ReviewInteraction`` vote store), ``interaction_count`` (all votes),
+``comments_count`` and ``reports_count`` are stored on the review so lists
+and sorts read plain, indexable columns instead of counting related rows.
+They are kept up to date by the signal handlers in ``signals.py`` (and
+``votes.py``), each change being a single ``UPDATE ... SET x = x + 1`` so
+concurrent writers never lose increments.  Anything that bypasses signals
+(raw SQL, ``QuerySet.update()``) can make them drift; ``reconcile_counters``
+recomputes them.
+
+``helpfulness_score`` is the lower bound of the 95% Wilson score interval of
+the helpful ratio: a review with 1 helpful vote out of 1 (0.21) ranks above
+one with 3 out of 10 (0.11), and many votes are needed to reach the top.  It
+is rewritten in the same ``UPDATE`` as the vote counters, from their new
+values, so the "helpful" sort is a plain index scan.
+"""
+from math import isclose, sqrt
+
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Greatest, Sqrt
+from django.db.models.lookups import GreaterThan
+
+from .leaderboard import rebuild_boards, review_changed
+from .versions import bump_review_products
+
+COUNTER_FIELDS = ['helpful_count', 'unhelpful_count', 'comments_count', 'reports_count', 'interaction_count']
+WILSON_Z = 1.96  # 95%
+
+
+def wilson_lower_bound(helpful, unhelpful, z=WILSON_Z):
+    total = helpful + unhelpful
+    if total <= 0:
+        return 0.0
+    # (p + z²/2n - z·√(p(1-p)/n + z²/4n²)) / (1 + z²/n) مضروبة بسطًا ومقامًا في n
+    return (helpful + z * z / 2 - z * sqrt(helpful * unhelpful / total + z * z / 4)) / (total + z * z)
+
+
+def wilson_expression(helpful, unhelpful, z=WILSON_Z):
+    """``wilson_lower_bound`` as an SQL expression of two (integer) expressions."""
+    helpful = Cast(helpful, FloatField())
+    unhelpful = Cast(unhelpful, FloatField())
+    total = helpful + unhelpful
+    score = (helpful + Value(z * z / 2) - Value(z) * Sqrt(helpful * unhelpful / total + Value(z * z / 4))) \
+        / (total + Value(z * z))
+    return Case(When(GreaterThan(total, 0), then=score), default=Value(0.0), output_field=FloatField())
+
+
+def adjust_counters(review_id, **deltas):
+    """
+    Atomically add ``deltas`` (e.g. ``helpful_count=1``) to one review's
+    counters; a change of the vote counters also rewrites ``helpfulness_score``.
+    """
+    from .models import Review
+
+    changes = {}
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        expression = F(field) + delta
+        # لا نسمح للعداد بالنزول تحت الصفر حتى لو كان منحرفًا أصلًا
+        changes[field] = Greatest(expression, Value(0)) if delta < 0 else expression
+    if 'helpful_count' in changes or 'unhelpful_count' in changes:
+        # في UPDATE تُقرأ الأعمدة بقيمها القديمة، لذلك نبني الدرجة من القيم الجديدة نفسها
+        changes['helpfulness_score'] = wilson_expression(
+            changes.get('helpful_count', F('helpful_count')),
+            changes.get('unhelpful_count', F('unhelpful_count')),
+        )
+    if changes:
+        Review.objects.filter(pk=review_id).update(**changes)
+    if 'helpful_count' in changes:
+        review_changed(review_id)
+
+
+def helpful_deltas(helpful, sign=1):
+    field = 'helpful_count' if helpful else 'unhelpful_count'
+    return {field: sign}
+
+
+def count_engagement(review_ids):
+    """Recount every counter for ``review_ids`` from the related tables: ``{pk: {field: n}}``."""
+    from .models import ReviewComment, ReviewInteraction, ReviewReport
+
+    counts = {pk: dict.fromkeys(COUNTER_FIELDS, 0) for pk in review_ids}
+    if not counts:
+        return counts
+
+    for review_id, likes, dislikes in (
+        ReviewInteraction.objects.filter(review_id__in=review_ids).values('review_id')
+        .annotate(likes=Count('id', filter=Q(helpful=True)), dislikes=Count('id', filter=Q(helpful=False)))
+        .values_list('review_id', 'likes', 'dislikes')
+    ):
+        counts[review_id]['helpful_count'] = likes
+        counts[review_id]['unhelpful_count'] = dislikes
+        counts[review_id]['interaction_count'] = likes + dislikes
+
+    for model, field in ((ReviewComment, 'comments_count'), (ReviewReport, 'reports_count')):
+        for review_id, total in (
+            model.objects.filter(review_id__in=review_ids).values('review_id')
+            .annotate(total=Count('id')).values_list('review_id', 'total')
+        ):
+            counts[review_id][field] = total
+    return counts
+
+
+def reconcile_counters(chunk_size=1000, fix=True, progress=None):
+    """
+    Recompute the counters of every review in primary-key chunks and return
+    ``[(review_id, field, stored, actual), ...]`` for each drifted value.
+    With ``fix`` the drifted reviews are corrected with ``bulk_update``.
+    """
+    from .models import Review
+
+    drift = []
+    scanned = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            Review.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', *COUNTER_FIELDS, 'helpfulness_score')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        actual = count_engagement([row[0] for row in rows])
+
+        changed = []
+        for pk, *stored in rows:
+            expected = actual[pk]
+            expected['helpfulness_score'] = wilson_lower_bound(expected['helpful_count'], expected['unhelpful_count'])
+            wrong = [(field, value) for field, value in zip([*COUNTER_FIELDS, 'helpfulness_score'], stored)
+                     if not isclose(value, expected[field], abs_tol=1e-9)]
+            if wrong:
+                drift.extend((pk, field, value, expected[field]) for field, value in wrong)
+                changed.append(Review(pk=pk, **expected))
+        if fix and changed:
+            Review.objects.bulk_update(changed, [*COUNTER_FIELDS, 'helpfulness_score'])
+            bump_review_products([review.pk for review in changed])
+            rebuild_boards(set(Review.objects.filter(pk__in=[review.pk for review in changed])
+                               .values_list('product_id', flat=True)))
+
+        scanned += len(rows)
+        if progress:
+            progress(scanned)
+    return drift
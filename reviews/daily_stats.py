@@ -0,0 +1,188 @@
+"""
+Per-product daily review statistics.
+
+``ReviewDailyStats`` holds, for every product and UTC day, the number of
+visible reviews written that day, the sum of their ratings and how many were
+labelled positive / neutral / negative, so "last N days" analytics sum at
+most N rows of the ``(product, date)`` unique index instead of scanning
+``Review``.  Rows are adjusted with ``F()`` deltas in the same transaction as
+the review change, like ``ProductRatingStats`` (``rating_stats.py``):
+
+* ``Review.save()`` – create, edit of rating/product/visibility, sentiment
+  scored inline;
+* the ``post_delete`` signal – deletes, including cascades;
+* ``bulk_set_visibility`` – the bulk visibility ``UPDATE``;
+* ``record_sentiments`` – the sentiment ``bulk_update`` of the queue worker
+  and of ``reanalyze_reviews``.
+
+``rebuild_daily_stats`` (``python manage.py rebuild_daily_stats``) recomputes
+every row from scratch for backfill and repair (e.g. after ``created_at``
+was changed with ``QuerySet.update()``).
+"""
+from collections import Counter, defaultdict
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+
+from .response_cache import invalidate_tags, product_tags
+from .versions import bump_product_versions
+
+SENTIMENT_FIELDS = {'Positive': 'positive', 'Neutral': 'neutral', 'Negative': 'negative'}
+STAT_FIELDS = ['count', 'rating_sum', *SENTIMENT_FIELDS.values()]
+
+
+def review_date(created_at):
+    return created_at.astimezone(dt_timezone.utc).date() if created_at else None
+
+
+def daily_state(review):
+    """What a review contributes to the daily stats: ``(product_id, date, rating, visible, sentiment)``."""
+    return review.product_id, review_date(review.created_at), review.rating, review.visible, review.sentiment
+
+
+def new_daily_deltas():
+    """``{(product_id, date): {field: n}}`` accumulator for ``apply_daily_deltas``."""
+    return defaultdict(Counter)
+
+
+def add_daily_contribution(deltas, state, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) one review's ``state`` to ``deltas``."""
+    if state is None:
+        return
+    product_id, day, rating, visible, sentiment = state
+    if not visible or day is None:
+        return
+    row = deltas[(product_id, day)]
+    row['count'] += sign
+    row['rating_sum'] += sign * (rating or 0)
+    if sentiment in SENTIMENT_FIELDS:
+        row[SENTIMENT_FIELDS[sentiment]] += sign
+
+
+def _shift(field, n):
+    # لا ننزل تحت الصفر حتى لو كان الصف منحرفًا (يصححه rebuild_daily_stats)
+    return Greatest(F(field) + n, Value(0)) if n < 0 else F(field) + n
+
+
+def apply_daily_deltas(deltas):
+    """Apply ``{(product_id, date): {field: n}}`` to the daily rows: one ``UPDATE`` per (product, day)."""
+    from .models import ReviewDailyStats
+
+    deltas = {key: {field: n for field, n in row.items() if n} for key, row in deltas.items()}
+    deltas = {key: row for key, row in deltas.items() if row}
+    if not deltas:
+        return
+
+    # الصف يُنشأ عند أول إضافة فقط؛ الحذف لا ينشئ صفًا (قد يكون المنتج قيد الحذف)
+    created = [key for key, row in deltas.items() if any(n > 0 for n in row.values())]
+    if created:
+        ReviewDailyStats.objects.bulk_create(
+            [ReviewDailyStats(product_id=product_id, date=day) for product_id, day in created],
+            ignore_conflicts=True,
+        )
+    for (product_id, day), row in sorted(deltas.items()):
+        ReviewDailyStats.objects.filter(product_id=product_id, date=day).update(
+            **{field: _shift(field, n) for field, n in row.items()}
+        )
+
+
+def record_sentiments(labels):
+    """
+    Move the daily sentiment counts of ``{review_id: new label}`` before the
+    labels are written with ``bulk_update`` (one read), and expire the ETags
+    and cached analytics of the products whose stats changed.  Returns their
+    ids.
+    """
+    from .models import Review
+
+    deltas = new_daily_deltas()
+    rows = Review.objects.filter(pk__in=list(labels), visible=True)\
+        .values_list('pk', 'product_id', 'created_at', 'sentiment')
+    for pk, product_id, created_at, sentiment in rows:
+        if labels[pk] == sentiment:
+            continue
+        row = deltas[(product_id, review_date(created_at))]
+        if sentiment in SENTIMENT_FIELDS:
+            row[SENTIMENT_FIELDS[sentiment]] -= 1
+        if labels[pk] in SENTIMENT_FIELDS:
+            row[SENTIMENT_FIELDS[labels[pk]]] += 1
+    apply_daily_deltas(deltas)
+    changed = {product_id for (product_id, _), row in deltas.items() if any(row.values())}
+    if changed:
+        bump_product_versions(changed)
+        invalidate_tags(*product_tags(changed))
+    return changed
+
+
+def daily_stats(product_id, start, end):
+    """``{date: {field: n}}`` of a product for the dates ``start``..``end`` (inclusive), days without reviews omitted."""
+    from .models import ReviewDailyStats
+
+    rows = ReviewDailyStats.objects.filter(product_id=product_id, date__gte=start, date__lte=end)\
+        .values('date', *STAT_FIELDS)
+    return {row.pop('date'): row for row in rows}
+
+
+def compute_daily_stats(product_ids):
+    """Aggregate the visible reviews of ``product_ids`` per UTC day: ``{(product_id, date): {field: n}}``."""
+    from .models import Review
+
+    rows = (
+        Review.objects.filter(product_id__in=product_ids, visible=True)
+        .values('product_id', day=TruncDate('created_at', tzinfo=dt_timezone.utc))
+        .annotate(
+            total=Count('id'), ratings=Sum('rating'),
+            **{field: Count('id', filter=Q(sentiment=label)) for label, field in SENTIMENT_FIELDS.items()},
+        )
+        .order_by()
+    )
+    return {
+        (row['product_id'], row['day']): {
+            'count': row['total'], 'rating_sum': row['ratings'] or 0,
+            **{field: row[field] for field in SENTIMENT_FIELDS.values()},
+        }
+        for row in rows
+    }
+
+
+def rebuild_daily_stats(chunk_size=1000, progress=None):
+    """
+    Recompute the daily rows of every product in primary-key chunks (delete
+    and re-insert per chunk).  Returns the ids of products whose stored rows
+    differed.
+    """
+    from .models import Product, ReviewDailyStats
+
+    repaired = []
+    scanned = 0
+    last_pk = 0
+    while True:
+        product_ids = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+
+        actual = compute_daily_stats(product_ids)
+        stored = {
+            (row.pop('product_id'), row.pop('date')): row
+            for row in ReviewDailyStats.objects.filter(product_id__in=product_ids)
+            .values('product_id', 'date', *STAT_FIELDS)
+        }
+        # الصفوف الصفرية (حُذفت أو أُخفيت كل مراجعات اليوم) لا تُعدّ انحرافًا
+        stored = {key: row for key, row in stored.items() if any(row.values())}
+        repaired.extend(sorted({key[0] for key in stored.keys() | actual.keys() if stored.get(key) != actual.get(key)}))
+        with transaction.atomic():
+            ReviewDailyStats.objects.filter(product_id__in=product_ids).delete()
+            ReviewDailyStats.objects.bulk_create([
+                ReviewDailyStats(product_id=product_id, date=day, **row)
+                for (product_id, day), row in sorted(actual.items())
+            ])
+
+        scanned += len(product_ids)
+        if progress:
+            progress(scanned)
+    return repaired
@@ -0,0 +1,193 @@
+"""
+Materialized top-review leaderboards.
+
+``ReviewLeaderboardEntry`` holds the ``REVIEWS_LEADERBOARD_SIZE`` (K) best
+visible reviews of every product and of the whole site (``product`` NULL),
+ranked as ``top_review`` always ranked them: most helpful votes, then newest.
+Reading a board is one query for at most K rows on the ``(product, rank)``
+index, whatever the number of reviews.
+
+Boards are kept up to date incrementally:
+
+* ``review_changed`` runs when a review's helpful count (``adjust_counters``),
+  visibility or product changes.  It reads the review and the boards it may
+  belong to (two queries); a board is rebuilt only if the review is on it or
+  now beats its last entry.  A rebuild reads K rows from the
+  ``(visible|product, -helpful_count, -created_at)`` indexes and replaces
+  the board's rows.
+* ``refill_boards`` runs after reviews are deleted (their entries go with
+  them by ``CASCADE``) and rebuilds boards left with fewer than K rows.
+* ``rebuild_boards`` handles bulk visibility changes.
+
+Anything that bypasses these paths (``QuerySet.update()``, raw SQL) is
+caught by the full rebuild: ``python manage.py rebuild_leaderboards``.
+
+A rebuild first locks the product row (the ``GlobalLeaderboard`` row for
+the global board), so two requests rebuilding the same board do not both
+write it.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+RANKING = ['-helpful_count', '-created_at', '-id']
+GLOBAL_BOARD_ROW = 1
+
+
+def leaderboard_size():
+    return getattr(settings, 'REVIEWS_LEADERBOARD_SIZE', 10)
+
+
+def _scope(queryset, product_id):
+    return queryset.filter(product__isnull=True) if product_id is None else queryset.filter(product_id=product_id)
+
+
+def _key(helpful_count, created_at, review_id):
+    return helpful_count, created_at, review_id
+
+
+def _lock_board(product_id):
+    """
+    Lock a row that exists whether or not the board has entries: the
+    product, or the ``GlobalLeaderboard`` row (an ``UPDATE``, so SQLite takes
+    its write lock too).  Held until the rebuild's transaction ends.
+    """
+    from .models import GlobalLeaderboard, Product
+
+    if product_id is not None:
+        list(Product.objects.select_for_update().filter(pk=product_id).values_list('pk', flat=True))
+    elif not GlobalLeaderboard.objects.filter(pk=GLOBAL_BOARD_ROW).update(rebuilt_at=timezone.now()):
+        GlobalLeaderboard.objects.bulk_create([GlobalLeaderboard(pk=GLOBAL_BOARD_ROW, rebuilt_at=timezone.now())],
+                                              ignore_conflicts=True)
+
+
+def rebuild_board(product_id):
+    """
+    Recompute one board (``None`` = global) from the reviews.  Concurrent
+    rebuilds of a board wait for each other (``_lock_board``) and then read
+    the reviews as the previous one left them.  Should two still collide
+    (a database without row locks), the unique constraints reject the
+    second one's rows and it is skipped: the board was just rebuilt.
+    """
+    from .models import Review, ReviewLeaderboardEntry
+
+    reviews = Review.objects.filter(visible=True)
+    if product_id is not None:
+        reviews = reviews.filter(product_id=product_id)
+    try:
+        with transaction.atomic():
+            _lock_board(product_id)
+            top = reviews.order_by(*RANKING).values_list('pk', 'helpful_count', 'created_at')[:leaderboard_size()]
+            _scope(ReviewLeaderboardEntry.objects, product_id).delete()
+            ReviewLeaderboardEntry.objects.bulk_create([
+                ReviewLeaderboardEntry(product_id=product_id, review_id=review_id, rank=rank,
+                                       helpful_count=helpful_count, created_at=created_at)
+                for rank, (review_id, helpful_count, created_at) in enumerate(top, start=1)
+            ])
+    except IntegrityError:
+        pass
+
+
+def rebuild_boards(product_ids, include_global=True):
+    for product_id in sorted(set(product_ids) - {None}):
+        rebuild_board(product_id)
+    if include_global:
+        rebuild_board(None)
+
+
+def review_changed(review_id):
+    """Update the boards affected by a change of one review's ranking key, visibility or product."""
+    from .models import Review, ReviewLeaderboardEntry
+
+    review = Review.objects.filter(pk=review_id).values('product_id', 'visible', 'helpful_count', 'created_at').first()
+    if review is None:
+        return
+    product_id = review['product_id']
+    key = _key(review['helpful_count'], review['created_at'], review_id)
+
+    boards = defaultdict(list)
+    entries = ReviewLeaderboardEntry.objects.filter(
+        Q(product__isnull=True) | Q(product_id=product_id) | Q(review_id=review_id)
+    ).order_by('rank').values_list('product_id', 'review_id', 'helpful_count', 'created_at')
+    for board, entry_review_id, helpful_count, created_at in entries:
+        boards[board].append(_key(helpful_count, created_at, entry_review_id))
+
+    size = leaderboard_size()
+    stale = set()
+    for board in {None, product_id, *boards}:
+        rows = boards[board]
+        eligible = review['visible'] and board in (None, product_id)
+        listed = [row for row in rows if row[2] == review_id]
+        if listed:
+            # مُدرجة: نعيد البناء إلا إذا لم يتغير شيء يخصها
+            if not eligible or listed[0] != key:
+                stale.add(board)
+        elif eligible and (len(rows) < size or key > rows[-1]):
+            stale.add(board)
+    for board in stale:
+        rebuild_board(board)
+
+
+def refill_boards(product_ids):
+    """Rebuild the global board and those of ``product_ids`` if they hold fewer than K rows (after deletions)."""
+    from .models import ReviewLeaderboardEntry
+
+    product_ids = set(product_ids) - {None}
+    sizes = dict(
+        ReviewLeaderboardEntry.objects.filter(Q(product__isnull=True) | Q(product_id__in=product_ids))
+        .values('product_id').annotate(total=Count('id')).values_list('product_id', 'total').order_by()
+    )
+    for board in [*sorted(product_ids), None]:
+        if sizes.get(board, 0) < leaderboard_size():
+            rebuild_board(board)
+
+
+def top_reviews(product_id=None, k=1):
+    """The ``k`` best reviews (``k`` <= K) of a product or of the site, read from its board."""
+    from .models import ReviewLeaderboardEntry
+
+    entries = _scope(ReviewLeaderboardEntry.objects, product_id).order_by('rank')\
+        .select_related('review__user')[:k]
+    return [entry.review for entry in entries]
+
+
+def rebuild_leaderboards(chunk_size=1000, progress=None):
+    """
+    Full rebuild of every board: the global one, then product boards for
+    products in pk chunks (one windowed query per chunk).  Returns the number
+    of product boards written.
+    """
+    from .models import Product, Review, ReviewLeaderboardEntry
+
+    size = leaderboard_size()
+    rebuild_board(None)
+    written = scanned = 0
+    last_pk = 0
+    while True:
+        product_ids = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+        ranked = (
+            Review.objects.filter(visible=True, product_id__gte=product_ids[0], product_id__lte=last_pk)
+            .annotate(position=Window(RowNumber(), partition_by=F('product_id'), order_by=RANKING))
+            .filter(position__lte=size)
+            .values_list('product_id', 'pk', 'helpful_count', 'created_at', 'position')
+        )
+        entries = [
+            ReviewLeaderboardEntry(product_id=product_id, review_id=review_id, rank=position,
+                                   helpful_count=helpful_count, created_at=created_at)
+            for product_id, review_id, helpful_count, created_at, position in ranked
+        ]
+        with transaction.atomic():
+            ReviewLeaderboardEntry.objects.filter(product_id__gte=product_ids[0], product_id__lte=last_pk).delete()
+            ReviewLeaderboardEntry.objects.bulk_create(entries)
+        written += len({entry.product_id for entry in entries})
+        scanned += len(product_ids)
+        if progress:
+            progress(scanned)
+    return written
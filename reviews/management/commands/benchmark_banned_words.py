@@ -0,0 +1,92 @@
+import random
+import string
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import BannedWord, Product, Review
+from reviews.moderation import find_banned_words, invalidate_banned_word_matcher
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_scan(text):
+    """The old per-word loop from Review.save(), kept here for comparison."""
+    found = []
+    for banned in BannedWord.objects.all():
+        if banned.word.lower() in text.lower():
+            found.append(banned.word)
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure Review.save() latency against banned word lists of different "
+        "sizes. Everything runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,1000,50000',
+                            help='Comma separated banned word list sizes')
+        parser.add_argument('--saves', type=int, default=50,
+                            help='Number of review saves per size')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        try:
+            with transaction.atomic():
+                self._run(sizes, options['saves'], random.Random(options['seed']))
+                raise _Rollback
+        except _Rollback:
+            pass
+        invalidate_banned_word_matcher()
+
+    def _run(self, sizes, saves, rng):
+        user = User.objects.create_user(username='__benchmark_user__')
+        product = Product.objects.create(name='Benchmark', description='', price=1)
+        texts = [
+            ' '.join(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+                     for _ in range(60))
+            for _ in range(saves)
+        ]
+
+        self.stdout.write(f"{'words':>8} {'legacy scan ms':>15} {'matcher ms':>11} {'save ms':>9} {'save queries':>13}")
+        for size in sizes:
+            BannedWord.objects.all().delete()
+            words = {''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12)))
+                     for _ in range(size * 2)}
+            BannedWord.objects.bulk_create(
+                [BannedWord(word=word) for word in list(words)[:size]], batch_size=1000
+            )
+            # bulk_create does not send post_save, so invalidate by hand.
+            invalidate_banned_word_matcher()
+
+            start = time.perf_counter()
+            for text in texts[:5]:
+                _legacy_scan(text)
+            legacy_ms = (time.perf_counter() - start) * 1000 / 5
+
+            # The first save builds the automaton; exclude it from the timing.
+            Review(product=product, user=user, rating=3, review_text=texts[0]).save()
+
+            start = time.perf_counter()
+            for text in texts:
+                find_banned_words(text)
+            matcher_ms = (time.perf_counter() - start) * 1000 / len(texts)
+
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                for text in texts:
+                    Review(product=product, user=user, rating=3, review_text=text).save()
+            save_ms = (time.perf_counter() - start) * 1000 / len(texts)
+
+            self.stdout.write(
+                f"{size:>8} {legacy_ms:>15.2f} {matcher_ms:>11.3f} {save_ms:>9.2f} "
+                f"{len(queries) / len(texts):>13.1f}"
+            )
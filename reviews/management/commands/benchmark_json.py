@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from reviews.models import Product, Review
+from reviews.renderers import ORJSONRenderer
+from reviews.serializers import ReviewSerializer
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stock DRF JSONRenderer with the orjson renderer on a "
+        "ReviewViewSet.list payload. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['reviews'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, count, repeat):
+        user = User.objects.create_user(username='__benchmark_user__')
+        product = Product.objects.create(name='Benchmark', description='', price='19.99')
+        Review.objects.bulk_create([
+            Review(product=product, user=user, rating=i % 5 + 1, visible=True, sentiment_pending=False,
+                   review_text=f'Review number {i}: the battery lasts “all day”, great value — {"x" * (i % 200)}')
+            for i in range(count)
+        ])
+
+        request = Request(APIRequestFactory().get('/api/reviews/'))
+        request.user = user
+        reviews = Review.objects.filter(product=product).select_related('user').order_by('-created_at', '-id')
+        data = ReviewSerializer(reviews, many=True, context={'request': request}).data
+
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+        if json.loads(stock.render(data)) != json.loads(fast.render(data)):
+            self.stderr.write("Renderers produced different JSON")
+
+        self.stdout.write(f"{'renderer':>10} {'ms / render':>12} {'bytes':>10}")
+        for name, renderer in (('stock', stock), ('orjson', fast)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                content = renderer.render(data)
+            elapsed = (time.perf_counter() - start) * 1000 / repeat
+            self.stdout.write(f"{name:>10} {elapsed:>12.2f} {len(content):>10}")
@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.sentiment import label_for_polarity
+from reviews.sentiment_backends import LexiconBackend, TextBlobBackend
+
+FILLER = ['the', 'phone', 'battery', 'screen', 'it', 'was', 'and', 'this', 'camera', 'price',
+          'delivery', 'i', 'my', 'is', 'but', 'for', 'with', 'not', 'never', 'very']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-text TextBlob scoring with the batched NumPy lexicon backend "
+        "(the sentiment cache is bypassed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,100000',
+                            help='Comma separated numbers of texts')
+        parser.add_argument('--textblob-sample', type=int, default=10000,
+                            help='Time TextBlob on at most this many texts and extrapolate (0 = all)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        textblob, lexicon = TextBlobBackend(), LexiconBackend()
+
+        # Load the lexicon and warm TextBlob up outside the timings.
+        start = time.perf_counter()
+        lexicon.score_batch(['warm up'])
+        load_ms = (time.perf_counter() - start) * 1000
+        textblob.score_batch(['warm up'])
+        vocabulary = list(lexicon._get_tables()[0])
+        self.stdout.write(f"lexicon: {len(vocabulary)} words, loaded in {load_ms:.0f} ms")
+
+        self.stdout.write(
+            f"{'texts':>8} {'textblob s':>11} {'lexicon s':>10} {'speedup':>8} {'label agreement':>16}"
+        )
+        for size in sizes:
+            texts = [
+                ' '.join(rng.choice(vocabulary) if rng.random() < 0.2 else rng.choice(FILLER)
+                         for _ in range(rng.randint(8, 40)))
+                for _ in range(size)
+            ]
+
+            sample = texts[:options['textblob_sample']] if options['textblob_sample'] else texts
+            start = time.perf_counter()
+            textblob_scores = textblob.score_batch(sample)
+            textblob_s = (time.perf_counter() - start) * len(texts) / len(sample)
+
+            start = time.perf_counter()
+            lexicon_scores = lexicon.score_batch(texts)
+            lexicon_s = time.perf_counter() - start
+
+            agreement = sum(
+                label_for_polarity(a) == label_for_polarity(b)
+                for a, b in zip(textblob_scores, lexicon_scores)
+            ) / len(sample)
+            estimated = '~' if len(sample) < len(texts) else ' '
+            self.stdout.write(
+                f"{size:>8} {estimated}{textblob_s:>10.2f} {lexicon_s:>10.2f} "
+                f"{textblob_s / lexicon_s:>7.1f}x {agreement:>15.1%}"
+            )
+        if any(options['textblob_sample'] and size > options['textblob_sample'] for size in sizes):
+            self.stdout.write(f"~ TextBlob time extrapolated from {options['textblob_sample']} texts")
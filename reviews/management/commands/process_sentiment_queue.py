@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews.sentiment import process_pending_sentiment, sentiment_cache_info
+
+
+class Command(BaseCommand):
+    help = "Score reviews waiting for sentiment analysis, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--forever', action='store_true',
+                            help='Keep polling for new pending reviews instead of exiting when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=5.0,
+                            help='Seconds to wait between polls when the queue is empty (with --forever)')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_pending_sentiment(options['batch_size'])
+            total += processed
+            if processed:
+                cache = sentiment_cache_info()
+                self.stdout.write(
+                    f"Processed {processed} queued reviews ({total} total), "
+                    f"cache hits={cache['hits']} misses={cache['misses']} ratio={cache['hit_ratio']}"
+                )
+                continue
+            if not options['forever']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Sentiment queue drained, {total} queued reviews processed"))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime, parse_date
+
+from reviews.analysis import ANALYZER_VERSION, reanalyze_stale_reviews, scan_for_new_words
+from reviews.models import BannedWord
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run sentiment and banned-word analysis on reviews analyzed by an "
+        "older analyzer version, or scan only for newly added banned words."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: CPU count, 0 = run in this process)')
+        parser.add_argument('--new-words', action='store_true',
+                            help='Incremental mode: only look for the banned words given by --words/--since')
+        parser.add_argument('--words', default='',
+                            help='Comma separated banned words to scan for (with --new-words)')
+        parser.add_argument('--since',
+                            help='Scan for banned words added on or after this date/datetime (with --new-words)')
+
+    def handle(self, *args, **options):
+        if options['new_words']:
+            words = self._new_words(options)
+            self.stdout.write(f"Scanning for {len(words)} new banned words...")
+            updated = scan_for_new_words(
+                words, chunk_size=options['chunk_size'],
+                progress=lambda n: self.stdout.write(f"  scanned {n} reviews"),
+            )
+            self.stdout.write(self.style.SUCCESS(f"{updated} reviews gained banned word matches"))
+            return
+
+        self.stdout.write(f"Re-analyzing reviews older than analyzer version {ANALYZER_VERSION}...")
+        total = reanalyze_stale_reviews(
+            chunk_size=options['chunk_size'], workers=options['workers'],
+            progress=lambda n: self.stdout.write(f"  {n} reviews updated"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Re-analyzed {total} reviews"))
+
+    def _new_words(self, options):
+        words = [word.strip() for word in options['words'].split(',') if word.strip()]
+        if options['since']:
+            since = parse_datetime(options['since']) or parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be a date or datetime (YYYY-MM-DD[THH:MM])")
+            lookup = 'created_at__gte' if hasattr(since, 'hour') else 'created_at__date__gte'
+            words += BannedWord.objects.filter(**{lookup: since}).order_by('pk')\
+                .values_list('word', flat=True)
+        if not words:
+            raise CommandError("--new-words needs --words and/or --since")
+        return words
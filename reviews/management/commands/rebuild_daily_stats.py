@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from reviews.daily_stats import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ReviewDailyStats (visible reviews, rating sum and sentiment "
+        "mix per product and UTC day) from the reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repaired = rebuild_daily_stats(
+            chunk_size=options['chunk_size'],
+            progress=lambda n: self.stdout.write(f"  {n} products rebuilt"),
+        )
+        if repaired:
+            shown = ', '.join(str(pk) for pk in repaired[:20])
+            self.stdout.write(self.style.WARNING(f"Repaired daily stats of {len(repaired)} products: {shown}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All daily stats were up to date"))
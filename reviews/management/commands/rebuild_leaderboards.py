@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from reviews.leaderboard import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the top-review leaderboards (the global one and one per "
+        "product) from the visible reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_leaderboards(
+            chunk_size=options['chunk_size'],
+            progress=lambda n: self.stdout.write(f"  {n} products scanned"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the global leaderboard and {written} product leaderboards"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from reviews.rating_stats import rebuild_rating_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ProductRatingStats (review count, rating sum and star "
+        "histogram per product) from the visible reviews."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repaired = rebuild_rating_stats(
+            chunk_size=options['chunk_size'],
+            progress=lambda n: self.stdout.write(f"  {n} products rebuilt"),
+        )
+        if repaired:
+            shown = ', '.join(str(pk) for pk in repaired[:20])
+            self.stdout.write(self.style.WARNING(f"Repaired stats of {len(repaired)} products: {shown}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All product rating stats were up to date"))
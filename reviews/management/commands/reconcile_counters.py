@@ -0,0 +1,36 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from reviews.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the engagement counters stored on reviews (helpful_count, "
+        "comments_count, ...) from the related tables and report any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report drift, do not fix it')
+        parser.add_argument('--show', type=int, default=20,
+                            help='Number of drifted values to list')
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(
+            chunk_size=options['chunk_size'], fix=not options['dry_run'],
+            progress=lambda n: self.stdout.write(f"  checked {n} reviews"),
+        )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All counters are in sync"))
+            return
+
+        for review_id, field, stored, actual in drift[:options['show']]:
+            self.stdout.write(f"  review {review_id}: {field} stored={stored} actual={actual}")
+        by_field = Counter(field for _, field, _, _ in drift)
+        summary = ', '.join(f"{field}={count}" for field, count in sorted(by_field.items()))
+        reviews = len({review_id for review_id, _, _, _ in drift})
+        verb = "found" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.WARNING(f"Drift {verb} on {reviews} reviews ({summary})"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from reviews.rollups import retention_days, rollup_activity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hourly activity rollups of recent hours from the event "
+        "tables, compact finished days into daily rollups and delete hourly "
+        "rollups older than the retention window. Meant to run every hour."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Number of recent hours to recompute')
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='Days of hourly rollups to keep (default: REVIEWS_ROLLUP_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        days = options['retention_days'] if options['retention_days'] is not None else retention_days()
+        result = rollup_activity(hours=options['hours'], days=days)
+        review_rows, product_rows = result['hourly']
+        self.stdout.write(f"  hourly: {review_rows} review rows, {product_rows} product rows recomputed")
+        review_rows, product_rows = result['daily']
+        self.stdout.write(f"  daily: {review_rows} review rows, {product_rows} product rows compacted")
+        review_rows, product_rows = result['expired']
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {review_rows + product_rows} hourly rows older than {days} days"
+        ))
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:40
+# Brings the migration state back in line with models.py (0005 dropped
+# Review.views and added ReviewView, which the models never had).  The
+# ReviewView rows (one per distinct viewer) become the new Review.views.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+CHUNK_SIZE = 1000
+
+
+def fold_review_views(apps, schema_editor):
+    """Review.views = number of ReviewView rows of the review, for reviews in pk chunks."""
+    Review = apps.get_model('reviews', 'Review')
+    ReviewView = apps.get_model('reviews', 'ReviewView')
+
+    last_pk = 0
+    while True:
+        review_ids = list(Review.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not review_ids:
+            break
+        last_pk = review_ids[-1]
+        counts = ReviewView.objects.filter(review_id__in=review_ids).values('review_id')\
+            .annotate(n=Count('id')).order_by().values_list('review_id', 'n')
+        Review.objects.bulk_update([Review(pk=pk, views=n) for pk, n in counts], ['views'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_remove_review_views_reviewview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # ReviewView is kept until 0014 seeds the unique-viewer sketches from it; its
+        # reverse accessor must not clash with the Review.views column added below.
+        migrations.AlterField(
+            model_name='reviewview',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legacy_views', to='reviews.review'),
+        ),
+        migrations.AlterModelOptions(
+            name='review',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='action_url',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('comment', 'تعليق جديد'), ('like', 'إعجاب'), ('reply', 'رد على تعليق'), ('follow', 'متابعة جديدة'), ('system', 'إشعار من النظام')], default='system', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='related_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='triggered_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='helpful_users',
+            field=models.ManyToManyField(blank=True, help_text='المستخدمون الذين وجدوا هذه المراجعة مفيدة', related_name='helpful_reviews', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='unhelpful_users',
+            field=models.ManyToManyField(blank=True, help_text='المستخدمون الذين وجدوا هذه المراجعة غير مفيدة', related_name='unhelpful_reviews', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fold_review_views, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', '-created_at'], name='reviews_not_user_id_de71d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-created_at'], name='reviews_rev_product_d800fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', '-created_at'], name='reviews_rev_user_id_eeecea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['rating'], name='reviews_rev_rating_2db6dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['visible'], name='reviews_rev_visible_5f6a89_idx'),
+        ),
+    ]
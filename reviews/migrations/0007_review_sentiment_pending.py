@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_sync_models'),
+    ]
+
+    operations = [
+        # Existing reviews were already scored synchronously, so they start
+        # out of the queue; new rows default to pending.
+        migrations.AddField(
+            model_name='review',
+            name='sentiment_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='sentiment_pending',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('sentiment_pending', True)), fields=['id'], name='review_sentiment_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_review_sentiment_pending'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='analyzer_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['analyzer_version', 'id'], name='reviews_rev_analyze_355d18_idx'),
+        ),
+    ]
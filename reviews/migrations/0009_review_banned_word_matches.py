@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+
+
+def find_matches(words, text):
+    """
+    Frozen copy of the matching rules at this migration: ``(banned_word_id,
+    severity, position)`` per distinct word found in ``text`` (case
+    insensitive, first occurrence), words in ``BannedWord`` pk order.
+    """
+    lowered = text.lower()
+    found = []
+    for pk, word, severity in words:
+        position = lowered.find(word)
+        if position >= 0:
+            found.append((pk, severity, position))
+    return found
+
+
+def backfill_matches(apps, schema_editor):
+    """Fill the match table and max_severity from reviews already flagged, in pk chunks."""
+    BannedWord = apps.get_model('reviews', 'BannedWord')
+    Review = apps.get_model('reviews', 'Review')
+    ReviewBannedWordMatch = apps.get_model('reviews', 'ReviewBannedWordMatch')
+
+    words, seen = [], set()
+    for pk, word, severity in BannedWord.objects.order_by('pk').values_list('pk', 'word', 'severity'):
+        key = word.lower()
+        if key and key not in seen:
+            seen.add(key)
+            words.append((pk, key, severity))
+    if not words:
+        return
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Review.objects.filter(contains_banned_words=True, pk__gt=last_pk)
+            .order_by('pk').values_list('pk', 'review_text')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        matches, reviews = [], []
+        for pk, text in rows:
+            found = find_matches(words, text or '')
+            matches.extend(
+                ReviewBannedWordMatch(review_id=pk, banned_word_id=word_id, severity=severity, position=position)
+                for word_id, severity, position in found
+            )
+            reviews.append(Review(pk=pk, max_severity=max((severity for _, severity, _ in found), default=0)))
+        ReviewBannedWordMatch.objects.bulk_create(matches, ignore_conflicts=True)
+        Review.objects.bulk_update(reviews, ['max_severity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_review_analyzer_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewBannedWordMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('severity', models.IntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')])),
+                ('position', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='max_severity',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['max_severity'], name='reviews_rev_max_sev_8864af_idx'),
+        ),
+        migrations.AddField(
+            model_name='reviewbannedwordmatch',
+            name='banned_word',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='reviews.bannedword'),
+        ),
+        migrations.AddField(
+            model_name='reviewbannedwordmatch',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='banned_word_matches', to='reviews.review'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewbannedwordmatch',
+            index=models.Index(fields=['severity', 'review'], name='reviews_rev_severit_b1d480_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reviewbannedwordmatch',
+            unique_together={('review', 'banned_word')},
+        ),
+        migrations.RunPython(backfill_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_review_banned_word_matches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='moderated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('moderated_at__isnull', True), ('visible', False)), fields=['created_at', 'id'], name='review_moderation_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 1000
+
+
+def backfill_counters(apps, schema_editor):
+    """Fill the new counter columns from the related tables, in pk ranges."""
+    Review = apps.get_model('reviews', 'Review')
+    related = {
+        'interactions': apps.get_model('reviews', 'ReviewInteraction'),
+        'votes': apps.get_model('reviews', 'ReviewVote'),
+        'comments': apps.get_model('reviews', 'ReviewComment'),
+        'reports': apps.get_model('reviews', 'ReviewReport'),
+    }
+
+    def count(name, condition=Q()):
+        rows = related[name].objects.filter(condition, review=OuterRef('pk'))\
+            .values('review').annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    last_pk = 0
+    while True:
+        pks = list(Review.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        Review.objects.filter(pk__gte=pks[0], pk__lte=last_pk).update(
+            helpful_count=count('interactions', Q(helpful=True)),
+            unhelpful_count=count('interactions', Q(helpful=False)),
+            comments_count=count('comments'),
+            reports_count=count('reports'),
+            interaction_count=count('interactions') + count('votes'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_review_moderation_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='helpful_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='interaction_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='reports_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='unhelpful_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['visible', '-interaction_count'], name='reviews_rev_visible_513830_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['visible', '-helpful_count', '-created_at'], name='reviews_rev_visible_e68006_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+CHUNK_SIZE = 1000
+
+
+def backfill_stats(apps, schema_editor):
+    """Create a stats row per product from its visible reviews, in pk chunks."""
+    Product = apps.get_model('reviews', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    ProductRatingStats = apps.get_model('reviews', 'ProductRatingStats')
+
+    last_pk = 0
+    while True:
+        product_ids = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+
+        histograms = {pk: [0] * 6 for pk in product_ids}
+        rows = Review.objects.filter(product_id__in=product_ids, visible=True)\
+            .values('product_id', 'rating').annotate(total=Count('id')).order_by()\
+            .values_list('product_id', 'rating', 'total')
+        for product_id, rating, total in rows:
+            if 1 <= rating <= 5:
+                histograms[product_id][rating] = total
+
+        stats = []
+        for product_id, histogram in histograms.items():
+            count = sum(histogram)
+            total = sum(rating * n for rating, n in enumerate(histogram))
+            stats.append(ProductRatingStats(
+                product_id=product_id, review_count=count, rating_sum=total,
+                average_rating=total / count if count else None,
+                **{f'count_{rating}': histogram[rating] for rating in range(1, 6)},
+            ))
+        ProductRatingStats.objects.bulk_create(stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_review_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='reviews.product')),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('average_rating', models.FloatField(blank=True, null=True)),
+                ('count_1', models.PositiveIntegerField(default=0)),
+                ('count_2', models.PositiveIntegerField(default=0)),
+                ('count_3', models.PositiveIntegerField(default=0)),
+                ('count_4', models.PositiveIntegerField(default=0)),
+                ('count_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-average_rating'], name='reviews_pro_average_ff071b_idx'), models.Index(fields=['-review_count'], name='reviews_pro_review__288af9_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
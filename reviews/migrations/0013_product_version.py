@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+CHUNK_SIZE = 1000
+
+
+def backfill_versions(apps, schema_editor):
+    """One version row per existing product, in pk chunks."""
+    Product = apps.get_model('reviews', 'Product')
+    ProductVersion = apps.get_model('reviews', 'ProductVersion')
+
+    now = timezone.now()
+    last_pk = 0
+    while True:
+        product_ids = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+        ProductVersion.objects.bulk_create(
+            [ProductVersion(product_id=product_id, modified_at=now) for product_id in product_ids],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_product_rating_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVersion',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version', serialize=False, to='reviews.product')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('modified_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+    ]
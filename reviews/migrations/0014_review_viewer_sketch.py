@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:41
+
+from hashlib import blake2b
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+
+
+def viewer_hash(key):
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+def seed_sketches(apps, schema_editor):
+    """
+    One sketch per review from its ReviewView rows (user, or IP address for
+    anonymous viewers, hashed like reviews.hll.viewer_hash), in exact mode:
+    b'E' + the sorted big-endian uint64 hashes.  A sketch above the exact
+    threshold switches to registers on its next merge.
+    """
+    Review = apps.get_model('reviews', 'Review')
+    ReviewView = apps.get_model('reviews', 'ReviewView')
+    ReviewViewerSketch = apps.get_model('reviews', 'ReviewViewerSketch')
+
+    last_pk = 0
+    while True:
+        review_ids = list(Review.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not review_ids:
+            break
+        last_pk = review_ids[-1]
+        viewers = {}
+        rows = ReviewView.objects.filter(review_id__in=review_ids).values_list('review_id', 'user_id', 'ip_address')
+        for review_id, user_id, ip_address in rows.iterator(chunk_size=CHUNK_SIZE):
+            key = f'user:{user_id}' if user_id is not None else f'ip:{ip_address}'
+            viewers.setdefault(review_id, set()).add(viewer_hash(key))
+        ReviewViewerSketch.objects.bulk_create([
+            ReviewViewerSketch(review_id=review_id, unique_viewers=len(hashes),
+                               sketch=b'E' + b''.join(h.to_bytes(8, 'big') for h in sorted(hashes)))
+            for review_id, hashes in viewers.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_product_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewViewerSketch',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='viewer_sketch', serialize=False, to='reviews.review')),
+                ('sketch', models.BinaryField()),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_sketches, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ReviewView',
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_review_viewer_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('interactions', models.PositiveIntegerField(default=0)),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('new_reviews', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='reviews.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='reviews_pro_granula_03c84a_idx')],
+                'unique_together': {('product', 'granularity', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('interactions', models.PositiveIntegerField(default=0)),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='reviews.review')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='reviews_rev_granula_0a8aa1_idx')],
+                'unique_together': {('review', 'granularity', 'bucket')},
+            },
+        ),
+    ]
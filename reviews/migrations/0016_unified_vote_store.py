@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 1000
+
+
+def merge_votes(apps, schema_editor):
+    """
+    Fold ReviewVote rows and the helpful_users / unhelpful_users M2M into
+    ReviewInteraction (one vote per review and user), in review pk chunks.
+    Where a user has both an interaction and a vote, the most recent one
+    wins and the earliest date is kept; M2M votes (no date) only fill the
+    gaps, dated at the review.  The counters are then recomputed from the
+    merged rows.
+    """
+    Review = apps.get_model('reviews', 'Review')
+    ReviewInteraction = apps.get_model('reviews', 'ReviewInteraction')
+    ReviewVote = apps.get_model('reviews', 'ReviewVote')
+    HelpfulUsers = Review.helpful_users.through
+    UnhelpfulUsers = Review.unhelpful_users.through
+
+    def count(condition=Q()):
+        rows = ReviewInteraction.objects.filter(condition, review=OuterRef('pk'))\
+            .values('review').annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    last_pk = 0
+    while True:
+        reviews = dict(Review.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'created_at')[:CHUNK_SIZE])
+        if not reviews:
+            break
+        pks = list(reviews)
+        last_pk = pks[-1]
+        chunk = {'review_id__gte': pks[0], 'review_id__lte': last_pk}
+
+        stored = {(vote.review_id, vote.user_id): vote for vote in ReviewInteraction.objects.filter(**chunk)}
+        new, changed = {}, {}
+        for vote in ReviewVote.objects.filter(**chunk).order_by('created_at'):
+            key = (vote.review_id, vote.user_id)
+            current = stored.get(key) or new.get(key)
+            if current is None:
+                new[key] = ReviewInteraction(review_id=vote.review_id, user_id=vote.user_id,
+                                             helpful=vote.helpful, created_at=vote.created_at)
+            elif vote.created_at >= current.created_at and vote.helpful != current.helpful:
+                current.helpful = vote.helpful
+                if key in stored:
+                    changed[key] = current
+        for through, helpful in ((HelpfulUsers, True), (UnhelpfulUsers, False)):
+            for review_id, user_id in through.objects.filter(**chunk).values_list('review_id', 'user_id'):
+                key = (review_id, user_id)
+                if key not in stored and key not in new:
+                    new[key] = ReviewInteraction(review_id=review_id, user_id=user_id,
+                                                 helpful=helpful, created_at=reviews[review_id])
+
+        # created_at هو auto_now_add: bulk_create يستبدله بالوقت الحالي، فنعيد التاريخ الأصلي بعده
+        dates = [vote.created_at for vote in new.values()]
+        created = ReviewInteraction.objects.bulk_create(new.values())
+        for vote, created_at in zip(created, dates):
+            vote.created_at = created_at
+        ReviewInteraction.objects.bulk_update(created, ['created_at'])
+        ReviewInteraction.objects.bulk_update(changed.values(), ['helpful'])
+
+        Review.objects.filter(pk__gte=pks[0], pk__lte=last_pk).update(
+            helpful_count=count(Q(helpful=True)),
+            unhelpful_count=count(Q(helpful=False)),
+            interaction_count=count(),
+        )
+
+    # تجميعات النشاط: أعمدة votes تُضم إلى interactions قبل حذفها
+    for name in ('ReviewActivityRollup', 'ProductActivityRollup'):
+        apps.get_model('reviews', name).objects.exclude(votes=0).update(interactions=F('interactions') + F('votes'))
+
+
+def split_votes(apps, schema_editor):
+    """Reverse: mirror the vote store into the M2M fields again (ReviewVote stays empty)."""
+    Review = apps.get_model('reviews', 'Review')
+    ReviewInteraction = apps.get_model('reviews', 'ReviewInteraction')
+
+    last_pk = 0
+    while True:
+        rows = list(ReviewInteraction.objects.filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', 'review_id', 'user_id', 'helpful')[:CHUNK_SIZE])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        for through, helpful in ((Review.helpful_users.through, True), (Review.unhelpful_users.through, False)):
+            through.objects.bulk_create(
+                [through(review_id=review_id, user_id=user_id) for _, review_id, user_id, value in rows if value == helpful],
+                ignore_conflicts=True,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0015_activity_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_votes, split_votes),
+        migrations.AlterUniqueTogether(
+            name='reviewvote',
+            unique_together=None,
+        ),
+        migrations.RemoveField(
+            model_name='reviewvote',
+            name='review',
+        ),
+        migrations.RemoveField(
+            model_name='reviewvote',
+            name='user',
+        ),
+        migrations.RemoveField(
+            model_name='productactivityrollup',
+            name='votes',
+        ),
+        migrations.RemoveField(
+            model_name='review',
+            name='helpful_users',
+        ),
+        migrations.RemoveField(
+            model_name='review',
+            name='unhelpful_users',
+        ),
+        migrations.RemoveField(
+            model_name='reviewactivityrollup',
+            name='votes',
+        ),
+        migrations.AddIndex(
+            model_name='reviewinteraction',
+            index=models.Index(fields=['user', 'review'], name='reviews_rev_user_id_0de424_idx'),
+        ),
+        migrations.DeleteModel(
+            name='ReviewVote',
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+from math import sqrt
+
+from django.conf import settings
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+
+
+def wilson_lower_bound(helpful, unhelpful, z=1.96):
+    total = helpful + unhelpful
+    if total <= 0:
+        return 0.0
+    return (helpful + z * z / 2 - z * sqrt(helpful * unhelpful / total + z * z / 4)) / (total + z * z)
+
+
+def backfill_scores(apps, schema_editor):
+    """Score every review that has votes (the others keep the default 0), in pk chunks."""
+    Review = apps.get_model('reviews', 'Review')
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Review.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'helpful_count', 'unhelpful_count')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        Review.objects.bulk_update(
+            [Review(pk=pk, helpfulness_score=wilson_lower_bound(helpful, unhelpful))
+             for pk, helpful, unhelpful in rows if helpful or unhelpful],
+            ['helpfulness_score'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_unified_vote_store'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='helpfulness_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-helpfulness_score', '-id'], name='reviews_rev_product_29b053_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['visible', '-helpfulness_score', '-id'], name='reviews_rev_visible_f73b23_idx'),
+        ),
+    ]
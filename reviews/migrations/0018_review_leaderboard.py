@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+CHUNK_SIZE = 1000
+LEADERBOARD_SIZE = 10
+RANKING = ['-helpful_count', '-created_at', '-id']
+
+
+def build_leaderboards(apps, schema_editor):
+    """The global board, then product boards for products in pk chunks (one windowed query per chunk)."""
+    Product = apps.get_model('reviews', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    Entry = apps.get_model('reviews', 'ReviewLeaderboardEntry')
+    size = getattr(settings, 'REVIEWS_LEADERBOARD_SIZE', LEADERBOARD_SIZE)
+
+    top = Review.objects.filter(visible=True).order_by(*RANKING)\
+        .values_list('pk', 'helpful_count', 'created_at')[:size]
+    Entry.objects.bulk_create([
+        Entry(product_id=None, review_id=pk, rank=rank, helpful_count=helpful_count, created_at=created_at)
+        for rank, (pk, helpful_count, created_at) in enumerate(top, start=1)
+    ])
+
+    last_pk = 0
+    while True:
+        product_ids = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+        ranked = (
+            Review.objects.filter(visible=True, product_id__gte=product_ids[0], product_id__lte=last_pk)
+            .annotate(position=Window(RowNumber(), partition_by=F('product_id'), order_by=RANKING))
+            .filter(position__lte=size)
+            .values_list('product_id', 'pk', 'helpful_count', 'created_at', 'position')
+        )
+        Entry.objects.bulk_create([
+            Entry(product_id=product_id, review_id=pk, rank=position, helpful_count=helpful_count, created_at=created_at)
+            for product_id, pk, helpful_count, created_at, position in ranked
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0017_review_helpfulness_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewLeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('helpful_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-helpful_count', '-created_at'], name='reviews_rev_product_c6f779_idx'),
+        ),
+        migrations.AddField(
+            model_name='reviewleaderboardentry',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.product'),
+        ),
+        migrations.AddField(
+            model_name='reviewleaderboardentry',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.review'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewleaderboardentry',
+            index=models.Index(fields=['product', 'rank'], name='reviews_rev_product_6b1db9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reviewleaderboardentry',
+            constraint=models.UniqueConstraint(fields=('product', 'review'), name='leaderboard_unique_review'),
+        ),
+        migrations.RunPython(build_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:13
+
+from datetime import timezone as dt_timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+CHUNK_SIZE = 1000
+SENTIMENT_FIELDS = {'Positive': 'positive', 'Neutral': 'neutral', 'Negative': 'negative'}
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """One row per product and UTC day with visible reviews, for products in pk chunks."""
+    Product = apps.get_model('reviews', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    ReviewDailyStats = apps.get_model('reviews', 'ReviewDailyStats')
+
+    last_pk = 0
+    while True:
+        product_ids = list(Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:CHUNK_SIZE])
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+        rows = (
+            Review.objects.filter(product_id__in=product_ids, visible=True)
+            .values('product_id', day=TruncDate('created_at', tzinfo=dt_timezone.utc))
+            .annotate(
+                total=Count('id'), ratings=Sum('rating'),
+                **{field: Count('id', filter=Q(sentiment=label)) for label, field in SENTIMENT_FIELDS.items()},
+            )
+            .order_by()
+        )
+        ReviewDailyStats.objects.bulk_create([
+            ReviewDailyStats(product_id=row['product_id'], date=row['day'], count=row['total'],
+                             rating_sum=row['ratings'] or 0,
+                             **{field: row[field] for field in SENTIMENT_FIELDS.values()})
+            for row in rows
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_review_leaderboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('positive', models.PositiveIntegerField(default=0)),
+                ('neutral', models.PositiveIntegerField(default=0)),
+                ('negative', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='reviews.product')),
+            ],
+            options={
+                'unique_together': {('product', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
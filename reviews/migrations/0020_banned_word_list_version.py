@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    apps.get_model('reviews', 'BannedWordListVersion').objects.create(pk=1, version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0019_review_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BannedWordListVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_global_entries(apps, schema_editor):
+    # قبل القيد: نُبقي أقدم صف لكل مراجعة مكررة في اللوحة العامة (rebuild_leaderboards يعيد الترتيب)
+    Entry = apps.get_model('reviews', 'ReviewLeaderboardEntry')
+    duplicates = (
+        Entry.objects.filter(product__isnull=True).values('review_id')
+        .annotate(total=Count('id'), first=Min('id')).filter(total__gt=1).order_by()
+    )
+    for row in duplicates:
+        Entry.objects.filter(product__isnull=True, review_id=row['review_id']).exclude(pk=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0020_banned_word_list_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_global_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reviewleaderboardentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', True)), fields=('review',), name='leaderboard_unique_global_review'),
+        ),
+    ]
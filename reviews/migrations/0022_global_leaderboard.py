@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+def create_board_row(apps, schema_editor):
+    apps.get_model('reviews', 'GlobalLeaderboard').objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0021_leaderboard_unique_global_review'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalLeaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_board_row, migrations.RunPython.noop),
+    ]
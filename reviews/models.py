@@ -1,6 +1,5 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from textblob import TextBlob
 from django.utils import timezone
 from datetime import timedelta
 
@@ -15,6 +14,50 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+# ✅ إحصائيات التقييم لكل منتج (عدد المراجعات الظاهرة، مجموع التقييمات، وتوزيع النجوم 1-5)
+# تُحدَّث مع كل حفظ/حذف/إظهار/إخفاء لمراجعة (rating_stats.py)، ويعيد بناءها rebuild_rating_stats
+class ProductRatingStats(models.Model):
+    product = models.OneToOneField(Product, primary_key=True, related_name='rating_stats', on_delete=models.CASCADE)
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(null=True, blank=True)  # rating_sum / review_count (فارغ إذا لا توجد مراجعات)
+    count_1 = models.PositiveIntegerField(default=0)
+    count_2 = models.PositiveIntegerField(default=0)
+    count_3 = models.PositiveIntegerField(default=0)
+    count_4 = models.PositiveIntegerField(default=0)
+    count_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-average_rating']),  # ترتيب المنتجات حسب التقييم
+            models.Index(fields=['-review_count']),  # ترتيب المنتجات حسب عدد المراجعات
+        ]
+
+    @property
+    def histogram(self):
+        return {rating: getattr(self, f'count_{rating}') for rating in range(1, 6)}
+
+    def __str__(self):
+        return f"{self.product_id}: {self.average_rating} ({self.review_count})"
+
+# ✅ رقم إصدار لكل منتج يزداد مع كل تغيير يظهر في مراجعاته (مراجعة، تفاعل، تصويت، تعليق، بلاغ، إظهار/إخفاء)
+# يُستخدم لإرسال ETag و Last-Modified والرد بـ 304 قبل تنفيذ أي استعلام ثقيل (versions.py)
+class ProductVersion(models.Model):
+    product = models.OneToOneField(Product, primary_key=True, related_name='version', on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField(default=1)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.product_id}: v{self.version}"
+
+# ✅ رقم إصدار قائمة الكلمات المحظورة (صف واحد): يزداد مع كل تغيير في القائمة، وكل عملية
+# تقارنه بإصدار الـ matcher الذي بنته لتعيد البناء (moderation.py)
+class BannedWordListVersion(models.Model):
+    version = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"banned words v{self.version}"
+
 # ✅ نموذج للكلمات الممنوعة التي يتم فحصها داخل المراجعات (مع درجة خطورتها وخيار الاستبدال)
 # Laith: Added BannedWord model to filter inappropriate content in reviews 
 # edited by sabah 
@@ -44,6 +87,7 @@ class Review(models.Model):
     review_text = models.TextField()  # نص المراجعة
     created_at = models.DateTimeField(auto_now_add=True)  # وقت الكتابة
     visible = models.BooleanField(default=False)  # هل المراجعة ظاهرة للمستخدمين أم لا (تحتاج موافقة مثلًا)
+    moderated_at = models.DateTimeField(null=True, blank=True)  # وقت قبول/رفض المشرف (فارغ = في طابور المراجعة)
     
     # mjd task9⬇
     views = models.PositiveIntegerField(default=0)  # عدد مرات المشاهدة للمراجعة
@@ -54,43 +98,153 @@ class Review(models.Model):
     # Laith: Added fields for banned words detection
     contains_banned_words = models.BooleanField(default=False)  # هل تحتوي على كلمات محظورة
     banned_words_found = models.TextField(blank=True, null=True)  # عرض الكلمات المحظورة التي وُجدت
+    max_severity = models.PositiveSmallIntegerField(default=0)  # أعلى درجة خطورة بين الكلمات المحظورة الموجودة (0 = لا يوجد)
     sentiment_score = models.FloatField(blank=True, null=True)  # قيمة تحليل العاطفة العددي (polarity)
+    sentiment_pending = models.BooleanField(default=True)  # بانتظار تحليل العاطفة (يعالجها process_sentiment_queue)
+    analyzer_version = models.PositiveIntegerField(default=0)  # نسخة قواعد التحليل التي أنتجت الحقول أعلاه (reanalyze_reviews)
+
+    # ✅ عدادات مخزّنة (تُحدَّث بـ F() من signals.py، ويصححها reconcile_counters)
+    helpful_count = models.PositiveIntegerField(default=0)  # تفاعلات "مفيد" (likes)
+    unhelpful_count = models.PositiveIntegerField(default=0)  # تفاعلات "غير مفيد" (dislikes)
+    comments_count = models.PositiveIntegerField(default=0)  # عدد التعليقات
+    reports_count = models.PositiveIntegerField(default=0)  # عدد البلاغات
+    interaction_count = models.PositiveIntegerField(default=0)  # أصوات مفيد/غير مفيد (مجموع العدادين أعلاه)
+    helpfulness_score = models.FloatField(default=0)  # الحد الأدنى لفترة Wilson لنسبة "مفيد" (ترتيب الأكثر فائدة)
+
+    # الحقول المشتقة من نص المراجعة (يُعاد حسابها عند تغيّر النص)
+    ANALYSIS_FIELDS = [
+        'sentiment', 'sentiment_score', 'sentiment_pending',
+        'contains_banned_words', 'banned_words_found', 'max_severity', 'analyzer_version',
+    ]
+    # الأعمدة التي تحدد مساهمة المراجعة في ReviewDailyStats (ترتيب daily_state)
+    DAILY_STATE_FIELDS = ['product_id', 'created_at', 'rating', 'visible', 'sentiment']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # نحتفظ بالنص كما تم تحميله لنعرف عند الحفظ هل تغيّر فعلاً
+        if 'review_text' in field_names:
+            instance._loaded_review_text = instance.review_text
+        # ما تساهم به المراجعة في إحصائيات المنتج كما هو محفوظ (لتطبيق الفرق عند الحفظ)
+        if {'product_id', 'rating', 'visible'} <= set(field_names):
+            instance._loaded_rating_state = (instance.product_id, instance.rating, instance.visible)
+        # وكذلك ما تساهم به في الإحصائيات اليومية (daily_stats.py)
+        if set(cls.DAILY_STATE_FIELDS) <= set(field_names):
+            from .daily_stats import daily_state
+            instance._loaded_daily_state = daily_state(instance)
+        return instance
 
-    # New fields for helpful/unhelpful voting
-    helpful_users = models.ManyToManyField(
-        User, 
-        related_name='helpful_reviews', 
-        blank=True,
-        help_text="المستخدمون الذين وجدوا هذه المراجعة مفيدة"
-    )
-    unhelpful_users = models.ManyToManyField(
-        User, 
-        related_name='unhelpful_reviews', 
-        blank=True,
-        help_text="المستخدمون الذين وجدوا هذه المراجعة غير مفيدة"
-    )
+    @property
+    def review_text_changed(self):
+        """True if ``review_text`` differs from what was loaded from the database."""
+        if self._state.adding:
+            return True
+        if 'review_text' in self.get_deferred_fields():
+            return False
+        return self.review_text != getattr(self, '_loaded_review_text', None)
 
     def save(self, *args, **kwargs):
-        # تحليل عاطفي تلقائي باستخدام TextBlob
-        from textblob import TextBlob
-        analysis = TextBlob(self.review_text)
-        polarity = analysis.sentiment.polarity
-        self.sentiment_score = polarity
-
-        if polarity > 0.1:
-            self.sentiment = 'Positive'
-        elif polarity < -0.1:
-            self.sentiment = 'Negative'
+        # لا نعيد التحليل إلا إذا تغيّر النص (الموافقة، عدد المشاهدات، تعديل التقييم فقط...)
+        update_fields = kwargs.get('update_fields')
+        analyzed = (update_fields is None or 'review_text' in update_fields) and self.review_text_changed
+        if analyzed:
+            self.analyze()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.ANALYSIS_FIELDS)
+
+        adding = self._state.adding
+        previous = None if adding else self._saved_rating_state()
+        previous_daily = None if adding else self._saved_daily_state()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_rating_stats(previous, kwargs.get('update_fields'))
+            self._update_daily_stats(previous_daily, kwargs.get('update_fields'))
+            # عدد المشاهدات وحده لا يغيّر إصدار المنتج (يتغيّر مع كل قراءة)
+            if update_fields is None or set(update_fields) - {'views'}:
+                from .versions import bump_product_versions
+                bump_product_versions({self.product_id, previous[0] if previous else None})
+        self._loaded_review_text = self.review_text
+
+        # تسجيل الكلمات المحظورة في جدول الربط (للفلترة حسب الخطورة عبر الفهرس)
+        banned_matches = getattr(self, '_banned_matches', [])
+        if analyzed and (banned_matches or not adding):
+            from .moderation import store_banned_word_matches
+            store_banned_word_matches({self.pk: banned_matches})
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # ربما تغيّرت القيم المحفوظة دون المرور بـ save (تحديث جماعي): تُقرأ من جديد عند الحفظ التالي
+        self.__dict__.pop('_loaded_rating_state', None)
+        self.__dict__.pop('_loaded_daily_state', None)
+
+    def _saved_rating_state(self):
+        state = getattr(self, '_loaded_rating_state', None)
+        if state is None:
+            state = Review.objects.filter(pk=self.pk).values_list('product_id', 'rating', 'visible').first()
+        return state
+
+    def _update_rating_stats(self, previous, update_fields):
+        """Move this review's contribution in ProductRatingStats from ``previous`` to what was just saved."""
+        from .rating_stats import add_contribution, apply_rating_deltas, new_deltas, rating_state
+
+        current = rating_state(self)
+        if previous is not None and update_fields is not None:
+            # الحقول غير المحفوظة بقيت على قيمتها السابقة في قاعدة البيانات
+            current = tuple(
+                value if name in update_fields or f'{name}_id' in update_fields else old
+                for name, value, old in zip(('product', 'rating', 'visible'), current, previous)
+            )
+        if current != previous:
+            deltas = new_deltas()
+            add_contribution(deltas, previous, -1)
+            add_contribution(deltas, current, 1)
+            apply_rating_deltas(deltas)
+        self._loaded_rating_state = current
+
+    def _saved_daily_state(self):
+        state = getattr(self, '_loaded_daily_state', None)
+        if state is None:
+            from .daily_stats import daily_state
+            saved = Review.objects.filter(pk=self.pk).only(*self.DAILY_STATE_FIELDS).first()
+            state = daily_state(saved) if saved else None
+        return state
+
+    def _update_daily_stats(self, previous, update_fields):
+        """Move this review's contribution in ReviewDailyStats from ``previous`` to what was just saved."""
+        from .daily_stats import add_daily_contribution, apply_daily_deltas, daily_state, new_daily_deltas
+
+        current = daily_state(self)
+        if previous is not None and update_fields is not None:
+            current = tuple(
+                value if name in update_fields or name.removesuffix('_id') in update_fields else old
+                for name, value, old in zip(self.DAILY_STATE_FIELDS, current, previous)
+            )
+        if current != previous:
+            deltas = new_daily_deltas()
+            add_daily_contribution(deltas, previous, -1)
+            add_daily_contribution(deltas, current, 1)
+            apply_daily_deltas(deltas)
+        self._loaded_daily_state = current
+
+    def analyze(self):
+        """Refresh the fields derived from ``review_text`` (without saving)."""
+        # تحليل العاطفة لا يتم داخل الطلب: نضع المراجعة في طابور الانتظار
+        # ويقوم الأمر process_sentiment_queue بتحليلها على دفعات
+        from .analysis import ANALYZER_VERSION
+        from .sentiment import analyze_sentiment, is_sync_mode
+        self.analyzer_version = ANALYZER_VERSION
+        if is_sync_mode():
+            self.sentiment, self.sentiment_score = analyze_sentiment(self.review_text)
+            self.sentiment_pending = False
         else:
-            self.sentiment = 'Neutral'
+            self.sentiment_pending = True
 
         # Laith: Check for banned words in the review text
-        banned_words = BannedWord.objects.all()
-        found_words = []
-
-        for banned in banned_words:
-            if banned.word.lower() in self.review_text.lower():
-                found_words.append(banned.word)
+        # (one pass over the text using the cached matcher, no queries)
+        from .moderation import find_banned_word_matches, max_severity
+        self._banned_matches = find_banned_word_matches(self.review_text)
+        found_words = [match.word for match in self._banned_matches]
+        self.max_severity = max_severity(self._banned_matches)
 
         if found_words:
             self.contains_banned_words = True
@@ -99,34 +253,21 @@ class Review(models.Model):
             self.contains_banned_words = False
             self.banned_words_found = None
 
-        super().save(*args, **kwargs)
-
-    # ✅ عدد التفاعلات المفيدة للمراجعة (helpful=True) - الطريقة القديمة
+    # ✅ عدد التفاعلات المفيدة للمراجعة (helpful=True) - من العداد المخزّن
     def likes_count(self):
-        return self.interactions.filter(helpful=True).count()
-
-    # ✅ Properties للحصول على عدد الأصوات المفيدة وغير المفيدة - الطريقة الجديدة
-    @property
-    def helpful_count(self):
-        """عدد المستخدمين الذين وجدوا المراجعة مفيدة"""
-        return self.helpful_users.count()
-    
-    @property
-    def unhelpful_count(self):
-        """عدد المستخدمين الذين وجدوا المراجعة غير مفيدة"""
-        return self.unhelpful_users.count()
+        return self.helpful_count
 
     # ✅ Method للتحقق من تصويت مستخدم معين
     def user_voted_helpful(self, user):
         """التحقق من أن المستخدم صوت بـ مفيد"""
         if user.is_authenticated:
-            return self.helpful_users.filter(id=user.id).exists()
+            return self.interactions.filter(user=user, helpful=True).exists()
         return False
 
     def user_voted_unhelpful(self, user):
         """التحقق من أن المستخدم صوت بـ غير مفيد"""
         if user.is_authenticated:
-            return self.unhelpful_users.filter(id=user.id).exists()
+            return self.interactions.filter(user=user, helpful=False).exists()
         return False
 
     # ✅ Method لحساب نسبة الفائدة
@@ -151,11 +292,140 @@ class Review(models.Model):
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['rating']),
             models.Index(fields=['visible']),
+            models.Index(fields=['id'], condition=models.Q(sentiment_pending=True),
+                         name='review_sentiment_pending_idx'),
+            models.Index(fields=['analyzer_version', 'id']),
+            models.Index(fields=['max_severity']),
+            # طابور الإشراف: المراجعات المخفية التي لم يُبت فيها، مرتبة بـ (created_at, id)
+            models.Index(fields=['created_at', 'id'],
+                         condition=models.Q(visible=False, moderated_at__isnull=True),
+                         name='review_moderation_queue_idx'),
+            # الترتيب حسب العدادات المخزّنة (most_interactive، وبناء لوحات top-review)
+            models.Index(fields=['visible', '-interaction_count']),
+            models.Index(fields=['visible', '-helpful_count', '-created_at']),
+            models.Index(fields=['product', '-helpful_count', '-created_at']),
+            # الأكثر فائدة (درجة Wilson): صفحة المنتج و ?sort_by=most_helpful مع ?product= أو بدونه
+            models.Index(fields=['product', '-helpfulness_score', '-id']),
+            models.Index(fields=['visible', '-helpfulness_score', '-id']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name} - {self.rating}⭐"
     
+# ✅ جدول ربط بين المراجعة والكلمات المحظورة الموجودة فيها (مع الخطورة وموضع أول ظهور)
+class ReviewBannedWordMatch(models.Model):
+    review = models.ForeignKey(Review, related_name='banned_word_matches', on_delete=models.CASCADE)
+    banned_word = models.ForeignKey(BannedWord, related_name='matches', on_delete=models.CASCADE)
+    severity = models.IntegerField(choices=BannedWord.SEVERITY_CHOICES)  # نسخة من خطورة الكلمة (للفهرسة)
+    position = models.PositiveIntegerField()  # موضع أول ظهور للكلمة داخل النص
+
+    class Meta:
+        unique_together = ['review', 'banned_word']
+        indexes = [
+            models.Index(fields=['severity', 'review']),  # فلترة المراجعات حسب الخطورة
+        ]
+
+    def __str__(self):
+        return f"{self.banned_word} in review {self.review_id} at {self.position}"
+
+# ✅ عدد المشاهدين المختلفين لكل مراجعة (تقريبي بـ HyperLogLog، دقيق للمراجعات القليلة المشاهدات)
+# بدل صف لكل مشاهد؛ يُحدَّث على دفعات مع عداد المشاهدات (view_counter.py / hll.py)
+class ReviewViewerSketch(models.Model):
+    review = models.OneToOneField(Review, primary_key=True, related_name='viewer_sketch', on_delete=models.CASCADE)
+    sketch = models.BinaryField()  # HyperLogLog (بضعة KB كحد أقصى)
+    unique_viewers = models.PositiveIntegerField(default=0)  # التقدير المحسوب عند آخر تحديث
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.review_id}: ~{self.unique_viewers} viewers"
+
+# ✅ لوحة أفضل المراجعات (leaderboard.py): أفضل K مراجعة ظاهرة لكل منتج وللموقع كله (product فارغ)
+class ReviewLeaderboardEntry(models.Model):
+    product = models.ForeignKey(Product, null=True, blank=True, related_name='leaderboard_entries',
+                                on_delete=models.CASCADE)  # فارغ = اللوحة العامة
+    review = models.ForeignKey(Review, related_name='leaderboard_entries', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()  # 1 = الأفضل
+    # مفتاح الترتيب وقت البناء، للمقارنة مع آخر اللوحة دون قراءة المراجعات
+    helpful_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'review'], name='leaderboard_unique_review'),
+            # NULL لا يتكرر في القيد السابق، فاللوحة العامة تحتاج قيدًا خاصًا بها
+            models.UniqueConstraint(fields=['review'], condition=models.Q(product__isnull=True),
+                                    name='leaderboard_unique_global_review'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'rank']),  # قراءة اللوحة بالترتيب
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.review_id} ({self.product_id or 'global'})"
+
+# ✅ صف اللوحة العامة (صف واحد): يُحدَّث rebuilt_at في بداية كل إعادة بناء لها، فيقفل الصف
+# وتنتظر إعادة البناء المتزامنة حتى تنتهي الأولى (لوحات المنتجات تقفل صف المنتج نفسه)
+class GlobalLeaderboard(models.Model):
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"global leaderboard ({self.rebuilt_at or 'never built'})"
+
+
+# ✅ تجميعات النشاط حسب الساعة ثم اليوم (rollups.py): مشاهدات، تفاعلات، تعليقات
+# لكل مراجعة ولكل منتج، حتى تُقرأ السلاسل الزمنية دون المرور على الصفوف الخام
+class ActivityRollup(models.Model):
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [(HOUR, 'ساعة'), (DAY, 'يوم')]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()  # بداية الساعة أو اليوم (UTC)
+    views = models.PositiveIntegerField(default=0)
+    interactions = models.PositiveIntegerField(default=0)  # أصوات مفيد/غير مفيد الجديدة
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ReviewActivityRollup(ActivityRollup):
+    review = models.ForeignKey(Review, related_name='activity_rollups', on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ['review', 'granularity', 'bucket']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket']),  # الضغط إلى أيام وحذف الساعات القديمة
+        ]
+
+
+class ProductActivityRollup(ActivityRollup):
+    product = models.ForeignKey(Product, related_name='activity_rollups', on_delete=models.CASCADE)
+    new_reviews = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'granularity', 'bucket']  # يخدم أيضًا قراءة السلسلة الزمنية للمنتج
+        indexes = [
+            models.Index(fields=['granularity', 'bucket']),
+        ]
+
+# ✅ إحصائيات يومية لمراجعات كل منتج (daily_stats.py): المراجعات الظاهرة المكتوبة في كل يوم (UTC)
+# تُحدَّث مع كل كتابة، فتحليلات آخر N يوم تجمع N صفًا على الأكثر بدل المرور على المراجعات
+class ReviewDailyStats(models.Model):
+    product = models.ForeignKey(Product, related_name='daily_stats', on_delete=models.CASCADE)
+    date = models.DateField()  # يوم created_at بتوقيت UTC
+    count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    positive = models.PositiveIntegerField(default=0)  # حسب sentiment (المراجعات غير المحللة بعد لا تُحسب)
+    neutral = models.PositiveIntegerField(default=0)
+    negative = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['product', 'date']  # يخدم أيضًا قراءة فترة من الأيام للمنتج
+
+    def __str__(self):
+        return f"{self.product_id} {self.date}: {self.count}"
+
 # ✅ نموذج للتعليق على مراجعة معينة
 class ReviewComment(models.Model):
     review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='comments')  # المراجعة الهدف
@@ -170,31 +440,27 @@ class ReviewComment(models.Model):
     def __str__(self):
         return f"Comment by {self.user.username} on {self.review}"
 
-# ✅ نموذج لتقييم المراجعة هل كانت مفيدة أو لا
-class ReviewVote(models.Model):
-    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='votes')  # المراجعة الهدف
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # المستخدم المصوّت
-    helpful = models.BooleanField()  # هل وجدها مفيدة (True) أم لا (False)
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    class Meta:
-        unique_together = ['review', 'user']  # لا يمكن أن يصوّت نفس المستخدم على نفس المراجعة مرتين
-        verbose_name = "Vote on the review"
-        verbose_name_plural = "Votes on reviews"
-
-    def __str__(self):
-        return f"{self.user.username} voted {'helpful' if self.helpful else 'not helpful'} for {self.review}"
-
 # task8 - mjd
 # ✅ نظام التفاعل مع المراجعات (إعجاب أو عدم إعجاب)
+# المخزن الوحيد لأصوات مفيد/غير مفيد (interact و vote و review_helpful)، يُكتب عبر votes.py
 class ReviewInteraction(models.Model):
     review = models.ForeignKey(Review, related_name='interactions', on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     helpful = models.BooleanField()  # True = مفيد، False = غير مفيد
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # القيمة المحفوظة حاليًا، لمعرفة إن تغيّر التفاعل عند الحفظ (لتحديث العدادات)
+        instance._loaded_helpful = instance.__dict__.get('helpful')
+        return instance
+
     class Meta:
-        unique_together = ('review', 'user')
+        unique_together = ('review', 'user')  # أصوات المراجعة
+        indexes = [
+            models.Index(fields=['user', 'review']),  # أصوات المستخدم (حالة المستخدم في القوائم، صفحة الملف الشخصي)
+        ]
 
 # ✅ إشعارات للمستخدمين (مثلاً: أحدهم علّق على مراجعتك، أو أعجب بها)
 class Notification(models.Model):
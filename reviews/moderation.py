@@ -0,0 +1,261 @@
+"""
+Banned-word matching for reviews.
+
+All banned words are compiled into a single Aho-Corasick automaton, so checking
+a review is one pass over its text no matter how many words are banned.  The
+automaton is built from the ``BannedWord`` table once per process and cached;
+a version counter in the database (the single ``BannedWordListVersion`` row)
+tells every process when the list changed so it can rebuild on its next check.
+It lives in the database rather than in Django's cache because the default
+cache is per process.  The row is read at most once every
+``REVIEWS_BANNED_WORDS_RECHECK_SECONDS`` per process, so checking a review
+normally runs no query at all.
+"""
+from collections import deque, namedtuple
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+
+VERSION_ROW = 1
+
+# Where a banned word first occurs in a review (position is a character offset).
+BannedWordMatch = namedtuple('BannedWordMatch', ['word', 'banned_word_id', 'severity', 'position'])
+
+
+class BannedWordMatcher:
+    """Aho-Corasick automaton over a list of banned words (case-insensitive)."""
+
+    def __init__(self, words, ids=None, severities=None):
+        # Keep the original order so results come back in the same order the
+        # old per-word loop produced them (BannedWord primary-key order).
+        self.words = []
+        self.ids = []
+        self.severities = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        words = list(words)
+        ids = ids or [None] * len(words)
+        severities = severities or [None] * len(words)
+        seen = set()
+        for word, pk, severity in zip(words, ids, severities):
+            key = word.lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self._add(key, len(self.words))
+            self.words.append(word)
+            self.ids.append(pk)
+            self.severities.append(severity)
+
+        self._build_failure_links()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from ``(pk, word, severity)`` rows."""
+        rows = list(rows)
+        return cls([row[1] for row in rows], [row[0] for row in rows], [row[2] for row in rows])
+
+    def __len__(self):
+        return len(self.words)
+
+    def _add(self, key, index):
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = self._output[state] + ((index, len(key)),)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Inherit the matches of the longest proper suffix so that
+                # overlapping words ("bad" inside "badword") are all reported.
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """Yield ``(word_index, start, end)`` for every occurrence in ``text``."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text.lower()):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index, length in output[state]:
+                yield index, position + 1 - length, position + 1
+
+    def find(self, text):
+        """Return the distinct banned words found in ``text``."""
+        return [match.word for match in self.find_matches(text)]
+
+    def find_matches(self, text):
+        """Return a ``BannedWordMatch`` per distinct word found, first occurrence only."""
+        if not self.words or not text:
+            return []
+        first_seen = {}
+        for index, start, _ in self.iter_matches(text):
+            # Matches of the same word come out left to right.
+            first_seen.setdefault(index, start)
+        return [
+            BannedWordMatch(self.words[index], self.ids[index], self.severities[index], first_seen[index])
+            for index in sorted(first_seen)
+        ]
+
+
+_lock = threading.Lock()
+_matcher = None
+_matcher_version = None
+_matcher_checked_at = 0.0
+
+
+def recheck_seconds():
+    return getattr(settings, 'REVIEWS_BANNED_WORDS_RECHECK_SECONDS', 5)
+
+
+def get_banned_word_matcher():
+    """
+    Return the process-wide matcher, rebuilding it only when the banned word
+    list has changed.  The version row is read at most once every
+    ``recheck_seconds()``; in between no query runs.  Changes made in this
+    process are seen at once (``invalidate_banned_word_matcher``), changes
+    made by other processes after at most ``recheck_seconds()``.
+    """
+    global _matcher, _matcher_version, _matcher_checked_at
+    from .models import BannedWordListVersion
+
+    matcher = _matcher
+    if matcher is not None and time.monotonic() - _matcher_checked_at < recheck_seconds():
+        return matcher
+
+    version = BannedWordListVersion.objects.filter(pk=VERSION_ROW).values_list('version', flat=True).first()
+    with _lock:
+        if _matcher is None or version != _matcher_version:
+            from .models import BannedWord
+            _matcher = BannedWordMatcher.from_rows(
+                BannedWord.objects.order_by('pk').values_list('pk', 'word', 'severity')
+            )
+            _matcher_version = version
+        _matcher_checked_at = time.monotonic()
+        return _matcher
+
+
+def find_banned_words(text):
+    """Return the distinct banned words found in ``text``."""
+    return get_banned_word_matcher().find(text)
+
+
+def find_banned_word_matches(text):
+    """Shortcut used by ``Review.analyze()``."""
+    return get_banned_word_matcher().find_matches(text)
+
+
+def max_severity(matches):
+    return max((match.severity or 0 for match in matches), default=0)
+
+
+def store_banned_word_matches(matches_by_review, replace=True):
+    """
+    Write ``{review_id: [BannedWordMatch, ...]}`` to the match table.  With
+    ``replace`` the previous rows of those reviews are removed first; without
+    it new rows are added next to the existing ones.
+    """
+    from .models import ReviewBannedWordMatch
+
+    if replace and matches_by_review:
+        ReviewBannedWordMatch.objects.filter(review_id__in=list(matches_by_review)).delete()
+    rows = [
+        ReviewBannedWordMatch(review_id=review_id, banned_word_id=match.banned_word_id,
+                              severity=match.severity, position=match.position)
+        for review_id, matches in matches_by_review.items()
+        for match in matches
+        if match.banned_word_id is not None
+    ]
+    if rows:
+        ReviewBannedWordMatch.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=not replace)
+
+
+def refresh_max_severity(review_ids):
+    """Recompute ``Review.max_severity`` from the match table for ``review_ids``."""
+    from django.db.models import Max, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from .models import Review, ReviewBannedWordMatch
+
+    if not review_ids:
+        return
+    highest = ReviewBannedWordMatch.objects.filter(review=OuterRef('pk'))\
+        .values('review').annotate(highest=Max('severity')).values('highest')
+    Review.objects.filter(pk__in=review_ids)\
+        .update(max_severity=Coalesce(Subquery(highest), Value(0)))
+
+
+def refresh_banned_word_fields(review_ids):
+    """
+    Recompute ``contains_banned_words``, ``banned_words_found`` and
+    ``max_severity`` of ``review_ids`` from their remaining match rows (after
+    a banned word was deleted), words in ``BannedWord`` order as the matcher
+    reports them.
+    """
+    from .models import Review, ReviewBannedWordMatch
+
+    review_ids = set(review_ids)
+    if not review_ids:
+        return
+    found = {pk: [] for pk in review_ids}
+    highest = dict.fromkeys(review_ids, 0)
+    rows = ReviewBannedWordMatch.objects.filter(review_id__in=review_ids)\
+        .order_by('review_id', 'banned_word_id').values_list('review_id', 'banned_word__word', 'severity')
+    for review_id, word, severity in rows:
+        found[review_id].append(word)
+        highest[review_id] = max(highest[review_id], severity)
+    Review.objects.bulk_update(
+        [Review(pk=pk, contains_banned_words=bool(words), banned_words_found=', '.join(words) or None,
+                max_severity=highest[pk])
+         for pk, words in found.items()],
+        ['contains_banned_words', 'banned_words_found', 'max_severity'],
+        batch_size=1000,
+    )
+
+
+def sync_banned_word_severity(banned_word):
+    """Copy a banned word's (possibly edited) severity onto its match rows."""
+    stale = banned_word.matches.exclude(severity=banned_word.severity)
+    review_ids = list(stale.values_list('review_id', flat=True))
+    if review_ids:
+        stale.update(severity=banned_word.severity)
+        refresh_max_severity(review_ids)
+
+
+def invalidate_banned_word_matcher():
+    """
+    Force every process to rebuild its matcher.
+
+    The local copy is dropped straight away so the change is visible in this
+    request.  The version row is incremented in the caller's transaction, so
+    other processes only see the new version (and rebuild from the committed
+    rows) once it commits, and a rollback restores the old one.
+    """
+    global _matcher
+    from .models import BannedWordListVersion
+
+    with _lock:
+        _matcher = None
+    if not BannedWordListVersion.objects.filter(pk=VERSION_ROW).update(version=F('version') + 1):
+        BannedWordListVersion.objects.bulk_create([BannedWordListVersion(pk=VERSION_ROW, version=2)],
+                                                  ignore_conflicts=True)
@@ -0,0 +1,144 @@
+"""
+Keyset (seek) pagination helpers.
+
+Pages are fetched with ``WHERE (a, b) > (last_a, last_b)`` style conditions
+built from the last row of the previous page, never with OFFSET, so the cost
+of a page does not grow with how deep the client has scrolled and rows
+inserted meanwhile do not shift the pages.  The ordering must end with a
+unique column (``id``) so every row has a distinct position.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value
+                          for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, ordering):
+    """Turn a cursor back into typed values for the fields in ``ordering``."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(raw, list) or len(raw) != len(ordering):
+        raise InvalidCursor('Invalid cursor')
+
+    values = []
+    for (name, _), value in zip(ordering, raw):
+        try:
+            values.append(model._meta.get_field(name).to_python(value))
+        except Exception:
+            raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def parse_ordering(fields):
+    """``['-created_at', 'id']`` -> ``[('created_at', True), ('id', False)]``."""
+    return [(field.lstrip('-'), field.startswith('-')) for field in fields]
+
+
+def after_position(ordering, values):
+    """
+    Q object selecting the rows that come after ``values`` in ``ordering``,
+    i.e. ``(a > x) OR (a = x AND b > y) OR ...`` with the comparison flipped
+    for descending fields.
+    """
+    condition = Q()
+    equal_so_far = Q()
+    for (name, descending), value in zip(ordering, values):
+        lookup = f'{name}__lt' if descending else f'{name}__gt'
+        condition |= equal_so_far & Q(**{lookup: value})
+        equal_so_far &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(queryset, fields, cursor=None, page_size=50):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset`` ordered by
+    ``fields``.  ``next_cursor`` is None on the last page.  Raises
+    ``InvalidCursor`` for tampered or malformed cursors.
+    """
+    ordering = parse_ordering(fields)
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(after_position(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        get = last.get if isinstance(last, dict) else lambda name: getattr(last, name)
+        next_cursor = encode_cursor([get(name) for name, _ in ordering])
+    return rows, next_cursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF paginator on top of ``keyset_page``.
+
+    The body stays a plain list so existing clients keep working; the cursor
+    of the next page is sent in a ``Link: <...>; rel="next"`` header and in
+    ``X-Next-Cursor`` (both absent on the last page).  The view may define
+    ``get_keyset_ordering()`` to pick the ordering per request (e.g. per sort
+    mode); otherwise ``ordering`` is used.  Clients choose the page size with
+    ``?page_size=``, capped at ``REVIEWS_MAX_PAGE_SIZE``.
+    """
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'REVIEWS_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'REVIEWS_MAX_PAGE_SIZE', 200)
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            size = default
+        return min(max(size, 1), maximum)
+
+    def get_ordering(self, view):
+        get_ordering = getattr(view, 'get_keyset_ordering', None)
+        return list(get_ordering() if get_ordering else self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            rows, self.next_cursor = keyset_page(
+                queryset, self.get_ordering(view),
+                request.query_params.get(self.cursor_query_param), self.get_page_size(request),
+            )
+        except InvalidCursor:
+            raise ParseError('Invalid cursor')
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.next_cursor:
+            headers['Link'] = f'<{self.get_next_link()}>; rel="next"'
+            headers['X-Next-Cursor'] = self.next_cursor
+        return Response(data, headers=headers)
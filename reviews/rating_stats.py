@@ -0,0 +1,211 @@
+"""
+Per-product rating statistics.
+
+``ProductRatingStats`` holds, for every product, the number of visible
+reviews, the sum of their ratings and a 1–5 star histogram, so listings and
+rating sorts read one indexed row per product instead of aggregating
+``Review``.  The row is adjusted with ``F()`` deltas in the same transaction
+as the review change:
+
+* ``Review.save()`` – create, edit of rating/product, visibility change;
+* the ``post_delete`` signal – deletes, including cascades;
+* ``bulk_moderate`` – the bulk visibility ``UPDATE``.
+
+``rebuild_rating_stats`` (``python manage.py rebuild_rating_stats``)
+recomputes every row from scratch for backfill and repair.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .daily_stats import add_daily_contribution, apply_daily_deltas, new_daily_deltas, review_date
+from .leaderboard import rebuild_boards
+from .response_cache import invalidate_tags, product_tags
+from .versions import bump_product_versions
+
+RATINGS = range(1, 6)
+
+
+def rating_state(review):
+    """What a review contributes to the stats: ``(product_id, rating, visible)``."""
+    return review.product_id, review.rating, review.visible
+
+
+def add_contribution(deltas, state, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) one review's ``state`` to ``deltas``."""
+    if state is None:
+        return
+    product_id, rating, visible = state
+    if visible and rating in RATINGS:
+        deltas[product_id][rating] += sign
+
+
+def new_deltas():
+    """``{product_id: {rating: n}}`` accumulator for ``apply_rating_deltas``."""
+    return defaultdict(lambda: defaultdict(int))
+
+
+def _shift(field, n):
+    # لا ننزل تحت الصفر حتى لو كان الصف منحرفًا (يصححه rebuild_rating_stats)
+    return Greatest(F(field) + n, Value(0)) if n < 0 else F(field) + n
+
+
+def apply_rating_deltas(deltas):
+    """
+    Apply ``{product_id: {rating: n}}`` to the stats rows: one ``UPDATE`` per
+    product, with the average recomputed in the same statement.
+    """
+    from .models import ProductRatingStats
+
+    deltas = {
+        product_id: {rating: n for rating, n in by_rating.items() if n}
+        for product_id, by_rating in deltas.items()
+    }
+    deltas = {product_id: by_rating for product_id, by_rating in deltas.items() if by_rating}
+    if not deltas:
+        return
+
+    # Rows are created lazily by the first visible review of a product; a
+    # removal never creates one (the product may be being deleted).
+    created = [product_id for product_id, by_rating in deltas.items() if any(n > 0 for n in by_rating.values())]
+    if created:
+        ProductRatingStats.objects.bulk_create(
+            [ProductRatingStats(product_id=product_id) for product_id in created], ignore_conflicts=True
+        )
+
+    for product_id, by_rating in deltas.items():
+        count = sum(by_rating.values())
+        total = sum(rating * n for rating, n in by_rating.items())
+        new_count = F('review_count') + count
+        new_sum = F('rating_sum') + total
+        changes = {f'count_{rating}': _shift(f'count_{rating}', n) for rating, n in by_rating.items()}
+        ProductRatingStats.objects.filter(product_id=product_id).update(
+            review_count=_shift('review_count', count),
+            rating_sum=_shift('rating_sum', total),
+            average_rating=Case(
+                When(review_count__gt=-count, then=Cast(new_sum, FloatField()) / Cast(new_count, FloatField())),
+                default=Value(None),
+                output_field=FloatField(),
+            ),
+            **changes,
+        )
+
+
+def with_rating_stats(queryset):
+    """Annotate products with ``average_rating`` and ``reviews_count`` read from their stats row (one JOIN)."""
+    return queryset.annotate(
+        average_rating=F('rating_stats__average_rating'),
+        reviews_count=Coalesce(F('rating_stats__review_count'), Value(0)),
+    )
+
+
+def rating_summary(stats, product_id=None):
+    """Public summary of a stats row (or of an empty product when ``stats`` is None)."""
+    if stats is None:
+        return {'product_id': product_id, 'count': 0, 'average': None,
+                'histogram': {str(rating): 0 for rating in RATINGS}}
+    return {
+        'product_id': stats.product_id,
+        'count': stats.review_count,
+        'average': round(stats.average_rating, 2) if stats.average_rating is not None else None,
+        'histogram': {str(rating): getattr(stats, f'count_{rating}') for rating in RATINGS},
+    }
+
+
+def bulk_set_visibility(queryset, visible, **extra):
+    """
+    ``queryset.update(visible=visible, **extra)`` that also moves the reviews
+    whose visibility actually changes in or out of their product stats and
+    daily stats.
+    Returns the number of rows updated.
+    """
+    with transaction.atomic():
+        flipping = list(
+            queryset.exclude(visible=visible).select_for_update()
+            .values_list('product_id', 'rating', 'created_at', 'sentiment')
+        )
+        updated = queryset.update(visible=visible, **extra)
+        deltas = new_deltas()
+        daily = new_daily_deltas()
+        for product_id, rating, created_at, sentiment in flipping:
+            add_contribution(deltas, (product_id, rating, True), 1 if visible else -1)
+            add_daily_contribution(daily, (product_id, review_date(created_at), rating, True, sentiment),
+                                   1 if visible else -1)
+        apply_rating_deltas(deltas)
+        apply_daily_deltas(daily)
+        product_ids = {row[0] for row in flipping}
+        bump_product_versions(product_ids)
+        if flipping:
+            invalidate_tags('reviews', *product_tags(product_ids))
+            rebuild_boards(product_ids)
+    return updated
+
+
+def compute_rating_stats(product_ids):
+    """Aggregate the visible reviews of ``product_ids``: ``{product_id: {rating: n}}``."""
+    from .models import Review
+
+    counts = {product_id: dict.fromkeys(RATINGS, 0) for product_id in product_ids}
+    rows = Review.objects.filter(product_id__in=product_ids, visible=True)\
+        .values('product_id', 'rating').annotate(total=Count('id')).order_by()\
+        .values_list('product_id', 'rating', 'total')
+    for product_id, rating, total in rows:
+        if rating in RATINGS:
+            counts[product_id][rating] = total
+    return counts
+
+
+def stats_fields(histogram):
+    count = sum(histogram.values())
+    total = sum(rating * n for rating, n in histogram.items())
+    fields = {f'count_{rating}': histogram[rating] for rating in RATINGS}
+    fields.update(review_count=count, rating_sum=total, average_rating=total / count if count else None)
+    return fields
+
+
+def rebuild_rating_stats(chunk_size=1000, progress=None):
+    """
+    Recompute the stats of every product in primary-key chunks and write them
+    with an upsert.  Returns the ids of products whose stored row was missing
+    or differed.
+    """
+    from .models import Product, ProductRatingStats
+
+    update_fields = ['review_count', 'rating_sum', 'average_rating'] + [f'count_{r}' for r in RATINGS]
+    repaired = []
+    scanned = 0
+    last_pk = 0
+    while True:
+        product_ids = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not product_ids:
+            break
+        last_pk = product_ids[-1]
+
+        stored = {
+            row['product_id']: row
+            for row in ProductRatingStats.objects.filter(product_id__in=product_ids)
+            .values('product_id', *update_fields)
+        }
+        rows = []
+        for product_id, histogram in compute_rating_stats(product_ids).items():
+            fields = stats_fields(histogram)
+            current = stored.get(product_id)
+            if current is None:
+                drifted = fields['review_count'] > 0
+            else:
+                drifted = any(current[name] != value for name, value in fields.items() if name != 'average_rating')
+            if drifted:
+                repaired.append(product_id)
+            rows.append(ProductRatingStats(product_id=product_id, **fields))
+        ProductRatingStats.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['product'], update_fields=update_fields,
+        )
+
+        scanned += len(product_ids)
+        if progress:
+            progress(scanned)
+    return repaired
@@ -0,0 +1,100 @@
+"""
+orjson based JSON renderer and parser for DRF.
+
+Drop-in replacements for ``rest_framework.renderers.JSONRenderer`` and
+``rest_framework.parsers.JSONParser`` (enabled in ``REST_FRAMEWORK``).  Output
+matches the stock renderer for the types our views return: datetimes use the
+same ISO format with ``Z`` for UTC, ``Decimal`` becomes a number as with
+DRF's encoder, lazy translation strings are rendered as text, and U+2028/2029
+are escaped.  When orjson is not installed both classes fall back to the
+stock implementations.
+"""
+import datetime
+import decimal
+import uuid
+
+from django.db.models.query import QuerySet
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj):
+    """Types orjson does not handle natively, mirroring DRF's ``JSONEncoder``."""
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__') and hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=self._default, option=options)
+        # Same escaping as the stock renderer, so the output is safe inside <script>.
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+    @staticmethod
+    def _default(obj):
+        # Datetimes go through here (OPT_PASSTHROUGH_DATETIME) to keep DRF's format:
+        # full microseconds, "Z" for UTC, and "HH:MM:SS[.ffffff]" for times.
+        if isinstance(obj, datetime.datetime):
+            representation = obj.isoformat()
+            return representation[:-6] + 'Z' if representation.endswith('+00:00') else representation
+        if isinstance(obj, (datetime.date, datetime.time)):
+            return obj.isoformat()
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+        return _default(obj)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class ColumnarRenderer(ORJSONRenderer):
+    """
+    Selected with ``?format=columnar`` on the review listings; the view builds
+    the columnar body (see ``columnar.py``), this only renders it as JSON.
+    """
+    format = 'columnar'
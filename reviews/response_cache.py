@@ -0,0 +1,164 @@
+"""
+Server-side cache for the public (``AllowAny``) analytics responses.
+
+``cached_response`` stores the ``data`` of a successful response in Django's
+cache (``REVIEWS_RESPONSE_CACHE``, the ``default`` alias unless configured)
+under a key built from the view, its URL kwargs and the query parameters it
+actually reads, normalized (defaults filled in, values stripped, unknown
+parameters ignored), so ``?days=30`` and no ``days`` share one entry.  Views
+with numeric parameters pass ``clean`` instead: the parameters are parsed
+and clamped before the lookup, so invalid input is a 400 and the number of
+distinct entries stays bounded.
+
+Entries are tagged (``reviews``, ``interactions``, ``products``,
+``product:<pk>``).  Every tag has a token stored in the same cache and the
+token of each tag is part of the entry key, so clearing a tag is one
+``cache.set`` of a new token: old entries are never read again and simply
+expire.  This needs no key listing, so it works the same with the
+local-memory and file-based backends.  Tags are cleared by the signal
+handlers in ``signals.py`` (and by ``bulk_set_visibility``); the TTL bounds
+anything else, e.g. reviews leaving a "last N days" window.
+
+Staff users can bypass (and refresh) the cache with ``?refresh=1`` or a
+``Cache-Control: no-cache`` request header.  Responses carry ``X-Cache:
+HIT|MISS|BYPASS`` and per-process counters are available from
+``response_cache_info()``.
+"""
+from collections import Counter
+from functools import wraps
+from hashlib import blake2b
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = 'reviews:response'
+DEFAULT_TTL = 300
+
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def get_response_cache():
+    return caches[getattr(settings, 'REVIEWS_RESPONSE_CACHE', 'default')]
+
+
+def _tag_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def tag_tokens(tags):
+    """Current token of every tag (tags seen for the first time get a new one)."""
+    cache = get_response_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    tokens = cache.get_many(list(keys))
+    for key in keys:
+        if key not in tokens:
+            cache.add(key, uuid.uuid4().hex, None)
+            tokens[key] = cache.get(key)
+    return [tokens[key] for key in sorted(keys)]
+
+
+def _new_tokens(tags):
+    get_response_cache().set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+
+
+def invalidate_tags(*tags):
+    """Drop every cached response tagged with any of ``tags``."""
+    if not tags:
+        return
+    _new_tokens(tags)
+    # داخل transaction: طلب آخر قد يخزّن البيانات القديمة قبل الـ commit، فنبطل مرة ثانية بعده
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _new_tokens(tags))
+
+
+def product_tags(product_ids):
+    return [f'product:{product_id}' for product_id in product_ids if product_id is not None]
+
+
+def _count(name, event):
+    with _lock:
+        _stats[(name, event)] += 1
+
+
+def response_cache_info():
+    """Hit/miss/bypass counters of this process, per cached view and in total."""
+    with _lock:
+        stats = dict(_stats)
+    views = {}
+    for (name, event), total in stats.items():
+        views.setdefault(name, {'hits': 0, 'misses': 0, 'bypasses': 0})[event] += total
+    totals = {event: sum(view[event] for view in views.values()) for event in ('hits', 'misses', 'bypasses')}
+    for counters in [*views.values(), totals]:
+        lookups = counters['hits'] + counters['misses']
+        counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+    return {'views': views, **totals}
+
+
+def reset_response_cache_info():
+    with _lock:
+        _stats.clear()
+
+
+def wants_refresh(request):
+    if not (request.user and request.user.is_staff):
+        return False
+    return (request.query_params.get('refresh') == '1'
+            or 'no-cache' in request.META.get('HTTP_CACHE_CONTROL', ''))
+
+
+def cached_response(name, tags, params=None, ttl=None, extra=None, clean=None):
+    """
+    Decorator for a DRF view method.
+
+    ``tags``: list of tags, or ``tags(kwargs)`` for tags that depend on the
+    URL (e.g. ``product:<pk>``).  ``params``: ``{query param: default}`` the
+    view reads.  ``extra(request)`` adds anything else the data depends on.
+    ``clean(request)`` returns ``{param: parsed value}``, used in the key and
+    passed to the view as keyword arguments, or raises ``ValueError`` (its
+    message is the 400 ``detail``).
+    """
+    params = params or {}
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            view_tags = tags(kwargs) if callable(tags) else tags
+            normalized = [
+                (param, str(request.query_params.get(param, default)).strip())
+                for param, default in sorted(params.items())
+            ]
+            cleaned = {}
+            if clean:
+                try:
+                    cleaned = clean(request)
+                except ValueError as error:
+                    return Response({'detail': str(error)}, status=400)
+                normalized += sorted(cleaned.items())
+            parts = [name, repr(sorted(kwargs.items())), repr(normalized),
+                     extra(request) if extra else '', *tag_tokens(view_tags)]
+            key = f"{KEY_PREFIX}:{name}:{blake2b('|'.join(parts).encode(), digest_size=16).hexdigest()}"
+
+            cache = get_response_cache()
+            refresh = wants_refresh(request)
+            if refresh:
+                _count(name, 'bypasses')
+            else:
+                data = cache.get(key)
+                if data is not None:
+                    _count(name, 'hits')
+                    return Response(data, headers={'X-Cache': 'HIT'})
+                _count(name, 'misses')
+
+            response = view_method(self, request, *args, **kwargs, **cleaned)
+            if response.status_code == 200 and isinstance(response, Response):
+                timeout = getattr(settings, 'REVIEWS_RESPONSE_CACHE_TTL', DEFAULT_TTL) if ttl is None else ttl
+                cache.set(key, response.data, timeout)
+            response['X-Cache'] = 'BYPASS' if refresh else 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,211 @@
+"""
+Hourly and daily activity rollups.
+
+``ReviewActivityRollup`` / ``ProductActivityRollup`` hold, per review and per
+product, the number of views, helpful votes (``interactions``) and comments
+(and new reviews, per product) of each hour (``granularity='hour'``) or day
+(``'day'``); ``bucket`` is the UTC start of the period.
+
+* Views have no raw rows: the view buffer adds each batch it writes to the
+  current hour (``add_views``, one ``INSERT ... ON CONFLICT DO NOTHING`` and
+  one ``UPDATE ... + CASE`` per table).
+* Votes, comments and new reviews are recomputed from their
+  tables' ``created_at`` for a window of recent hours (``rollup_hours``), so
+  running it again is harmless and deletions are reflected.
+* ``compact_days`` sums the hourly rows of every finished day into its daily
+  row and ``expire_hours`` deletes hourly rows older than
+  ``REVIEWS_ROLLUP_RETENTION_DAYS`` (whole days only, so a daily row is never
+  recomputed from half a day).
+
+``python manage.py rollup_activity`` runs the three steps;
+``product_activity`` reads a product's series from rollup rows only.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, PositiveIntegerField, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import (
+    ActivityRollup, ProductActivityRollup, Review, ReviewActivityRollup,
+    ReviewComment, ReviewInteraction,
+)
+
+HOUR = ActivityRollup.HOUR
+DAY = ActivityRollup.DAY
+EVENT_FIELDS = ['interactions', 'comments']
+FIELDS = ['views', *EVENT_FIELDS]
+PRODUCT_FIELDS = [*FIELDS, 'new_reviews']
+# جدول المصدر لكل عدّاد (المشاهدات تأتي من الـ view buffer)
+EVENT_SOURCES = [
+    (ReviewInteraction, 'interactions'),
+    (ReviewComment, 'comments'),
+]
+
+
+def retention_days():
+    return getattr(settings, 'REVIEWS_ROLLUP_RETENTION_DAYS', 7)
+
+
+def hour_start(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment):
+    return hour_start(moment).replace(hour=0)
+
+
+def _increment(model, key, deltas, bucket, field):
+    """``field += delta`` on the hourly row of every ``{key value: delta}`` (rows created if missing)."""
+    if not deltas:
+        return
+    model.objects.bulk_create(
+        [model(**{key: pk}, granularity=HOUR, bucket=bucket) for pk in deltas], ignore_conflicts=True,
+    )
+    model.objects.filter(granularity=HOUR, bucket=bucket, **{f'{key}__in': list(deltas)}).update(**{
+        field: F(field) + Case(
+            *[When(**{key: pk}, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0), output_field=PositiveIntegerField(),
+        ),
+    })
+
+
+def add_views(counts, when=None):
+    """Add ``{review_id: views}`` to the hourly rollups of the reviews and their products."""
+    bucket = hour_start(when or timezone.now())
+    products = dict(Review.objects.filter(pk__in=list(counts)).values_list('pk', 'product_id'))
+    review_views = {review_id: views for review_id, views in counts.items() if review_id in products}
+    product_views = Counter()
+    for review_id, views in review_views.items():
+        product_views[products[review_id]] += views
+    with transaction.atomic():
+        _increment(ReviewActivityRollup, 'review_id', review_views, bucket, 'views')
+        _increment(ProductActivityRollup, 'product_id', dict(product_views), bucket, 'views')
+
+
+def rollup_hours(since, until=None):
+    """
+    Recompute the event counters of the hourly rows in ``[since, until)``
+    from the source tables (views are left alone).  Returns the number of
+    review and product rows written.
+    """
+    since = hour_start(since)
+    until = hour_start(until or timezone.now()) + timedelta(hours=1)
+    hour = TruncHour('created_at', tzinfo=dt_timezone.utc)
+
+    review_rows = defaultdict(Counter)
+    product_rows = defaultdict(Counter)
+    for model, field in EVENT_SOURCES:
+        counts = (model.objects.filter(created_at__gte=since, created_at__lt=until)
+                  .values('review_id', 'review__product_id', bucket=hour).annotate(n=Count('id')).order_by())
+        for row in counts:
+            review_rows[(row['review_id'], row['bucket'])][field] += row['n']
+            product_rows[(row['review__product_id'], row['bucket'])][field] += row['n']
+    new_reviews = (Review.objects.filter(created_at__gte=since, created_at__lt=until)
+                   .values('product_id', bucket=hour).annotate(n=Count('id')).order_by())
+    for row in new_reviews:
+        product_rows[(row['product_id'], row['bucket'])]['new_reviews'] += row['n']
+
+    window = {'granularity': HOUR, 'bucket__gte': since, 'bucket__lt': until}
+    with transaction.atomic():
+        # نصفّر النافذة أولًا: الساعات التي حُذفت كل أحداثها يجب أن تعود إلى صفر
+        ReviewActivityRollup.objects.filter(**window).update(**dict.fromkeys(EVENT_FIELDS, 0))
+        ProductActivityRollup.objects.filter(**window).update(**dict.fromkeys([*EVENT_FIELDS, 'new_reviews'], 0))
+        ReviewActivityRollup.objects.bulk_create(
+            [ReviewActivityRollup(review_id=review_id, granularity=HOUR, bucket=bucket, **counts)
+             for (review_id, bucket), counts in review_rows.items()],
+            update_conflicts=True, unique_fields=['review', 'granularity', 'bucket'], update_fields=EVENT_FIELDS,
+        )
+        ProductActivityRollup.objects.bulk_create(
+            [ProductActivityRollup(product_id=product_id, granularity=HOUR, bucket=bucket, **counts)
+             for (product_id, bucket), counts in product_rows.items()],
+            update_conflicts=True, unique_fields=['product', 'granularity', 'bucket'],
+            update_fields=[*EVENT_FIELDS, 'new_reviews'],
+        )
+    return len(review_rows), len(product_rows)
+
+
+def _compact(model, key, fields, before):
+    daily = (model.objects.filter(granularity=HOUR, bucket__lt=before)
+             .values(key, day=TruncDay('bucket', tzinfo=dt_timezone.utc))
+             .annotate(**{f'total_{field}': Sum(field) for field in fields}).order_by())
+    rows = [model(**{key: row[key]}, granularity=DAY, bucket=row['day'],
+                  **{field: row[f'total_{field}'] for field in fields})
+            for row in daily]
+    model.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=[key.removesuffix('_id'), 'granularity', 'bucket'],
+        update_fields=fields,
+    )
+    return len(rows)
+
+
+def compact_days(now=None):
+    """(Re)write the daily rows of every finished day that still has hourly rows."""
+    today = day_start(now or timezone.now())
+    with transaction.atomic():
+        return (_compact(ReviewActivityRollup, 'review_id', FIELDS, today),
+                _compact(ProductActivityRollup, 'product_id', PRODUCT_FIELDS, today))
+
+
+def expire_hours(days=None, now=None):
+    """Delete hourly rows of the days older than the retention window (already compacted)."""
+    days = retention_days() if days is None else days
+    cutoff = day_start(now or timezone.now()) - timedelta(days=days)
+    reviews, _ = ReviewActivityRollup.objects.filter(granularity=HOUR, bucket__lt=cutoff).delete()
+    products, _ = ProductActivityRollup.objects.filter(granularity=HOUR, bucket__lt=cutoff).delete()
+    return reviews, products
+
+
+def _empty():
+    return dict.fromkeys(PRODUCT_FIELDS, 0)
+
+
+def product_activity(product_id, start, end, granularity=DAY):
+    """
+    Series of ``product_id`` for the dates ``start``..``end`` (inclusive),
+    one entry per hour or day, zeros included.  Days not compacted yet (e.g.
+    today) are summed from their hourly rows.
+    """
+    first = datetime.combine(start, time.min, tzinfo=dt_timezone.utc)
+    last = datetime.combine(end, time.min, tzinfo=dt_timezone.utc) + timedelta(days=1)
+    rows = ProductActivityRollup.objects.filter(product_id=product_id, bucket__gte=first, bucket__lt=last)
+    step = timedelta(days=1) if granularity == DAY else timedelta(hours=1)
+
+    buckets = {}
+    if granularity == HOUR:
+        for row in rows.filter(granularity=HOUR).values('bucket', *PRODUCT_FIELDS):
+            buckets[row.pop('bucket')] = row
+    else:
+        for row in rows.filter(granularity=DAY).values('bucket', *PRODUCT_FIELDS):
+            buckets[row.pop('bucket')] = row
+        hourly = (rows.filter(granularity=HOUR).values(day=TruncDay('bucket', tzinfo=dt_timezone.utc))
+                  .annotate(**{f'total_{field}': Sum(field) for field in PRODUCT_FIELDS}).order_by())
+        for row in hourly:
+            # اليوم المضغوط يحتوي ساعاته كلها مسبقًا
+            buckets.setdefault(row['day'], {field: row[f'total_{field}'] for field in PRODUCT_FIELDS})
+
+    series = []
+    moment = first
+    while moment < last:
+        series.append({'bucket': moment, **buckets.get(moment, _empty())})
+        moment += step
+    totals = {field: sum(point[field] for point in series) for field in PRODUCT_FIELDS}
+    return series, totals
+
+
+def rollup_activity(hours=24, days=None, now=None):
+    """
+    The periodic job: recompute the last ``hours`` hours, compact finished
+    days, expire old hours.  Hours before the retention window are not
+    recomputed (their views are only in the daily rows).
+    """
+    now = now or timezone.now()
+    days = retention_days() if days is None else days
+    since = max(now - timedelta(hours=hours), day_start(now) - timedelta(days=days))
+    review_rows, product_rows = rollup_hours(since, now)
+    compacted = compact_days(now)
+    expired = expire_hours(days, now)
+    return {'hourly': (review_rows, product_rows), 'daily': compacted, 'expired': expired}
@@ -0,0 +1,177 @@
+"""
+Sentiment analysis for reviews.
+
+Scoring with TextBlob is too slow to run inside the request, so by default
+``Review.save()`` only marks the review as pending and the
+``process_sentiment_queue`` management command scores pending reviews in
+batches.  The queue is the ``Review`` table itself (``sentiment_pending`` plus
+a partial index), so no external broker is needed.
+
+Set ``REVIEWS_SENTIMENT_MODE = 'sync'`` to score inline instead (used by tests).
+
+Polarity scores are memoised in a bounded LRU cache keyed by a hash of the
+backend name and the text, so repeated or templated reviews are only scored
+once per process.  The scorer itself is pluggable, see ``sentiment_backends``.
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+
+def is_sync_mode():
+    return getattr(settings, 'REVIEWS_SENTIMENT_MODE', 'queue') == 'sync'
+
+
+def label_for_polarity(polarity):
+    """Map a polarity score to the label stored on ``Review.sentiment``."""
+    if polarity > POSITIVE_THRESHOLD:
+        return 'Positive'
+    if polarity < NEGATIVE_THRESHOLD:
+        return 'Negative'
+    return 'Neutral'
+
+
+class SentimentCache:
+    """
+    Thread-safe LRU cache of ``text digest -> polarity`` with hit/miss counters.
+
+    Only the 16-byte digest is kept as the key, never the text itself, so the
+    memory used per entry stays small however long the reviews are.  Labels
+    are derived from the cached polarity on every call, so changing the
+    thresholds does not require clearing the cache.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(text, namespace=''):
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16, person=namespace.encode()[:16])
+        return key.digest()
+
+    def get_or_compute(self, text, compute, namespace=''):
+        return self.get_or_compute_many([text], lambda texts: [compute(texts[0])], namespace)[0]
+
+    def get_or_compute_many(self, texts, compute_many, namespace=''):
+        """
+        Look every text up at once and call ``compute_many`` a single time with
+        the distinct texts that were not cached.
+        """
+        keys = [self.digest(text, namespace) for text in texts]
+        values = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for position, key in enumerate(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    values[position] = self._entries[key]
+                else:
+                    self.misses += 1
+                    missing.setdefault(key, []).append(position)
+
+        if missing:
+            computed = compute_many([texts[positions[0]] for positions in missing.values()])
+            with self._lock:
+                for (key, positions), value in zip(missing.items(), computed):
+                    for position in positions:
+                        values[position] = value
+                    self._entries[key] = value
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return values
+
+    def info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+sentiment_cache = SentimentCache(getattr(settings, 'REVIEWS_SENTIMENT_CACHE_SIZE', 10000))
+
+
+def sentiment_cache_info():
+    """Hit/miss counters of this process's sentiment cache."""
+    return sentiment_cache.info()
+
+
+def score_texts(texts, backend=None):
+    """
+    Return ``(label, polarity)`` for each text, scoring the cache misses in one
+    ``score_batch`` call of ``backend`` (a name or instance, default from
+    settings).
+    """
+    from .sentiment_backends import get_sentiment_backend
+
+    if backend is None or isinstance(backend, str):
+        backend = get_sentiment_backend(backend)
+    polarities = sentiment_cache.get_or_compute_many(list(texts), backend.score_batch, backend.name)
+    return [(label_for_polarity(polarity), polarity) for polarity in polarities]
+
+
+def analyze_sentiment(text):
+    """Return ``(label, polarity)`` for a single text."""
+    return score_texts([text])[0]
+
+
+def process_pending_sentiment(batch_size=500):
+    """
+    Score one batch of pending reviews and write the results back with a
+    single ``bulk_update``.  Returns the number of reviews taken from the
+    queue, including edited ones left pending (see below), so 0 means the
+    queue is empty.
+
+    Rows are locked for the duration of the batch (``SKIP LOCKED`` where the
+    database supports it) so several workers can run side by side.  SQLite
+    has no row locks, so the write is also guarded by the scored text: a
+    review edited while the batch was being scored keeps its new text, stays
+    pending and is scored again by a later batch.
+    """
+    from .daily_stats import record_sentiments
+    from .models import Review
+
+    with transaction.atomic():
+        pending = Review.objects.filter(sentiment_pending=True).order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        elif connection.features.has_select_for_update:
+            pending = pending.select_for_update()
+        reviews = list(pending.only('pk', 'review_text')[:batch_size])
+        if not reviews:
+            return 0
+
+        scores = score_texts([review.review_text for review in reviews])
+        for review, (label, polarity) in zip(reviews, scores):
+            review.sentiment, review.sentiment_score = label, polarity
+            review.sentiment_pending = False
+
+        # نكتب فقط على المراجعات التي ما زال نصها هو النص الذي حُلّل (المقارنة هنا لا في SQL)
+        current = dict(Review.objects.filter(pk__in=[review.pk for review in reviews]).values_list('pk', 'review_text'))
+        unchanged = [review for review in reviews if current.get(review.pk) == review.review_text]
+        record_sentiments({review.pk: review.sentiment for review in unchanged})
+        Review.objects.bulk_update(
+            unchanged, ['sentiment', 'sentiment_score', 'sentiment_pending']
+        )
+    return len(reviews)
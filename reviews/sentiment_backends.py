@@ -0,0 +1,146 @@
+"""
+Pluggable sentiment scorers.
+
+A backend turns a batch of texts into polarity scores in [-1, 1]; labels are
+always derived with ``sentiment.label_for_polarity`` so every backend uses the
+same ±0.1 thresholds as ``Review.save()``.
+
+* ``textblob`` – TextBlob's pattern analyzer, one text at a time (the default).
+* ``lexicon``  – the same adjective lexicon TextBlob ships, applied to a whole
+  batch at once with NumPy.  It averages the polarity of the lexicon words in
+  each text and flips (and dampens) a word preceded by a negation, but skips
+  TextBlob's intensifier and idiom handling, so scores are close to but not
+  identical with the ``textblob`` backend.
+
+Select the default with ``REVIEWS_SENTIMENT_BACKEND``.
+"""
+import os
+import string
+import threading
+from xml.etree import ElementTree
+
+from django.conf import settings
+
+
+class SentimentBackend:
+    name = None
+
+    def score_batch(self, texts):
+        """Return a list of polarity scores, one per text."""
+        raise NotImplementedError
+
+    def score(self, text):
+        return self.score_batch([text])[0]
+
+
+class TextBlobBackend(SentimentBackend):
+    name = 'textblob'
+
+    def score_batch(self, texts):
+        from textblob import TextBlob
+        return [TextBlob(text).sentiment.polarity for text in texts]
+
+
+class LexiconBackend(SentimentBackend):
+    name = 'lexicon'
+
+    # Punctuation and digits become spaces so ``str.split`` can tokenize;
+    # apostrophes are kept for "don't", "isn't"...
+    SEPARATORS = str.maketrans({char: ' ' for char in string.punctuation.replace("'", '') + string.digits})
+    NEGATIONS = ('not', 'never', 'no', "isn't", "don't", "doesn't", "wasn't", "didn't", "aren't")
+    NEGATION_FACTOR = -0.5
+
+    def __init__(self, lexicon=None):
+        self._lexicon = lexicon
+        self._tables = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load_textblob_lexicon():
+        """Average polarity per word form from TextBlob's ``en-sentiment.xml``."""
+        import textblob
+        path = os.path.join(os.path.dirname(textblob.__file__), 'en', 'en-sentiment.xml')
+        totals = {}
+        for _, element in ElementTree.iterparse(path):
+            if element.tag != 'word':
+                continue
+            form = element.get('form', '').lower()
+            if form:
+                total, count = totals.get(form, (0.0, 0))
+                totals[form] = (total + float(element.get('polarity', 0)), count + 1)
+            element.clear()
+        return {form: total / count for form, (total, count) in totals.items()}
+
+    def _get_tables(self):
+        """
+        ``(word -> index, polarity per index, negation flag per index)``.
+        Negation words are appended to the vocabulary (with polarity 0 unless
+        the lexicon rates them) so a single lookup classifies every token.
+        """
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    import numpy as np
+                    lexicon = self._lexicon if self._lexicon is not None else self.load_textblob_lexicon()
+                    index = {word: position for position, word in enumerate(sorted(lexicon))}
+                    rated = len(index)
+                    for word in self.NEGATIONS:
+                        index.setdefault(word, len(index))
+                    polarity = np.zeros(len(index) + 1)  # last slot: unknown words
+                    polarity[:rated] = [lexicon[word] for word in sorted(lexicon)]
+                    in_lexicon = np.zeros(len(index) + 1, dtype=bool)
+                    in_lexicon[:rated] = True
+                    negation = np.zeros(len(index) + 1, dtype=bool)
+                    negation[[index[word] for word in self.NEGATIONS]] = True
+                    self._tables = (index, polarity, in_lexicon, negation)
+        return self._tables
+
+    def score_batch(self, texts):
+        import numpy as np
+
+        index, polarity, in_lexicon, negation = self._get_tables()
+        if not len(texts):
+            return []
+
+        # Tokenize every text, then work on one flat token array for the batch.
+        token_lists = [text.lower().translate(self.SEPARATORS).split() for text in texts]
+        lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(texts))
+        unknown = len(polarity) - 1
+        ids = np.fromiter(
+            (index.get(token, unknown) for tokens in token_lists for token in tokens),
+            dtype=np.int64, count=int(lengths.sum()),
+        )
+        if not len(ids):
+            return [0.0] * len(texts)
+        owner = np.repeat(np.arange(len(texts)), lengths)
+
+        known = in_lexicon[ids]
+        scores = polarity[ids]
+
+        # A lexicon word right after a negation (within the same text) is flipped.
+        after_negation = np.zeros(len(ids), dtype=bool)
+        after_negation[1:] = negation[ids[:-1]] & (owner[1:] == owner[:-1])
+        scores = np.where(after_negation, scores * self.NEGATION_FACTOR, scores)
+
+        sums = np.bincount(owner, weights=scores, minlength=len(texts))
+        counts = np.bincount(owner, weights=known.astype(np.float64), minlength=len(texts))
+        averages = np.divide(sums, counts, out=np.zeros(len(texts)), where=counts > 0)
+        return np.clip(averages, -1.0, 1.0).tolist()
+
+
+BACKENDS = {
+    backend.name: backend for backend in (TextBlobBackend, LexiconBackend)
+}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_sentiment_backend(name=None):
+    """Return the (shared) backend instance for ``name`` or the configured default."""
+    name = name or getattr(settings, 'REVIEWS_SENTIMENT_BACKEND', 'textblob')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{name}'")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
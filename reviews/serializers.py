@@ -8,15 +8,49 @@ from .models import (
     ReviewReport,
     BannedWord,
     ReviewComment,
-    ReviewVote,
     ReviewInteraction,
     Notification
 )
 
+from .view_counter import view_count
+from .viewer_state import ReviewViewerState
+
 User = get_user_model()  # للحصول على موديل المستخدم المخصص
 
+SNIPPET_LENGTH = 140
+
+
+def _parse_field_list(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def sparse_field_names(request, available, optional=()):
+    """
+    Field names to render for this request: ``?fields=a,b`` keeps only those,
+    ``?omit=a,b`` drops them.  ``optional`` fields are only rendered when they
+    are named in ``?fields``.  Writes always use the full field set.
+    """
+    names = set(available) - set(optional)
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return names
+    requested = _parse_field_list(request.query_params.get('fields'))
+    if requested:
+        names = requested & set(available)
+    return names - _parse_field_list(request.query_params.get('omit'))
+
+
+# ✅ دعم ?fields= و ?omit= : الحقول غير المطلوبة تُحذف من الـ serializer فلا تُحسب أصلًا
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = sparse_field_names(self.context.get('request'), self.fields.keys(),
+                                  getattr(self.Meta, 'optional_fields', ()))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
 # ✅ سيريالايزر لعرض تفاصيل المنتج مع تقييمه وعدد مراجعاته
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     average_rating = serializers.FloatField(read_only=True)  # التقييم المتوسط (يتم احتسابه من الـ View)
     reviews_count = serializers.IntegerField(read_only=True)  # عدد المراجعات
 
@@ -24,8 +58,20 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'description', 'price', 'average_rating', 'reviews_count']
 
+# ✅ عند عرض قائمة مراجعات: تحميل حالة المستخدم الحالي (بلاغات، تفاعلات، أصوات)
+# لكل الصفحة مرة واحدة بدل استعلام لكل مراجعة
+class ReviewListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        reviews = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        self.context['viewer_state'] = ReviewViewerState(
+            reviews, getattr(request, 'user', None), fields=self.child.fields.keys()
+        )
+        return super().to_representation(reviews)
+
+
 # ✅ سيريالايزر لعرض تفاصيل المراجعة مع معلومات إضافية عنها (عدد الإعجابات، هل المستخدِم تفاعل، الخ...)
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)  # عرض اسم المستخدم بدلاً من ID
     views = serializers.SerializerMethodField()
 
@@ -36,49 +82,57 @@ class ReviewSerializer(serializers.ModelSerializer):
     user_interacted = serializers.SerializerMethodField()
     user_voted = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
+    snippet = serializers.SerializerMethodField()  # أول SNIPPET_LENGTH حرف من النص (فقط عند طلبه في ?fields=)
 
     class Meta:
         model = Review
         fields = [
             'id', 'product', 'user', 'rating', 'review_text',
             'created_at', 'visible', 'likes', 'dislikes', 'views',
-            'has_report', 'user_interacted','user_voted', 'comments_count'
+            'has_report', 'user_interacted','user_voted', 'comments_count', 'snippet'
         ]
+        optional_fields = ['snippet']
         read_only_fields = ['id', 'user', 'created_at', 'visible']
+        list_serializer_class = ReviewListSerializer
 
     # task 9 section 5 (sabah)
 
+    def viewer_state(self, obj):
+        """حالة المستخدم الحالي تجاه المراجعة (محمّلة مسبقًا للقائمة، أو لهذه المراجعة وحدها)"""
+        state = self.context.get('viewer_state')
+        if state is None or not state.covers(obj):
+            request = self.context.get('request')
+            state = ReviewViewerState([obj], getattr(request, 'user', None), fields=self.fields.keys())
+            self.context['viewer_state'] = state
+        return state
+
     def get_likes(self, obj):
-        return obj.likes  # عدد التفاعلات المفيدة
+        return obj.helpful_count  # عدد التفاعلات المفيدة (عداد مخزّن)
 
     def get_dislikes(self, obj):
-        return obj.dislikes  # عدد التفاعلات غير المفيدة
+        return obj.unhelpful_count  # عدد التفاعلات غير المفيدة (عداد مخزّن)
 
     def get_has_report(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.reports.filter(user=user).exists()  # هل المستخدم الحالي أبلغ عن هذه المراجعة؟
-        return False
+        return obj.pk in self.viewer_state(obj).reported  # هل المستخدم الحالي أبلغ عن هذه المراجعة؟
 
     def get_user_interacted(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return obj.interactions.filter(user=user).exists()  # هل تفاعل المستخدم مع المراجعة؟
-        return False
+        return obj.pk in self.viewer_state(obj).interacted  # هل تفاعل المستخدم مع المراجعة؟
 
     def get_user_voted(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            vote = obj.votes.filter(user=user).first()
-            if vote:
-                return "helpful" if vote.helpful else "not_helpful"
-        return None
+        vote = self.viewer_state(obj).votes.get(obj.pk)
+        if vote is None:
+            return None
+        return "helpful" if vote else "not_helpful"
     
     def get_comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments_count
     
     def get_views(self, obj):
-        return obj.views.count()  # Adjust based on your actual model logic
+        return view_count(obj)  # المحفوظ في قاعدة البيانات + المشاهدات التي لم تُكتب بعد (view_counter.py)
+
+    def get_snippet(self, obj):
+        text = obj.review_text
+        return text if len(text) <= SNIPPET_LENGTH else text[:SNIPPET_LENGTH].rstrip() + '…'
 
 
 # ✅ سيريالايزر لتسجيل مستخدم جديد
@@ -106,14 +160,14 @@ class ReviewCommentSerializer(serializers.ModelSerializer):
         # يتم ضبط user و review داخل الـ view نفسه
         return ReviewComment.objects.create(**validated_data)
 
-# ✅ سيريالايزر لتقييم مفيد/غير مفيد على مراجعة
+# ✅ سيريالايزر لتقييم مفيد/غير مفيد على مراجعة (صف في مخزن الأصوات ReviewInteraction)
 class ReviewVoteSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
     review = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
-        model = ReviewVote
+        model = ReviewInteraction
         fields = ['id', 'review', 'user', 'username', 'helpful', 'created_at']
         read_only_fields = ['id', 'user', 'review', 'created_at']
 
@@ -122,7 +176,7 @@ class ReviewVoteSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        return ReviewVote.objects.create(**validated_data)
+        return ReviewInteraction.objects.create(**validated_data)
 
 # mjd⬇
 # ✅ سيريالايزر لتفاعل المستخدم مع مراجعة (مفيد / غير مفيد)
@@ -0,0 +1,174 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .counters import adjust_counters, helpful_deltas
+from .daily_stats import add_daily_contribution, apply_daily_deltas, daily_state, new_daily_deltas
+from .leaderboard import refill_boards, review_changed
+from .models import (
+    BannedWord, Product, ProductVersion, Review, ReviewComment, ReviewInteraction, ReviewReport,
+)
+from .moderation import invalidate_banned_word_matcher, refresh_banned_word_fields, sync_banned_word_severity
+from .rating_stats import add_contribution, apply_rating_deltas, new_deltas, rating_state
+from .response_cache import invalidate_tags, product_tags
+from .versions import bump_product_versions, bump_review_products
+from .view_counter import view_buffer
+
+
+# ✅ أي إضافة/تعديل/حذف لكلمة محظورة (من الـ API أو لوحة الإدارة) تعيد بناء الـ matcher
+@receiver(post_save, sender=BannedWord)
+def banned_word_saved(sender, instance, created, **kwargs):
+    invalidate_banned_word_matcher()
+    if not created:
+        sync_banned_word_severity(instance)
+
+
+@receiver(pre_delete, sender=BannedWord)
+def banned_word_deleting(sender, instance, **kwargs):
+    # صفوف الربط تُحذف بالـ CASCADE قبل post_delete، لذلك نحفظ المراجعات المتأثرة هنا
+    instance._affected_review_ids = list(instance.matches.values_list('review_id', flat=True))
+
+
+@receiver(post_delete, sender=BannedWord)
+def banned_word_deleted(sender, instance, **kwargs):
+    invalidate_banned_word_matcher()
+    # الكلمة لم تعد محظورة: تُحذف من المراجعات التي وُجدت فيها (فلتر with_banned_words، لوحة الإدارة...)
+    refresh_banned_word_fields(getattr(instance, '_affected_review_ids', []))
+
+
+# ✅ العدادات المخزّنة على المراجعة (helpful_count, comments_count, ...) تُحدَّث هنا بـ F()
+# (الأصوات المكتوبة عبر votes.py لا تمر بالـ signals وتطبّق نفس الآثار بنفسها)
+@receiver(pre_save, sender=ReviewInteraction)
+def interaction_saving(sender, instance, **kwargs):
+    # نسخة لم تُحمّل من قاعدة البيانات (مثلًا أُنشئت بـ pk يدويًا): نقرأ القيمة المحفوظة
+    if not instance._state.adding and getattr(instance, '_loaded_helpful', None) is None:
+        instance._loaded_helpful = sender.objects.filter(pk=instance.pk)\
+            .values_list('helpful', flat=True).first()
+
+
+@receiver(post_save, sender=ReviewInteraction)
+def interaction_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_helpful', None)
+    if created:
+        adjust_counters(instance.review_id, interaction_count=1, **helpful_deltas(instance.helpful))
+    elif previous is not None and previous != instance.helpful:
+        adjust_counters(instance.review_id, **helpful_deltas(previous, -1), **helpful_deltas(instance.helpful))
+    instance._loaded_helpful = instance.helpful
+
+
+@receiver(post_delete, sender=ReviewInteraction)
+def interaction_deleted(sender, instance, **kwargs):
+    helpful = getattr(instance, '_loaded_helpful', None)
+    helpful = instance.helpful if helpful is None else helpful
+    adjust_counters(instance.review_id, interaction_count=-1, **helpful_deltas(helpful, -1))
+
+
+@receiver(post_save, sender=ReviewComment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counters(instance.review_id, comments_count=1)
+
+
+@receiver(post_delete, sender=ReviewComment)
+def comment_deleted(sender, instance, **kwargs):
+    adjust_counters(instance.review_id, comments_count=-1)
+
+
+@receiver(post_save, sender=ReviewReport)
+def report_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counters(instance.review_id, reports_count=1)
+
+
+@receiver(post_delete, sender=ReviewReport)
+def report_deleted(sender, instance, **kwargs):
+    adjust_counters(instance.review_id, reports_count=-1)
+
+
+# ✅ حذف مراجعة (مباشرة أو بالـ CASCADE) يُنقص إحصائيات تقييم المنتج وإحصائياته اليومية
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    state = getattr(instance, '_loaded_rating_state', None) or rating_state(instance)
+    deltas = new_deltas()
+    add_contribution(deltas, state, -1)
+    apply_rating_deltas(deltas)
+    daily = new_daily_deltas()
+    add_daily_contribution(daily, getattr(instance, '_loaded_daily_state', None) or daily_state(instance), -1)
+    apply_daily_deltas(daily)
+
+
+# ✅ إصدار المنتج (ETag / 304): أي تغيير يظهر في مراجعات المنتج يزيد رقم الإصدار
+# (حفظ المراجعة نفسها يتم داخل Review.save، والإظهار/الإخفاء الجماعي في bulk_set_visibility)
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    if created:
+        ProductVersion.objects.bulk_create([ProductVersion(product=instance)], ignore_conflicts=True)
+    else:
+        bump_product_versions([instance.pk])
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted_version(sender, instance, **kwargs):
+    bump_product_versions([instance.product_id])
+
+
+@receiver(post_save, sender=ReviewInteraction)
+@receiver(post_delete, sender=ReviewInteraction)
+@receiver(post_save, sender=ReviewComment)
+@receiver(post_delete, sender=ReviewComment)
+@receiver(post_save, sender=ReviewReport)
+@receiver(post_delete, sender=ReviewReport)
+def review_activity_changed(sender, instance, **kwargs):
+    bump_review_products([instance.review_id])
+
+
+# ✅ كاش ردود التحليلات العامة (response_cache.py): إبطال الوسوم المتأثرة فقط
+@receiver(post_save, sender=Review)
+def review_saved_response_cache(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'views'}:
+        return
+    # _loaded_rating_state ما زال يحمل المنتج السابق هنا (يُحدَّث بعد post_save)
+    previous = getattr(instance, '_loaded_rating_state', None)
+    invalidate_tags('reviews', *product_tags({instance.product_id, previous[0] if previous else None}))
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted_response_cache(sender, instance, **kwargs):
+    invalidate_tags('reviews', *product_tags([instance.product_id]))
+
+
+@receiver(post_save, sender=ReviewInteraction)
+@receiver(post_delete, sender=ReviewInteraction)
+def interaction_changed_response_cache(sender, instance, **kwargs):
+    invalidate_tags('interactions')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed_response_cache(sender, instance, **kwargs):
+    invalidate_tags('products', *product_tags([instance.pk]))
+
+
+# ✅ المشاهدات المؤجّلة (view_counter.py) لا تنتقل إلى مراجعة جديدة تأخذ نفس الـ id
+@receiver(post_save, sender=Review)
+def review_created_views(sender, instance, created, **kwargs):
+    if created:
+        view_buffer.discard(instance.pk)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted_views(sender, instance, **kwargs):
+    view_buffer.discard(instance.pk)
+
+
+# ✅ لوحات أفضل المراجعات (leaderboard.py): تغيّر الظهور أو المنتج يُحدّث اللوحات المعنية فقط
+@receiver(post_save, sender=Review)
+def review_saved_leaderboard(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'views'}:
+        return
+    review_changed(instance.pk)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted_leaderboard(sender, instance, **kwargs):
+    # مدخلاتها حُذفت بالـ CASCADE؛ نكمل اللوحات التي نقصت
+    refill_boards([instance.product_id])
@@ -1,4 +1,4 @@
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
@@ -7,6 +7,69 @@ from .models import Product, Review, BannedWord, ReviewInteraction
 from django.utils import timezone
 from datetime import timedelta
 import json
+import datetime
+import decimal
+import io
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from reviews import sentiment
+from reviews.admin import review_insights
+from reviews.analysis import ANALYZER_VERSION
+from reviews.counters import COUNTER_FIELDS, wilson_lower_bound
+from reviews.daily_stats import compute_daily_stats
+from reviews.hll import HyperLogLog, viewer_hash
+from reviews.leaderboard import rebuild_board
+from reviews.models import (
+    BannedWordListVersion, GlobalLeaderboard, ProductActivityRollup, ProductRatingStats, ProductVersion, ReviewActivityRollup,
+    ReviewBannedWordMatch, ReviewComment, ReviewDailyStats, ReviewLeaderboardEntry, ReviewReport,
+    ReviewViewerSketch,
+)
+from reviews.moderation import BannedWordMatcher, find_banned_words
+from reviews.rating_stats import bulk_set_visibility
+from reviews.renderers import ORJSONParser, ORJSONRenderer
+from reviews.response_cache import reset_response_cache_info, response_cache_info
+from reviews.rollups import compact_days, rollup_activity, rollup_hours
+from reviews.sentiment import SentimentCache, label_for_polarity, process_pending_sentiment, sentiment_cache
+from reviews.sentiment_backends import LexiconBackend, get_sentiment_backend
+from reviews.view_counter import flush_views, view_buffer
+from reviews.views import REVIEW_SORTS
+from reviews.votes import cast_vote, retract_vote
+
+# المشاهدات تُكتب في الاختبارات صراحة عبر flush_views()، لا بخيط خلفي خارج معاملة الاختبار،
+# ويُفرَّغ الـ buffer في النهاية حتى لا يكتبها خطاف الخروج في قاعدة البيانات الحقيقية.
+# وإصدار قائمة الكلمات المحظورة يُقرأ مع كل فحص: التراجع عن معاملة كل اختبار لا يمر بالـ matcher
+_test_settings = override_settings(REVIEWS_VIEW_BACKGROUND_FLUSH=False, REVIEWS_BANNED_WORDS_RECHECK_SECONDS=0)
+
+
+def setUpModule():
+    _test_settings.enable()
+
+
+def tearDownModule():
+    view_buffer.clear()
+    _test_settings.disable()
+
+
+class WriterProductTestCase(APITestCase):
+    """Shared fixture of the feature tests: a ``writer`` user and a ``Phone`` product."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', password='pass123')
+        cls.product = Product.objects.create(name='Phone', description='D', price=10)
 
 
 class ReviewSystemTests(APITestCase):
@@ -285,12 +348,6 @@ class BannedWordsTestCase(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertIn('vulgar', response.data[0]['banned_words_found'])
 
-from django.test import TestCase
-from rest_framework.test import APIClient
-from django.contrib.auth.models import User
-from reviews.models import Product, Review, ReviewInteraction
-from rest_framework import status
-
 class ReviewInteractionTestCase(TestCase):
     def setUp(self):
     # 1. إنشاء مستخدمين
@@ -488,6 +545,7 @@ class ReviewAdminTests(TestCase):
         
         self.product = Product.objects.create(name='Test Product', price=9.99)
         self.user = User.objects.create_user(username='testuser', password='12345')
+        BannedWord.objects.create(word='badword1', severity=2)
         
         # Create test reviews
         Review.objects.create(
@@ -626,3 +684,1472 @@ class BannedWordAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class BannedWordMatcherTestCase(WriterProductTestCase):
+    def setUp(self):
+        BannedWord.objects.create(word='vulgar', severity=3)
+
+    def test_matcher_reports_overlapping_words_in_list_order(self):
+        matcher = BannedWordMatcher(['badword', 'Bad', 'word'])
+        self.assertEqual(matcher.find('This is BADWORD1'), ['badword', 'Bad', 'word'])
+        self.assertEqual(matcher.find('clean text'), [])
+
+    def test_save_does_not_query_banned_words(self):
+        Review.objects.create(product=self.product, user=self.user, rating=3, review_text='warm up')
+        with CaptureQueriesContext(connection) as queries:
+            review = Review.objects.create(product=self.product, user=self.user, rating=1, review_text='So VULGAR')
+        self.assertFalse(any('reviews_bannedword"' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(review.banned_words_found, 'vulgar')
+
+    def test_matcher_rebuilds_when_banned_words_change(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=2, review_text='plain awful')
+        self.assertFalse(review.contains_banned_words)
+
+        word = BannedWord.objects.create(word='awful', severity=1)
+        review.analyze()
+        self.assertEqual(review.banned_words_found, 'awful')
+
+        word.delete()
+        review.analyze()
+        self.assertFalse(review.contains_banned_words)
+
+    def test_changes_from_other_processes_are_seen_through_the_database(self):
+        self.assertEqual(find_banned_words('so gross'), [])
+        # عملية أخرى: تضيف كلمة وترفع الإصدار دون المرور بالـ matcher المحلي لهذه العملية
+        BannedWord.objects.bulk_create([BannedWord(word='gross', severity=2)])
+        BannedWordListVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        with override_settings(REVIEWS_BANNED_WORDS_RECHECK_SECONDS=60), self.assertNumQueries(0):
+            self.assertEqual(find_banned_words('so gross'), [])  # الإصدار لا يُقرأ مع كل فحص
+        self.assertEqual(find_banned_words('so gross'), ['gross'])
+
+
+class SentimentQueueTestCase(WriterProductTestCase):
+    def test_save_queues_review_and_worker_scores_it(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=5,
+                                       review_text='What a wonderful, great phone')
+        review.refresh_from_db()
+        self.assertTrue(review.sentiment_pending)
+        self.assertEqual(review.sentiment, '')
+
+        call_command('process_sentiment_queue', batch_size=1, stdout=StringIO())
+
+        review.refresh_from_db()
+        self.assertFalse(review.sentiment_pending)
+        self.assertEqual(review.sentiment, 'Positive')
+        self.assertGreater(review.sentiment_score, 0.1)
+
+    def test_partial_save_without_text_is_not_queued(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=5, review_text='Terrible')
+        Review.objects.filter(pk=review.pk).update(sentiment_pending=False)
+        review.refresh_from_db()
+
+        review.visible = True
+        review.save(update_fields=['visible'])
+        review.refresh_from_db()
+        self.assertFalse(review.sentiment_pending)
+
+    @override_settings(REVIEWS_SENTIMENT_MODE='sync')
+    def test_sync_mode_scores_inline(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=1,
+                                       review_text='This is a terrible, awful phone')
+        review.refresh_from_db()
+        self.assertFalse(review.sentiment_pending)
+        self.assertEqual(review.sentiment, 'Negative')
+
+    def test_edit_during_batch_is_not_overwritten(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=5, review_text='Wonderful phone')
+        real_score_texts = sentiment.score_texts
+
+        def edit_while_scoring(texts):
+            edited = Review.objects.get(pk=review.pk)
+            edited.review_text = 'Terrible, awful phone'
+            edited.save()
+            return real_score_texts(texts)
+
+        with mock.patch('reviews.sentiment.score_texts', side_effect=edit_while_scoring):
+            self.assertEqual(process_pending_sentiment(), 1)  # أُخذت من الطابور وبقيت معلّقة
+        review.refresh_from_db()
+        self.assertEqual((review.review_text, review.sentiment, review.sentiment_pending),
+                         ('Terrible, awful phone', '', True))
+        self.assertEqual(process_pending_sentiment(), 1)
+        review.refresh_from_db()
+        self.assertEqual(review.sentiment, 'Negative')
+
+    def test_queue_command_retries_reviews_edited_during_a_batch(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=5, review_text='Wonderful phone')
+        real_score_texts = sentiment.score_texts
+        calls = []
+
+        def edit_on_first_batch(texts):
+            if not calls:
+                Review.objects.filter(pk=review.pk).update(review_text='Terrible, awful phone')
+            calls.append(texts)
+            return real_score_texts(texts)
+
+        out = StringIO()
+        with mock.patch('reviews.sentiment.score_texts', side_effect=edit_on_first_batch):
+            call_command('process_sentiment_queue', stdout=out)
+        review.refresh_from_db()
+        self.assertEqual((review.sentiment, review.sentiment_pending), ('Negative', False))
+        self.assertEqual(len(calls), 2)
+        self.assertIn('Sentiment queue drained, 2 queued reviews processed', out.getvalue())
+
+    def test_batch_of_a_thousand(self):
+        Review.objects.bulk_create([
+            Review(product=self.product, user=self.user, rating=4, review_text=f'Great phone {i}',
+                   sentiment_pending=True)
+            for i in range(1000)
+        ])
+        self.assertEqual(process_pending_sentiment(batch_size=1000), 1000)
+        self.assertFalse(Review.objects.filter(sentiment_pending=True).exists())
+
+class SentimentCacheTestCase(WriterProductTestCase):
+    def setUp(self):
+        sentiment_cache.clear()
+
+    def test_lru_evicts_oldest_and_counts_hits(self):
+        cache = SentimentCache(maxsize=2)
+        compute = mock.Mock(side_effect=lambda text: len(text))
+        cache.get_or_compute('a', compute)
+        cache.get_or_compute('bb', compute)
+        cache.get_or_compute('a', compute)
+        cache.get_or_compute('ccc', compute)  # evicts 'bb'
+        cache.get_or_compute('bb', compute)
+        self.assertEqual(compute.call_count, 4)
+        self.assertEqual(cache.info()['hits'], 1)
+        self.assertEqual(cache.info()['size'], 2)
+
+    @override_settings(REVIEWS_SENTIMENT_MODE='sync')
+    def test_repeated_text_is_scored_once(self):
+        for _ in range(3):
+            Review.objects.create(product=self.product, user=self.user, rating=5, review_text='Great value')
+        self.assertEqual(sentiment_cache.info()['misses'], 1)
+        self.assertEqual(sentiment_cache.info()['hits'], 2)
+
+    def test_unchanged_text_skips_analysis(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=3, review_text='Fine')
+        review = Review.objects.get(pk=review.pk)
+        with mock.patch.object(Review, 'analyze') as analyze:
+            review.rating = 4
+            review.visible = True
+            review.save()
+            analyze.assert_not_called()
+
+            review.review_text = 'Actually great'
+            review.save()
+            analyze.assert_called_once()
+
+
+class ReanalyzeReviewsTestCase(WriterProductTestCase):
+    def setUp(self):
+        self.old = Review.objects.create(product=self.product, user=self.user, rating=1, review_text='A rotten phone')
+        self.current = Review.objects.create(product=self.product, user=self.user, rating=5, review_text='rotten but fine')
+        Review.objects.filter(pk=self.old.pk).update(analyzer_version=0)
+
+    def test_only_stale_reviews_are_reanalyzed(self):
+        BannedWord.objects.create(word='rotten', severity=2)
+        call_command('reanalyze_reviews', workers=0, chunk_size=1, stdout=StringIO())
+
+        self.old.refresh_from_db()
+        self.current.refresh_from_db()
+        self.assertEqual(self.old.analyzer_version, ANALYZER_VERSION)
+        self.assertEqual(self.old.banned_words_found, 'rotten')
+        self.assertFalse(self.old.sentiment_pending)
+        # Already at the current version, so it was skipped.
+        self.assertIsNone(self.current.banned_words_found)
+
+    def test_process_pool_run(self):
+        BannedWord.objects.create(word='rotten', severity=2)
+        call_command('reanalyze_reviews', workers=2, stdout=StringIO())
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.banned_words_found, 'rotten')
+
+    def test_edit_during_run_is_left_stale(self):
+        BannedWord.objects.create(word='rotten', severity=2)
+        real_score_texts = sentiment.score_texts
+
+        def edit_while_scoring(texts):
+            Review.objects.filter(pk=self.old.pk).update(review_text='A lovely phone')
+            return real_score_texts(texts)
+
+        with mock.patch('reviews.analysis.score_texts', side_effect=edit_while_scoring):
+            call_command('reanalyze_reviews', workers=0, stdout=StringIO())
+        self.old.refresh_from_db()
+        self.assertEqual((self.old.review_text, self.old.analyzer_version, self.old.banned_words_found),
+                         ('A lovely phone', 0, None))
+        self.assertFalse(ReviewBannedWordMatch.objects.filter(review=self.old).exists())
+
+        call_command('reanalyze_reviews', workers=0, stdout=StringIO())
+        self.old.refresh_from_db()
+        self.assertEqual((self.old.analyzer_version, self.old.sentiment), (ANALYZER_VERSION, 'Positive'))
+
+    def test_new_words_mode_merges_matches(self):
+        Review.objects.filter(pk=self.current.pk).update(contains_banned_words=True, banned_words_found='fine')
+        call_command('reanalyze_reviews', new_words=True, words='rotten', stdout=StringIO())
+
+        self.current.refresh_from_db()
+        self.assertEqual(self.current.banned_words_found, 'fine, rotten')
+        self.old.refresh_from_db()
+        self.assertTrue(self.old.contains_banned_words)
+        self.assertEqual(self.old.analyzer_version, 0)  # incremental mode leaves versions alone
+
+
+class BannedWordMatchTableTestCase(WriterProductTestCase):
+    def setUp(self):
+        self.low = BannedWord.objects.create(word='meh', severity=1)
+        self.high = BannedWord.objects.create(word='vulgar', severity=3)
+        self.low_review = Review.objects.create(product=self.product, user=self.user, rating=2, review_text='meh phone')
+        self.high_review = Review.objects.create(product=self.product, user=self.user, rating=1,
+                                                 review_text='so vulgar and meh')
+
+    def test_matches_are_recorded_with_severity_and_position(self):
+        match = ReviewBannedWordMatch.objects.get(review=self.high_review, banned_word=self.high)
+        self.assertEqual((match.severity, match.position), (3, 3))
+        self.assertEqual(self.high_review.max_severity, 3)
+        self.assertEqual(self.low_review.max_severity, 1)
+
+        self.high_review.review_text = 'now clean'
+        self.high_review.save()
+        self.assertFalse(ReviewBannedWordMatch.objects.filter(review=self.high_review).exists())
+
+    def test_severity_filters_use_match_table(self):
+        from reviews.views import filter_by_banned_word_severity
+        flagged = Review.objects.filter(contains_banned_words=True)
+
+        queryset, error = filter_by_banned_word_severity(flagged, {'severity': '1'})
+        self.assertIsNone(error)
+        self.assertEqual(set(queryset), {self.low_review, self.high_review})
+        self.assertIn('reviews_reviewbannedwordmatch', str(queryset.query))
+
+        queryset, error = filter_by_banned_word_severity(flagged, {'min_severity': '3'})
+        self.assertEqual(list(queryset), [self.high_review])
+
+        _, error = filter_by_banned_word_severity(flagged, {'severity': '7'})
+        self.assertEqual(error.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_banned_word_edits_keep_severity_in_sync(self):
+        self.high.severity = 2
+        self.high.save()
+        self.high_review.refresh_from_db()
+        self.assertEqual(self.high_review.max_severity, 2)
+
+        self.high.delete()
+        self.high_review.refresh_from_db()
+        self.assertEqual(self.high_review.max_severity, 1)
+        self.assertEqual((self.high_review.contains_banned_words, self.high_review.banned_words_found),
+                         (True, 'meh'))
+
+        self.low.delete()
+        self.assertFalse(Review.objects.filter(contains_banned_words=True).exists())
+        self.high_review.refresh_from_db()
+        self.assertEqual((self.high_review.banned_words_found, self.high_review.max_severity), (None, 0))
+
+
+class ReviewAdminQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', password='admin123', email='a@example.com')
+        self.client.force_login(self.admin_user)
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        BannedWord.objects.create(word='vulgar', severity=3)
+
+    def _add_reviews(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'user{Review.objects.count()}', password='x')
+            review = Review.objects.create(product=self.product, user=user, rating=1 + i % 5,
+                                           review_text='vulgar' if i % 2 else 'fine', visible=bool(i % 3))
+            ReviewInteraction.objects.create(review=review, user=self.admin_user, helpful=True)
+
+    def _changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:reviews_review_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_flat(self):
+        self._add_reviews(3)
+        small = self._changelist_queries()
+        self._add_reviews(20)
+        self.assertEqual(self._changelist_queries(), small)
+
+    def test_insights_come_from_one_query(self):
+        self._add_reviews(6)
+        with CaptureQueriesContext(connection) as queries:
+            insights = review_insights(Review.objects.all())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(insights['offensive_count'], 3)
+        self.assertEqual(insights['hidden_count'], 2)
+        self.assertEqual(insights['low_rating_count'], 3)
+
+    def test_offensive_filter_uses_flag(self):
+        self._add_reviews(2)
+        response = self.client.get(reverse('admin:reviews_review_changelist') + '?offensive=yes')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class ModerationQueueTestCase(WriterProductTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', email='a@example.com', password='pass123')
+        BannedWord.objects.create(word='vulgar', severity=3)
+        now = timezone.now()
+        self.pending = []
+        for i in range(5):
+            review = Review.objects.create(product=self.product, user=self.user, rating=3,
+                                           review_text='vulgar' if i == 4 else f'pending {i}')
+            # Two reviews share a timestamp so the id tie-breaker is exercised.
+            Review.objects.filter(pk=review.pk).update(created_at=now - timedelta(hours=5 - min(i, 3)))
+            self.pending.append(review)
+        Review.objects.create(product=self.product, user=self.user, rating=5, review_text='live', visible=True)
+        ReviewReport.objects.create(review=self.pending[1], user=self.admin, reason='spam')
+        self.client.force_authenticate(self.admin)
+
+    def test_queue_pages_with_keyset_cursor(self):
+        seen, cursor = [], None
+        while True:
+            url = '/api/reviews/moderation-queue/?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(any('OFFSET' in q['sql'] for q in queries.captured_queries))
+            seen += [row['id'] for row in response.data['results']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [review.id for review in self.pending])
+
+    def test_queue_filters(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reviews/moderation-queue/?min_reports=1')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.pending[1].id])
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+        response = self.client.get('/api/reviews/moderation-queue/?severity=3')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.pending[4].id])
+        response = self.client.get('/api/reviews/moderation-queue/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_moderate_runs_one_update(self):
+        ids = [review.id for review in self.pending[:3]]
+        with mock.patch.object(Review, 'save') as save, CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/reviews/bulk-moderate/', {'ids': ids, 'action': 'approve'}, format='json')
+        save.assert_not_called()
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "reviews_review"') for q in queries.captured_queries), 1)
+        self.assertEqual(Review.objects.filter(pk__in=ids, visible=True).count(), 3)
+
+        self.client.post('/api/reviews/bulk-moderate/', {'ids': [self.pending[3].id], 'action': 'reject'}, format='json')
+        response = self.client.get('/api/reviews/moderation-queue/')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.pending[4].id])
+
+    def test_bulk_moderate_validation(self):
+        response = self.client.post('/api/reviews/bulk-moderate/', {'ids': 'all', 'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/reviews/bulk-moderate/', {'ids': [1], 'action': 'approve'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SentimentBackendTestCase(WriterProductTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        sentiment_cache.clear()
+
+    def test_lexicon_batch_scoring(self):
+        backend = LexiconBackend({'good': 0.7, 'awful': -1.0, 'fine': 0.4})
+        scores = backend.score_batch([
+            'Good, good phone!', 'awful', 'not good at all', 'nothing rated here', '', 'good but awful',
+        ])
+        self.assertAlmostEqual(scores[0], 0.7)
+        self.assertAlmostEqual(scores[1], -1.0)
+        self.assertAlmostEqual(scores[2], -0.35)  # negated and dampened
+        self.assertEqual(scores[3:5], [0.0, 0.0])
+        self.assertAlmostEqual(scores[5], -0.15)
+        # Negation does not leak from the end of one text into the next.
+        self.assertAlmostEqual(backend.score_batch(['never', 'good'])[1], 0.7)
+
+    def test_lexicon_agrees_with_textblob_labels(self):
+        texts = ['This is a great phone', 'Terrible, awful battery', 'It arrived on Tuesday']
+        lexicon = get_sentiment_backend('lexicon').score_batch(texts)
+        textblob = get_sentiment_backend('textblob').score_batch(texts)
+        self.assertEqual([label_for_polarity(s) for s in lexicon], [label_for_polarity(s) for s in textblob])
+
+    def test_score_endpoint(self):
+        response = self.client.post('/api/sentiment/score/', {
+            'texts': ['This is a great phone', 'Terrible battery'], 'backend': 'lexicon',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['backend'], 'lexicon')
+        self.assertEqual([r['label'] for r in response.data['results']], ['Positive', 'Negative'])
+
+        response = self.client.post('/api/sentiment/score/', {'texts': ['x'], 'backend': 'nope'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/sentiment/score/', {'texts': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for body in (['great'], {'texts': ['x'], 'backend': []}, {'texts': ['x'], 'backend': {'a': 1}}):
+            response = self.client.post('/api/sentiment/score/', body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+
+    def test_cache_is_per_backend(self):
+        from reviews.sentiment import score_texts
+        score_texts(['great', 'great', 'bad'], 'lexicon')
+        self.assertEqual(sentiment_cache.info()['misses'], 3)
+        score_texts(['great'], 'textblob')
+        self.assertEqual(sentiment_cache.info()['misses'], 4)
+
+
+class ReviewViewerStateTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='pass123')
+        self.author = User.objects.create_user(username='author', password='pass123')
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_reviews(self, count):
+        for _ in range(count):
+            review = Review.objects.create(product=self.product, user=self.author, rating=4,
+                                           review_text='Solid phone', visible=True)
+            ReviewInteraction.objects.create(review=review, user=self.user, helpful=True)
+            ReviewReport.objects.create(review=review, user=self.user, reason='spam')
+            ReviewComment.objects.create(review=review, user=self.author, text='thanks')
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reviews/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_query_count_is_flat(self):
+        self.add_reviews(2)
+        _, small = self.list_queries()
+        self.add_reviews(20)
+        response, large = self.list_queries()
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(small, large)
+
+    def test_viewer_state_values(self):
+        self.add_reviews(1)
+        Review.objects.create(product=self.product, user=self.author, rating=2, review_text='Meh', visible=True)
+        response, _ = self.list_queries()
+        touched, untouched = sorted(response.data, key=lambda row: row['rating'], reverse=True)
+        self.assertEqual(
+            [touched[k] for k in ('likes', 'dislikes', 'has_report', 'user_interacted', 'user_voted', 'comments_count')],
+            [1, 0, True, True, 'helpful', 1],
+        )
+        self.assertEqual(
+            [untouched[k] for k in ('likes', 'has_report', 'user_interacted', 'user_voted', 'comments_count')],
+            [0, False, False, None, 0],
+        )
+
+    def test_anonymous_viewer(self):
+        self.add_reviews(1)
+        response = APIClient().get(f'/api/reviews/{Review.objects.get().pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['likes'], response.data['has_report'], response.data['user_voted']), (1, False, None))
+
+
+class ReviewCountersTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass123')
+        self.fan = User.objects.create_user(username='fan', password='pass123')
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        self.review = Review.objects.create(product=self.product, user=self.author, rating=4,
+                                            review_text='Solid phone', visible=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def counters(self):
+        return Review.objects.values(*COUNTER_FIELDS).get(pk=self.review.pk)
+
+    def test_endpoints_update_counters(self):
+        url = f'/api/reviews/{self.review.pk}'
+        self.client.post(f'{url}/interact/', {'helpful': True}, format='json')
+        self.client.post(f'{url}/vote/', {'helpful': True}, format='json')  # نفس الصوت في نفس المخزن
+        self.client.post(f'{url}/comments/', {'text': 'agreed'}, format='json')
+        self.client.post(f'{url}/report/', {'reason': 'spam'}, format='json')
+        self.assertEqual(self.counters(), {
+            'helpful_count': 1, 'unhelpful_count': 0, 'comments_count': 1,
+            'reports_count': 1, 'interaction_count': 1,
+        })
+
+        # Changing the interaction moves it between likes and dislikes.
+        self.client.post(f'{url}/interact/', {'helpful': False}, format='json')
+        self.assertEqual(self.counters()['helpful_count'], 0)
+        self.assertEqual(self.counters()['unhelpful_count'], 1)
+        self.assertEqual(self.counters()['interaction_count'], 1)
+
+        ReviewComment.objects.filter(review=self.review).delete()
+        ReviewInteraction.objects.get(review=self.review).delete()
+        self.assertEqual(self.counters()['comments_count'], 0)
+        self.assertEqual(self.counters()['unhelpful_count'], 0)
+        self.assertEqual(self.counters()['interaction_count'], 0)
+
+    def test_sorts_use_counter_columns(self):
+        other = Review.objects.create(product=self.product, user=self.fan, rating=3, review_text='Ok', visible=True)
+        ReviewInteraction.objects.create(review=other, user=self.author, helpful=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reviews/?sort_by=most_interactive')
+        self.assertEqual(response.data[0]['id'], other.pk)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        ReviewInteraction.objects.create(review=self.review, user=self.fan, helpful=True)
+        Review.objects.filter(pk=self.review.pk).update(helpful_count=7, reports_count=2)
+
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn('helpful_count stored=7 actual=1', out.getvalue())
+        self.assertEqual(self.counters()['helpful_count'], 7)
+
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.counters()['helpful_count'], 1)
+        self.assertEqual(self.counters()['reports_count'], 0)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('in sync', out.getvalue())
+
+
+class ReviewCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        self.reviews = []
+        now = timezone.now()
+        for i in range(7):
+            user = User.objects.create_user(username=f'user{i}', password='pass123')
+            review = Review.objects.create(product=self.product, user=user, rating=i % 3 + 1,
+                                           review_text='Fine phone', visible=True)
+            # Two reviews share each timestamp so the id tie-breaker matters.
+            Review.objects.filter(pk=review.pk).update(created_at=now - timedelta(hours=i // 2),
+                                                       interaction_count=i % 2)
+            self.reviews.append(review)
+        self.client = APIClient()
+
+    def walk(self, url):
+        ids, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data), 3)
+            ids += [row['id'] for row in response.data]
+            queries += [q['sql'] for q in captured.captured_queries]
+            url = response.headers.get('Link', '').partition('<')[2].partition('>')[0]
+        return ids, queries
+
+    def test_every_sort_mode_pages_through_all_reviews(self):
+        for sort_by, ordering in REVIEW_SORTS.items():
+            ids, queries = self.walk(f'/api/reviews/?sort_by={sort_by}&page_size=3')
+            expected = list(Review.objects.order_by(*ordering).values_list('id', flat=True))
+            self.assertEqual(ids, expected, sort_by)
+            self.assertFalse(any('OFFSET' in sql for sql in queries))
+
+    def test_product_reviews_and_page_size_cap(self):
+        ids, _ = self.walk(f'/api/products/{self.product.pk}/reviews/?page_size=3')
+        self.assertEqual(sorted(ids), sorted(review.pk for review in self.reviews))
+        with override_settings(REVIEWS_MAX_PAGE_SIZE=2):
+            response = self.client.get('/api/reviews/?page_size=1000')
+        self.assertEqual(len(response.data), 2)
+        self.assertIn('X-Next-Cursor', response.headers)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/reviews/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductRatingStatsTestCase(WriterProductTestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='boss', password='pass123')
+        self.other = Product.objects.create(name='Case', description='D', price=2)
+
+    def stats(self, product=None):
+        stats = ProductRatingStats.objects.filter(product=product or self.product).first()
+        if stats is None:
+            return (0, None, {r: 0 for r in range(1, 6)})
+        return (stats.review_count, stats.average_rating, stats.histogram)
+
+    def test_stats_follow_review_lifecycle(self):
+        hidden = Review.objects.create(product=self.product, user=self.user, rating=2, review_text='Meh')
+        self.assertEqual(self.stats()[0], 0)  # hidden reviews do not count
+
+        hidden.visible = True
+        hidden.save(update_fields=['visible'])
+        shown = Review.objects.create(product=self.product, user=self.user, rating=5, review_text='Great', visible=True)
+        self.assertEqual(self.stats(), (2, 3.5, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1}))
+
+        shown = Review.objects.get(pk=shown.pk)
+        shown.rating = 4
+        shown.save()
+        self.assertEqual(self.stats()[2][4], 1)
+        self.assertEqual(self.stats()[2][5], 0)
+
+        shown.product = self.other
+        shown.save()
+        self.assertEqual(self.stats()[:2], (1, 2.0))
+        self.assertEqual(self.stats(self.other)[:2], (1, 4.0))
+
+        hidden.delete()
+        self.assertEqual(self.stats()[:2], (0, None))
+
+    def test_bulk_moderate_updates_stats(self):
+        ids = [Review.objects.create(product=self.product, user=self.user, rating=r, review_text='x').pk for r in (1, 5)]
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        client.post('/api/reviews/bulk-moderate/', {'ids': ids, 'action': 'approve'}, format='json')
+        self.assertEqual(self.stats()[:2], (2, 3.0))
+        client.post('/api/reviews/bulk-moderate/', {'ids': ids, 'action': 'approve'}, format='json')
+        self.assertEqual(self.stats()[0], 2)  # already visible, not counted twice
+        client.post('/api/reviews/bulk-moderate/', {'ids': ids[:1], 'action': 'reject'}, format='json')
+        self.assertEqual(self.stats()[:2], (1, 5.0))
+
+    def test_product_listing_reads_stats(self):
+        Review.objects.create(product=self.other, user=self.user, rating=5, review_text='Great', visible=True)
+        Review.objects.create(product=self.product, user=self.user, rating=3, review_text='Ok', visible=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/products/?sort_by=rating')
+        self.assertEqual([row['name'] for row in response.data], ['Case', 'Phone'])
+        self.assertEqual(response.data[0]['reviews_count'], 1)
+        self.assertFalse(any('AVG(' in q['sql'] or '"reviews_review"' in q['sql'] for q in queries.captured_queries))
+
+    def test_rebuild_command_repairs(self):
+        Review.objects.create(product=self.product, user=self.user, rating=4, review_text='Good', visible=True)
+        ProductRatingStats.objects.filter(product=self.product).update(review_count=9, count_4=0)
+        out = StringIO()
+        call_command('rebuild_rating_stats', stdout=out)
+        self.assertIn('Repaired stats of 1 products', out.getvalue())
+        self.assertEqual(self.stats(), (1, 4.0, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0}))
+
+
+class RatingSummaryTestCase(WriterProductTestCase):
+    def setUp(self):
+        self.empty = Product.objects.create(name='Case', description='D', price=2)
+        for rating in (5, 5, 4, 1):
+            Review.objects.create(product=self.product, user=self.user, rating=rating, review_text='x', visible=True)
+        self.client = APIClient()
+
+    def test_single_summary_reads_only_the_stats_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/products/{self.product.pk}/rating-summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'product_id': self.product.pk, 'count': 4, 'average': 3.75,
+            'histogram': {'1': 1, '2': 0, '3': 0, '4': 1, '5': 2},
+        })
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(any('"reviews_review"' in q['sql'] for q in queries.captured_queries))
+
+        self.assertEqual(self.client.get('/api/products/999/rating-summary/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/products/abc/rating-summary/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_summary(self):
+        ProductRatingStats.objects.filter(product=self.empty).delete()
+        response = self.client.get(f'/api/products/rating-summary/?ids={self.empty.pk},{self.product.pk},999')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['product_id'] for row in response.data['results']], [self.empty.pk, self.product.pk])
+        self.assertEqual(response.data['results'][0]['count'], 0)
+        self.assertEqual(response.data['not_found'], [999])
+
+        self.assertEqual(self.client.get('/api/products/rating-summary/?ids=a').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='pass123')
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        for _ in range(3):
+            Review.objects.create(product=self.product, user=self.user, rating=4,
+                                  review_text='A long review ' * 20, visible=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [q['sql'] for q in queries.captured_queries]
+
+    def test_fields_skip_computed_fields_and_queries(self):
+        _, full = self.get('/api/reviews/')
+        response, sparse = self.get('/api/reviews/?fields=id,rating,created_at')
+        self.assertEqual(set(response.data[0]), {'id', 'rating', 'created_at'})
+        # No viewer-state lookups (reports, votes), no author join, no review text.
+        self.assertEqual(len(full) - len(sparse), 2)
+        self.assertFalse(any('auth_user"."username' in sql or '"review_text"' in sql for sql in sparse))
+
+        response, _ = self.get('/api/reviews/?fields=id,snippet')
+        self.assertTrue(response.data[0]['snippet'].endswith('…'))
+        self.assertLessEqual(len(response.data[0]['snippet']), 141)
+
+    def test_omit_and_default_output(self):
+        response, queries = self.get('/api/reviews/?omit=has_report,user_voted')
+        self.assertNotIn('has_report', response.data[0])
+        self.assertNotIn('snippet', response.data[0])  # optional fields are opt-in
+        self.assertIn('user_interacted', response.data[0])
+        self.assertFalse(any('reviews_reviewreport' in sql for sql in queries))
+
+    def test_product_fields(self):
+        response, queries = self.get('/api/products/?fields=id,name')
+        self.assertEqual(response.data, [{'id': self.product.pk, 'name': 'Phone'}])
+        self.assertFalse(any('reviews_productratingstats' in sql for sql in queries))
+        response, _ = self.get(f'/api/products/{self.product.pk}/reviews/?fields=id,user')
+        self.assertEqual(set(response.data[0]), {'id', 'user'})
+
+
+# ✅ اختبارات orjson renderer / parser
+class ORJSONRendererTestCase(TestCase):
+    def test_output_matches_stock_renderer(self):
+        data = {
+            'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'price': decimal.Decimal('19.99'),
+            'label': gettext_lazy('Reviews'),
+            'text': 'line\u2028break — “quoted”',
+            'tags': ['a', 1, None, True],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_api_responses_use_orjson(self):
+        user = User.objects.create_user(username='json', password='pass123')
+        product = Product.objects.create(name='Phone', description='D', price='12.50')
+        Review.objects.create(product=product, user=user, rating=5, review_text='Great', visible=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/reviews/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(response.json()[0]['rating'], 5)
+
+    def test_parser(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(b'{"rating": 4, "text": "\\u00e9"}')),
+                         {'rating': 4, 'text': 'é'})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"rating": '))
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"rating": NaN}'))
+
+
+# ✅ اختبارات ETag و 304 (إصدار المنتج)
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        view_buffer.clear()
+        self.user = User.objects.create_user(username='poller', password='pass123')
+        self.other = User.objects.create_user(username='other', password='pass123')
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        self.review = Review.objects.create(product=self.product, user=self.user, rating=4,
+                                            review_text='Good phone', visible=True)
+        self.client = APIClient()
+        self.reviews_url = f'/api/products/{self.product.pk}/reviews/'
+
+    def version(self):
+        return ProductVersion.objects.get(product=self.product).version
+
+    def test_not_modified_before_any_other_query(self):
+        response = self.client.get(self.reviews_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.reviews_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(self.reviews_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # استعلام مختلف أو مستخدم مختلف => ETag مختلف
+        self.assertNotEqual(self.client.get(self.reviews_url + '?fields=id')['ETag'], etag)
+        self.client.force_authenticate(self.other)
+        self.assertNotEqual(self.client.get(self.reviews_url)['ETag'], etag)
+
+    def test_changes_bump_the_version(self):
+        start = self.version()
+        ReviewInteraction.objects.create(review=self.review, user=self.other, helpful=True)
+        cast_vote(self.review.pk, self.other.pk, False)
+        ReviewComment.objects.create(review=self.review, user=self.other, text='Agreed')
+        self.assertEqual(self.version(), start + 3)
+
+        bulk_set_visibility(Review.objects.filter(pk=self.review.pk), False)
+        self.assertEqual(self.version(), start + 4)
+
+        # عدد المشاهدات وحده لا يغيّر الإصدار
+        self.review.views = 10
+        self.review.save(update_fields=['views'])
+        self.assertEqual(self.version(), start + 4)
+
+        self.review.delete()
+        self.assertGreater(self.version(), start + 4)
+
+    def test_retrieve_and_analytics(self):
+        url = f'/api/reviews/{self.review.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):  # الإصدار فقط؛ المشاهدة تُضاف إلى الـ buffer
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(view_buffer.pending(self.review.pk), 2)  # إعادة التحقق تُحسب مشاهدة
+        flush_views()
+        self.assertEqual(ReviewViewerSketch.objects.get(review=self.review).unique_viewers, 1)
+
+        self.review.review_text = 'Good phone, great battery'
+        self.review.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        analytics = f'/products/{self.product.pk}/analytics/'
+        response = self.client.get(analytics)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(analytics, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(self.client.get(analytics + '?days=7')['ETag'], response['ETag'])
+
+
+# ✅ اختبارات كاش ردود التحليلات العامة
+class ResponseCacheTestCase(WriterProductTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        reset_response_cache_info()
+        self.admin = User.objects.create_superuser(username='boss', password='pass123')
+        self.review = Review.objects.create(product=self.product, user=self.user, rating=4,
+                                            review_text='Great battery', visible=True)
+        self.client = APIClient()
+
+    def test_hits_and_normalized_params(self):
+        url = f'/products/{self.product.pk}/analytics/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(1):  # فقط إصدار المنتج (ETag)
+            response = self.client.get(url + '?days=30&utm=x')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['review_count_last_days'], 1)
+        self.assertEqual(self.client.get(url + '?days=7')['X-Cache'], 'MISS')
+
+        info = response_cache_info()
+        self.assertEqual(info['views']['product_analytics']['hits'], 1)
+        self.assertEqual(info['hit_ratio'], round(1 / 3, 4))
+
+    def test_tags_are_invalidated_by_signals(self):
+        top = '/analytics/top-reviewers/'
+        search = '/analytics/search-reviews/?q=battery'
+        best = '/api/reviews/top-review/'
+        for url in (top, search, best):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        ReviewInteraction.objects.create(review=self.review, user=self.admin, helpful=True)
+        self.assertEqual(self.client.get(best)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(top)['X-Cache'], 'HIT')  # لا يعتمد على التفاعلات
+
+        self.product.name = 'Phone 2'
+        self.product.save()
+        response = self.client.get(search)
+        self.assertEqual((response['X-Cache'], response.data[0]['product']), ('MISS', 'Phone 2'))
+
+        Review.objects.create(product=self.product, user=self.admin, rating=5, review_text='Battery ok', visible=True)
+        response = self.client.get(top)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 2)
+
+    def test_list_params_are_validated_and_clamped_before_the_lookup(self):
+        for url in ('/analytics/top-reviewers/?limit=abc', '/analytics/top-products/?days=x',
+                    '/analytics/top-products/?limit=1.5', '/analytics/search-reviews/?q=battery&limit=abc'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, url)
+            self.assertIn('must be an integer', response.data['detail'])
+
+        self.assertEqual(self.client.get('/analytics/top-reviewers/?limit=100')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/analytics/top-reviewers/?limit=100000')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/analytics/top-reviewers/?limit=010')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/analytics/top-reviewers/')['X-Cache'], 'HIT')  # الافتراضي 10
+        self.assertEqual(len(self.client.get('/analytics/top-products/?limit=-5&days=99999').data), 1)
+
+    def test_top_review_is_cached_per_viewer(self):
+        url = '/api/reviews/top-review/'
+        cast_vote(self.review.pk, self.user.pk, True)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).data['user_voted'], 'helpful')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(url)
+        self.assertEqual((response['X-Cache'], response.data['user_voted'], response.data['user_interacted']),
+                         ('MISS', None, False))
+        response = self.client.get(url, {'fields': 'id'})
+        self.assertEqual((response['X-Cache'], response.data), ('MISS', {'id': self.review.pk}))
+
+    def test_admin_bypass(self):
+        url = '/analytics/top-products/'
+        self.client.get(url)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url + '?refresh=1')['X-Cache'], 'BYPASS')
+        self.assertEqual(self.client.get(url, HTTP_CACHE_CONTROL='no-cache')['X-Cache'], 'BYPASS')
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url + '?refresh=1')['X-Cache'], 'HIT')
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': directory}}
+            with override_settings(CACHES=backend):
+                url = '/analytics/top-reviewers/'
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+                self.review.visible = False
+                self.review.save()
+                response = self.client.get(url)
+                self.assertEqual((response['X-Cache'], response.data), ('MISS', []))
+
+
+# ✅ اختبارات ?format=columnar
+class ColumnarFormatTestCase(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass123') for i in range(4)]
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        Review.objects.bulk_create([
+            Review(product=self.product, user=self.users[i % 4], rating=i % 5 + 1, visible=True,
+                   sentiment=['Positive', 'Neutral', 'Negative'][i % 3], review_text=f'Review {i}')
+            for i in range(60)
+        ])
+        self.client = APIClient()
+
+    def decode(self, data):
+        rows = []
+        for position in range(data['count']):
+            row = {}
+            for name in data['fields']:
+                value = data['columns'][name][position]
+                row[name] = data['dictionaries'][name][value] if name in data['dictionaries'] else value
+            rows.append(row)
+        return rows
+
+    def test_columns_match_row_format(self):
+        url = f'/api/products/{self.product.pk}/reviews/?page_size=25'
+        rows = self.client.get(url).json()
+        response = self.client.get(url + '&format=columnar')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(sorted(data['dictionaries']['user']), [user.username for user in self.users])
+        for row, decoded in zip(rows, self.decode(data)):
+            for name in ('id', 'user', 'rating', 'review_text', 'created_at', 'likes', 'views', 'comments_count'):
+                self.assertEqual(row[name], decoded[name])
+        self.assertIn('X-Next-Cursor', response)
+
+    def test_list_pages_without_model_instances(self):
+        url = '/api/reviews/?page_size=50&format=columnar&fields=id,user,sentiment&sort_by=highest_rating'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['fields'], ['id', 'user', 'sentiment'])
+        self.assertEqual(len(data['dictionaries']['sentiment']), 3)
+        nxt = self.client.get(url + '&cursor=' + response['X-Next-Cursor']).json()
+        self.assertEqual(data['count'] + nxt['count'], 60)
+        self.assertFalse(set(data['columns']['id']) & set(nxt['columns']['id']))
+
+    def test_payload_is_smaller(self):
+        url = '/api/reviews/?page_size=60&omit=review_text'
+        rows, columnar = self.client.get(url), self.client.get(url + '&format=columnar')
+        self.assertGreaterEqual(len(rows.content) / len(columnar.content), 3)
+        # الصيغة متاحة فقط للقوائم
+        review_id = Review.objects.first().pk
+        self.assertEqual(self.client.get(f'/api/reviews/{review_id}/?format=columnar').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+# ✅ اختبارات عداد المشاهدات المؤجّل (buffer)
+@override_settings(REVIEWS_VIEW_FLUSH_INTERVAL=3600)
+class BufferedViewCounterTestCase(TestCase):
+    def setUp(self):
+        view_buffer.clear()
+        self.user = User.objects.create_user(username='reader', password='pass123')
+        self.product = Product.objects.create(name='Phone', description='D', price=10)
+        self.reviews = [
+            Review.objects.create(product=self.product, user=self.user, rating=4, review_text=f'Review {i}',
+                                  visible=True, views=3)
+            for i in range(3)
+        ]
+        self.client = APIClient()
+
+    def test_reads_do_not_write_and_show_pending_views(self):
+        url = f'/api/reviews/{self.reviews[0].pk}/'
+        for expected in (4, 5):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.data['views'], expected)
+            self.assertFalse(any(q['sql'].startswith('UPDATE') for q in queries.captured_queries))
+        self.assertEqual(Review.objects.get(pk=self.reviews[0].pk).views, 3)
+        self.assertEqual(self.client.get('/api/reviews/').data[-1]['views'], 5)
+
+    def test_flush_is_one_batched_update(self):
+        for review, count in zip(self.reviews, (1, 2, 5)):
+            for _ in range(count):
+                self.client.get(f'/api/reviews/{review.pk}/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_views(), 8)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "reviews_review"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('CASE', updates[0])
+        self.assertEqual([Review.objects.get(pk=r.pk).views for r in self.reviews], [4, 5, 8])
+        self.assertEqual(view_buffer.pending(self.reviews[0].pk), 0)
+
+    @override_settings(REVIEWS_VIEW_FLUSH_THRESHOLD=3)
+    def test_threshold_schedules_flush_off_the_request(self):
+        url = f'/api/reviews/{self.reviews[1].pk}/'
+        with mock.patch.object(view_buffer, 'schedule_flush') as schedule:
+            self.client.get(url)
+            self.client.get(url)
+            schedule.assert_not_called()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).data['views'], 6)
+            schedule.assert_called_once_with()
+        self.assertFalse(any(q['sql'].startswith('UPDATE') for q in queries.captured_queries))
+        self.assertEqual(Review.objects.get(pk=self.reviews[1].pk).views, 3)
+
+
+class BackgroundViewFlushTestCase(TransactionTestCase):
+    def setUp(self):
+        view_buffer.clear()
+        user = User.objects.create_user(username='reader', password='pass123')
+        product = Product.objects.create(name='Phone', description='D', price=10)
+        self.review = Review.objects.create(product=product, user=user, rating=4, review_text='Nice', visible=True)
+
+    @override_settings(REVIEWS_VIEW_BACKGROUND_FLUSH=True, REVIEWS_VIEW_FLUSH_THRESHOLD=2,
+                       REVIEWS_VIEW_FLUSH_INTERVAL=3600)
+    def test_flusher_thread_writes_due_views(self):
+        flushed = threading.Event()
+        flush = view_buffer.flush
+
+        def flush_and_signal():
+            try:
+                return flush()
+            finally:
+                flushed.set()
+
+        client = APIClient()
+        with mock.patch.object(view_buffer, 'flush', flush_and_signal):
+            client.get(f'/api/reviews/{self.review.pk}/')
+            client.get(f'/api/reviews/{self.review.pk}/')
+            self.assertTrue(flushed.wait(5))
+        self.assertEqual(Review.objects.get(pk=self.review.pk).views, 2)
+        self.assertEqual(view_buffer.pending(self.review.pk), 0)
+        self.assertEqual(ReviewViewerSketch.objects.get(review=self.review).unique_viewers, 1)
+
+
+# ✅ اختبارات عدد المشاهدين المختلفين (HyperLogLog)
+class UniqueViewersTestCase(TestCase):
+    def test_sketch_accuracy_and_merge(self):
+        small = HyperLogLog()
+        for i in range(100):
+            small.add(f'user:{i % 40}')
+        self.assertTrue(small.is_exact)
+        self.assertEqual(HyperLogLog.from_bytes(small.to_bytes()).count(), 40)
+
+        big, other = HyperLogLog(), HyperLogLog()
+        big.add_hashes(viewer_hash(f'user:{i}') for i in range(50000))
+        other.add_hashes(viewer_hash(f'user:{i}') for i in range(25000, 75000))
+        self.assertFalse(big.is_exact)
+        self.assertLessEqual(len(big.to_bytes()), 4 * 1024 + 2)
+        self.assertAlmostEqual(big.count() / 50000, 1, delta=0.05)
+        big.merge(HyperLogLog.from_bytes(other.to_bytes()))
+        self.assertAlmostEqual(big.count() / 75000, 1, delta=0.05)
+
+    @override_settings(REVIEWS_VIEW_FLUSH_INTERVAL=3600)
+    def test_views_feed_review_and_product_sketches(self):
+        view_buffer.clear()
+        users = [User.objects.create_user(username=f'reader{i}', password='pass123') for i in range(3)]
+        product = Product.objects.create(name='Phone', description='D', price=10)
+        first, second = [Review.objects.create(product=product, user=users[0], rating=4, review_text='Nice',
+                                               visible=True) for _ in range(2)]
+        client = APIClient()
+        for user in users:
+            client.force_authenticate(user)
+            client.get(f'/api/reviews/{first.pk}/')
+            client.get(f'/api/reviews/{first.pk}/')
+        client.get(f'/api/reviews/{second.pk}/')  # users[2] again
+        client.force_authenticate(None)
+        client.get(f'/api/reviews/{second.pk}/', REMOTE_ADDR='10.0.0.9')
+        self.assertFalse(ReviewViewerSketch.objects.exists())
+
+        flush_views()
+        self.assertEqual(ReviewViewerSketch.objects.get(review=first).unique_viewers, 3)
+        self.assertEqual(client.get(f'/api/reviews/{second.pk}/unique-viewers/').data['unique_viewers'], 2)
+        response = client.get(f'/api/products/{product.pk}/unique-viewers/')
+        self.assertEqual((response.data['unique_viewers'], response.data['exact']), (4, True))
+
+
+# ✅ اختبارات تجميعات النشاط (ساعة / يوم) والسلسلة الزمنية للمنتج
+class ActivityRollupTestCase(TestCase):
+    def setUp(self):
+        view_buffer.clear()
+        self.users = [User.objects.create_user(username=f'active{i}', password='pass123') for i in range(3)]
+        self.product = Product.objects.create(name='Lamp', description='D', price=10)
+        self.first, self.second = [
+            Review.objects.create(product=self.product, user=user, rating=4, review_text='Nice', visible=True)
+            for user in self.users[:2]
+        ]
+        self.client = APIClient()
+
+    @override_settings(REVIEWS_VIEW_FLUSH_INTERVAL=3600)
+    def test_view_flush_adds_to_current_hour(self):
+        for review, count in ((self.first, 3), (self.second, 2)):
+            for _ in range(count):
+                self.client.get(f'/api/reviews/{review.pk}/')
+        flush_views()
+        self.client.get(f'/api/reviews/{self.first.pk}/')
+        flush_views()
+
+        self.assertEqual(ReviewActivityRollup.objects.get(review=self.first, granularity='hour').views, 4)
+        self.assertEqual(ReviewActivityRollup.objects.get(review=self.second, granularity='hour').views, 2)
+        product_row = ProductActivityRollup.objects.get(product=self.product, granularity='hour')
+        self.assertEqual(product_row.views, 6)
+        self.assertEqual(product_row.bucket, timezone.now().replace(minute=0, second=0, microsecond=0))
+
+    def test_rollup_recomputes_events(self):
+        ReviewInteraction.objects.create(review=self.first, user=self.users[1], helpful=True)
+        ReviewInteraction.objects.create(review=self.first, user=self.users[2], helpful=False)
+        comment = ReviewComment.objects.create(review=self.second, user=self.users[0], text='Agreed')
+        since = timezone.now() - timedelta(hours=1)
+
+        self.assertEqual(rollup_hours(since), (2, 1))
+        self.assertEqual(rollup_hours(since), (2, 1))  # idempotent
+        row = ProductActivityRollup.objects.get(product=self.product, granularity='hour')
+        self.assertEqual((row.interactions, row.comments, row.new_reviews), (2, 1, 2))
+
+        comment.delete()
+        rollup_hours(since)
+        self.assertEqual(ReviewActivityRollup.objects.get(review=self.second, granularity='hour').comments, 0)
+        self.assertEqual(ProductActivityRollup.objects.get(product=self.product, granularity='hour').comments, 0)
+
+    def test_compaction_expiry_and_series(self):
+        utc = datetime.timezone.utc
+        now = datetime.datetime(2026, 3, 20, 12, 30, tzinfo=utc)
+        old = datetime.datetime(2026, 3, 5, 9, 0, tzinfo=utc)
+        yesterday = datetime.datetime(2026, 3, 19, 8, tzinfo=utc)
+        for moment, views in ((old, 5), (old.replace(hour=15), 2), (yesterday, 4), (now.replace(minute=0), 1)):
+            ProductActivityRollup.objects.create(product=self.product, granularity='hour', bucket=moment, views=views)
+        Review.objects.filter(pk=self.first.pk).update(created_at=old.replace(minute=20))
+        Review.objects.filter(pk=self.second.pk).update(created_at=now)
+
+        rollup_activity(hours=24, days=7, now=now)
+        daily = dict(ProductActivityRollup.objects.filter(granularity='day').values_list('bucket', 'views'))
+        self.assertEqual(daily, {old.replace(hour=0): 7, yesterday.replace(hour=0): 4})
+        self.assertFalse(ProductActivityRollup.objects.filter(granularity='hour', bucket__lt=now.replace(day=13, hour=0)).exists())
+        self.assertEqual(compact_days(now), (0, 1))  # only days that still have hourly rows
+
+        url = f'/api/products/{self.product.pk}/activity/'
+        response = self.client.get(url, {'start': '2026-03-05', 'end': '2026-03-20'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['series']), 16)
+        self.assertEqual(response.data['series'][0]['views'], 7)
+        self.assertEqual(response.data['series'][-1]['new_reviews'], 1)  # today, from hourly rows
+        self.assertEqual(response.data['totals']['views'], 12)
+
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            hourly = self.client.get(url, {'start': '2026-03-20', 'end': '2026-03-20', 'granularity': 'hour'})
+            self.assertEqual(len(hourly.data['series']), 24)
+            self.assertEqual(hourly.data['series'][12]['views'], 1)
+            self.assertEqual(self.client.get(url, {'start': '2026-03-13', 'end': '2026-03-20',
+                                                   'granularity': 'hour'}).status_code, 200)
+            # أيام خارج فترة الاحتفاظ بالصفوف الساعية: 400 لا سلسلة أصفار
+            expired = self.client.get(url, {'start': '2026-03-12', 'end': '2026-03-20', 'granularity': 'hour'})
+            self.assertEqual(expired.status_code, 400)
+            self.assertIn('2026-03-13', expired.data['detail'])
+        self.assertEqual(self.client.get(url, {'granularity': 'minute'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '2026-01-01', 'end': '2026-03-20',
+                                               'granularity': 'hour'}).status_code, 400)
+
+    def test_command_runs(self):
+        out = StringIO()
+        call_command('rollup_activity', stdout=out)
+        self.assertIn('hourly: 0 review rows, 1 product rows recomputed', out.getvalue())
+
+
+# ✅ اختبارات مخزن الأصوات الموحد (interact و vote و review_helpful)
+class VoteStoreTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer', password='pass123')
+        self.fan = User.objects.create_user(username='fan', password='pass123')
+        self.product = Product.objects.create(name='Kettle', description='D', price=10)
+        self.review = Review.objects.create(product=self.product, user=self.author, rating=4,
+                                            review_text='Boils fast', visible=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def counters(self):
+        return Review.objects.values_list('helpful_count', 'unhelpful_count', 'interaction_count').get(pk=self.review.pk)
+
+    def test_endpoints_share_one_vote(self):
+        url = f'/api/reviews/{self.review.pk}'
+        self.assertEqual(self.client.post(f'{url}/interact/', {'helpful': True}, format='json').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'{url}/vote/', {'helpful': False}, format='json')
+        self.assertEqual((response.data['helpful'], response.data['username']), (False, 'fan'))
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT')
+                          and 'FROM "reviews_reviewinteraction"' in q['sql']])
+        self.assertEqual(ReviewInteraction.objects.filter(review=self.review).count(), 1)
+        self.assertEqual(self.counters(), (0, 1, 1))
+        self.assertTrue(self.review.user_voted_unhelpful(self.fan))
+
+        self.client.force_login(self.fan)
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        data = self.client.post(f'/reviews/{self.review.pk}/helpful/', {'action': 'unhelpful'}, **ajax).json()
+        self.assertEqual((data['unhelpful_count'], data['user_voted_unhelpful']), (0, False))  # نفس الزر يلغي الصوت
+        data = self.client.post(f'/reviews/{self.review.pk}/helpful/', {'action': 'helpful'}, **ajax).json()
+        self.assertEqual((data['helpful_count'], data['user_voted_helpful']), (1, True))
+        self.assertEqual(self.client.get(f'{url}/').data['user_voted'], 'helpful')
+
+    def test_cast_is_one_upsert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cast_vote(self.review.pk, self.fan.pk, True)[1:], (True, True))
+        writes = [q['sql'] for q in queries.captured_queries if 'reviews_reviewinteraction' in q['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+
+        version = ProductVersion.objects.get(product=self.product).version
+        self.assertEqual(cast_vote(self.review.pk, self.fan.pk, True)[1:], (False, False))
+        self.assertEqual(ProductVersion.objects.get(product=self.product).version, version)
+        vote, created, changed = cast_vote(self.review.pk, self.fan.pk, False)
+        self.assertEqual((created, changed), (False, True))
+        stored = ReviewInteraction.objects.get(review=self.review, user=self.fan)
+        self.assertEqual((vote.pk, vote.helpful, vote.created_at), (stored.pk, False, stored.created_at))
+        self.assertEqual(self.counters(), (0, 1, 1))
+        self.assertIs(retract_vote(self.review.pk, self.fan.pk), False)
+        self.assertIsNone(retract_vote(self.review.pk, self.fan.pk))
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+
+# ✅ اختبارات درجة Wilson للترتيب حسب الأكثر فائدة
+class HelpfulnessScoreTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='scribe', password='pass123')
+        self.voters = [User.objects.create_user(username=f'voter{i}', password='pass123') for i in range(10)]
+        self.product = Product.objects.create(name='Mixer', description='D', price=10)
+
+    def review_with_votes(self, helpful, unhelpful):
+        review = Review.objects.create(product=self.product, user=self.author, rating=4,
+                                       review_text='Mixes well', visible=True)
+        for i, voter in enumerate(self.voters[:helpful + unhelpful]):
+            cast_vote(review.pk, voter.pk, i < helpful)
+        return review
+
+    def score(self, review):
+        return Review.objects.values_list('helpfulness_score', flat=True).get(pk=review.pk)
+
+    def test_score_follows_votes(self):
+        self.assertAlmostEqual(wilson_lower_bound(1, 0), 0.2065, places=4)
+        self.assertAlmostEqual(wilson_lower_bound(3, 7), 0.1078, places=4)
+        review = self.review_with_votes(3, 7)
+        self.assertAlmostEqual(self.score(review), wilson_lower_bound(3, 7))
+
+        with CaptureQueriesContext(connection) as queries:
+            cast_vote(review.pk, self.voters[9].pk, True)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "reviews_review"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('helpfulness_score', updates[0])
+        self.assertAlmostEqual(self.score(review), wilson_lower_bound(4, 6))
+
+        ReviewInteraction.objects.filter(review=review).delete()
+        self.assertEqual(self.score(review), 0)
+
+    def test_web_and_api_sort_by_score(self):
+        few = self.review_with_votes(1, 0)
+        many = self.review_with_votes(3, 7)
+        unvoted = self.review_with_votes(0, 0)
+
+        response = self.client.get(f'/product/{self.product.pk}/', {'sort': 'helpful'})
+        self.assertEqual([review.pk for review in response.context['reviews']], [few.pk, many.pk, unvoted.pk])
+        response = APIClient().get('/api/reviews/', {'sort_by': 'most_helpful', 'page_size': 2})
+        self.assertEqual([row['id'] for row in response.data], [few.pk, many.pk])
+        response = APIClient().get('/api/reviews/', {'sort_by': 'most_helpful', 'page_size': 2,
+                                                     'cursor': response['X-Next-Cursor']})
+        self.assertEqual([row['id'] for row in response.data], [unvoted.pk])
+
+        plan = Review.objects.filter(product=self.product).order_by(*REVIEW_SORTS['most_helpful']).explain()
+        self.assertIn('USING INDEX', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_reconcile_fixes_score(self):
+        review = self.review_with_votes(2, 0)
+        Review.objects.filter(pk=review.pk).update(helpfulness_score=0.9)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertAlmostEqual(self.score(review), wilson_lower_bound(2, 0))
+
+
+# ✅ اختبارات لوحات أفضل المراجعات (leaderboard.py)
+@override_settings(REVIEWS_LEADERBOARD_SIZE=3)
+class LeaderboardTestCase(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.author = User.objects.create_user(username='critic', password='pass123')
+        self.voters = [User.objects.create_user(username=f'fan{i}', password='pass123') for i in range(5)]
+        self.phone = Product.objects.create(name='Phone', description='D', price=10)
+        self.laptop = Product.objects.create(name='Laptop', description='D', price=20)
+        self.reviews = [
+            Review.objects.create(product=self.phone if i < 3 else self.laptop, user=self.author, rating=4,
+                                  review_text=f'Review {i}', visible=True)
+            for i in range(5)
+        ]
+        self.client = APIClient()
+
+    def board(self, product=None):
+        entries = ReviewLeaderboardEntry.objects.filter(product=product) if product \
+            else ReviewLeaderboardEntry.objects.filter(product__isnull=True)
+        return list(entries.order_by('rank').values_list('review_id', flat=True))
+
+    def expected(self, product=None):
+        reviews = Review.objects.filter(visible=True)
+        if product:
+            reviews = reviews.filter(product=product)
+        return list(reviews.order_by('-helpful_count', '-created_at', '-id').values_list('pk', flat=True)[:3])
+
+    def vote(self, review, count):
+        for voter in self.voters[:count]:
+            cast_vote(review.pk, voter.pk, True)
+
+    def test_boards_follow_votes_and_visibility(self):
+        first, second, third, fourth, fifth = self.reviews
+        self.assertEqual(self.board(), [fifth.pk, fourth.pk, third.pk])  # الأحدث أولًا عند التعادل
+        self.vote(first, 2)
+        self.vote(fourth, 1)
+        self.assertEqual(self.board(), [first.pk, fourth.pk, fifth.pk])
+        self.assertEqual(self.board(self.phone), [first.pk, third.pk, second.pk])
+
+        retract_vote(first.pk, self.voters[0].pk)
+        retract_vote(first.pk, self.voters[1].pk)
+        self.assertEqual(self.board(), self.expected())
+
+        fourth.visible = False
+        fourth.save()
+        self.assertEqual(self.board(self.laptop), [fifth.pk])
+        bulk_set_visibility(Review.objects.filter(pk=fourth.pk), True)
+        fifth.product = self.phone
+        fifth.save()
+        for product in (None, self.phone, self.laptop):
+            self.assertEqual(self.board(product), self.expected(product))
+
+        first.delete()
+        self.assertEqual(self.board(self.phone), self.expected(self.phone))
+        self.assertEqual(len(self.board()), 3)
+
+    def test_top_review_reads_the_board(self):
+        first, second, third, fourth, fifth = self.reviews
+        self.vote(second, 3)
+        self.vote(fourth, 1)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reviews/top-review/')
+        self.assertEqual((response.data['id'], response.data['likes']), (second.pk, 3))
+
+        response = self.client.get('/api/reviews/top-review/', {'product': self.laptop.pk, 'k': 2})
+        self.assertEqual((response.data['product'], response.data['k']), (self.laptop.pk, 2))
+        self.assertEqual([row['id'] for row in response.data['results']], [fourth.pk, fifth.pk])
+        self.assertEqual(self.client.get('/api/reviews/top-review/', {'k': 4}).status_code, 400)
+        self.assertEqual(self.client.get('/api/reviews/top-review/', {'product': 'x'}).status_code, 400)
+        empty = Product.objects.create(name='Tablet', description='D', price=30)
+        self.assertEqual(self.client.get('/api/reviews/top-review/', {'product': empty.pk}).status_code, 404)
+
+    def test_rebuild_command_repairs_drift(self):
+        self.vote(self.reviews[0], 1)
+        Review.objects.filter(pk=self.reviews[1].pk).update(helpful_count=9)  # يتجاوز الإشارات
+        ReviewLeaderboardEntry.objects.filter(product=self.laptop).delete()
+        call_command('rebuild_leaderboards', chunk_size=1, stdout=StringIO())
+        for product in (None, self.phone, self.laptop):
+            self.assertEqual(self.board(product), self.expected(product))
+
+    def test_global_board_rejects_duplicate_entries(self):
+        entry = ReviewLeaderboardEntry.objects.filter(product__isnull=True).first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ReviewLeaderboardEntry.objects.create(review_id=entry.review_id, rank=9, helpful_count=0,
+                                                  created_at=entry.created_at)
+        rebuild_board(None)
+        self.assertEqual(self.board(), self.expected())
+
+    def test_rebuild_locks_the_board_row_and_skips_a_colliding_rebuild(self):
+        GlobalLeaderboard.objects.all().delete()
+        rebuild_board(None)  # الصف يُعاد إنشاؤه إن لم يكن موجودًا
+        first = GlobalLeaderboard.objects.get().rebuilt_at
+        rebuild_board(None)
+        self.assertGreater(GlobalLeaderboard.objects.get().rebuilt_at, first)
+
+        before = self.board()
+        with mock.patch.object(ReviewLeaderboardEntry.objects, 'bulk_create', side_effect=IntegrityError):
+            self.vote(self.reviews[0], 2)  # التصويت يعيد بناء اللوحة ولا يفشل
+        self.assertEqual(Review.objects.get(pk=self.reviews[0].pk).helpful_count, 2)
+        self.assertEqual(self.board(), before)
+
+
+# ✅ اختبارات الإحصائيات اليومية للمنتجات (daily_stats.py)
+class DailyStatsTestCase(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='diarist', password='pass123')
+        self.product = Product.objects.create(name='Kettle', description='D', price=10)
+        self.other = Product.objects.create(name='Toaster', description='D', price=20)
+
+    def review(self, rating, text, visible=True, product=None):
+        return Review.objects.create(product=product or self.product, user=self.user, rating=rating,
+                                     review_text=text, visible=visible)
+
+    def stored(self):
+        rows = ReviewDailyStats.objects.values('product_id', 'date', 'count', 'rating_sum',
+                                               'positive', 'neutral', 'negative')
+        return {(row.pop('product_id'), row.pop('date')): row for row in rows if row['count']}
+
+    maxDiff = None
+
+    def assertStatsMatchReviews(self):
+        self.assertEqual(self.stored(), compute_daily_stats([self.product.pk, self.other.pk]))
+
+    def test_stats_follow_writes(self):
+        great = self.review(5, 'Great kettle, excellent and fast')
+        awful = self.review(1, 'Terrible kettle, awful and broken')
+        hidden = self.review(3, 'Boils water', visible=False)
+        today = timezone.now().date()
+        self.assertEqual(self.stored()[(self.product.pk, today)]['count'], 2)
+
+        self.assertEqual(process_pending_sentiment(), 3)
+        row = self.stored()[(self.product.pk, today)]
+        self.assertEqual((row['positive'], row['negative'], row['rating_sum']), (1, 1, 6))
+
+        great, awful = Review.objects.get(pk=great.pk), Review.objects.get(pk=awful.pk)
+        great.rating = 4
+        great.save(update_fields=['rating'])
+        awful.visible = False
+        awful.save()
+        bulk_set_visibility(Review.objects.filter(pk=hidden.pk), True)
+        hidden.refresh_from_db()
+        hidden.product = self.other
+        hidden.save()
+        self.assertStatsMatchReviews()
+        self.product.delete()
+        self.assertStatsMatchReviews()
+
+    def test_analytics_reads_daily_rows(self):
+        now = timezone.now()
+        for days_ago, rating, text in [(0, 5, 'Excellent, love it'), (1, 3, 'Boils water'),
+                                       (2, 1, 'Terrible and awful'), (9, 5, 'Great great')]:
+            review = self.review(rating, text)
+            Review.objects.filter(pk=review.pk).update(created_at=now - timedelta(days=days_ago))
+        process_pending_sentiment()
+        call_command('rebuild_daily_stats', stdout=StringIO())
+
+        url = f'/products/{self.product.pk}/analytics/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'days': 3, 'include': 'series,sentiment'})
+        self.assertFalse([q for q in queries.captured_queries if 'reviews_review"' in q['sql']])
+        self.assertEqual((response.data['review_count_last_days'], response.data['average_rating_last_days']),
+                         (3, 3.0))
+        self.assertEqual(response.data['sentiment'], {'positive': 1, 'neutral': 1, 'negative': 1})
+        self.assertEqual([(point['date'], point['review_count']) for point in response.data['series']],
+                         [((now - timedelta(days=2 - i)).date(), 1) for i in range(3)])
+        self.assertNotIn('series', self.client.get(url, {'days': 10}).data)
+        self.assertEqual(self.client.get(url, {'days': 10}).data['review_count_last_days'], 4)
+        self.assertEqual(self.client.get(url, {'include': 'users'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'days': 'week'}).status_code, 400)
+
+    def test_rebuild_reports_drift(self):
+        review = self.review(4, 'Fine')
+        Review.objects.filter(pk=review.pk).update(created_at=timezone.now() - timedelta(days=3))
+        out = StringIO()
+        call_command('rebuild_daily_stats', stdout=out)
+        self.assertIn(f'Repaired daily stats of 1 products: {self.product.pk}', out.getvalue())
+        self.assertStatsMatchReviews()
+        out = StringIO()
+        call_command('rebuild_daily_stats', stdout=out)
+        self.assertIn('up to date', out.getvalue())
@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from .views import  add_comment, delete_review, edit_review_view ,login_view ,logout_view, KeywordSearchReviewsView,notifications_page,register_view, ReviewCommentViewSet, ReviewViewSet,RegisterView, ProductViewSet, ReviewVoteViewSet ,ProductAnalyticsView, TopRatedProductsView, TopReviewersView ,ReviewApproveView, BannedWordsReviewsView, BannedWordViewSet, NotificationViewSet, add_review, product_detail_view, product_list_view, report_review
+from .views import  add_comment, delete_review, edit_review_view ,login_view ,logout_view, KeywordSearchReviewsView,notifications_page,register_view, ReviewCommentViewSet, ReviewViewSet,RegisterView, ProductViewSet, ReviewVoteViewSet ,ProductAnalyticsView, TopRatedProductsView, TopReviewersView ,ReviewApproveView, BannedWordsReviewsView, SentimentScoreView, BannedWordViewSet, NotificationViewSet, add_review, product_detail_view, product_list_view, report_review
 from django.urls import path, include
 from . import views
 from django.contrib.auth import views as auth_views
@@ -47,6 +47,7 @@ urlpatterns = [
     path('analytics/top-reviewers/', TopReviewersView.as_view(), name='top-reviewers'),
     path('analytics/top-products/', TopRatedProductsView.as_view(), name='top-rated-products'),
     path('analytics/search-reviews/', KeywordSearchReviewsView.as_view(), name='search-reviews'),
+    path('api/sentiment/score/', SentimentScoreView.as_view(), name='sentiment-score'),
     
     # Admin Tools
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
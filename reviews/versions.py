@@ -0,0 +1,115 @@
+"""
+Per-product content versions for conditional GETs.
+
+Every product has a ``ProductVersion`` row whose ``version`` is bumped (and
+``modified_at`` set) whenever something rendered by its review endpoints
+changes: a review is created, edited, deleted or shown/hidden, or one of its
+interactions, votes, comments or reports is written.  Read endpoints wrapped
+with ``conditional_get`` look the version up with one primary-key query and
+answer ``If-None-Match`` / ``If-Modified-Since`` with ``304 Not Modified``
+before running their own queries; other responses carry a strong ``ETag``
+and ``Last-Modified``.
+
+The ETag also covers the path and query string, the negotiated media type
+and the viewer (responses include per-user state such as ``has_report``).
+``views`` is deliberately not versioned: it changes on every read, so a 304
+may stand for a slightly older view count (the revalidation itself is still
+counted as a view).  Products without a version row
+(e.g. created with ``bulk_create``) are simply never answered with a 304.
+"""
+from functools import wraps
+from hashlib import blake2b
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def bump_product_versions(product_ids):
+    """Mark ``product_ids`` as changed: one ``UPDATE`` (no-op for an empty list)."""
+    from .models import ProductVersion
+
+    product_ids = {product_id for product_id in product_ids if product_id is not None}
+    if product_ids:
+        ProductVersion.objects.filter(product_id__in=product_ids)\
+            .update(version=F('version') + 1, modified_at=timezone.now())
+
+
+def bump_review_products(review_ids):
+    """``bump_product_versions`` for the products of ``review_ids`` (the lookup is a subquery of the same ``UPDATE``)."""
+    from .models import ProductVersion, Review
+
+    ProductVersion.objects.filter(product_id__in=Review.objects.filter(pk__in=review_ids).values('product_id'))\
+        .update(version=F('version') + 1, modified_at=timezone.now())
+
+
+def product_version(product_id):
+    """``(version, modified_at)`` of a product, or None."""
+    from .models import ProductVersion
+
+    try:
+        return ProductVersion.objects.filter(product_id=product_id)\
+            .values_list('version', 'modified_at').first()
+    except (TypeError, ValueError):
+        return None
+
+
+def review_product_version(review_id):
+    """``(version, modified_at)`` of the product a review belongs to, or None."""
+    from .models import ProductVersion
+
+    try:
+        return ProductVersion.objects.filter(product__reviews__pk=review_id)\
+            .values_list('version', 'modified_at').first()
+    except (TypeError, ValueError):
+        return None
+
+
+def make_etag(request, version, extra=''):
+    user = getattr(request, 'user', None)
+    key = '|'.join([
+        request.path,
+        '&'.join(f'{name}={",".join(values)}' for name, values in sorted(request.GET.lists())),
+        getattr(request, 'accepted_media_type', '') or '',
+        str(user.pk if user is not None and user.is_authenticated else ''),
+        str(extra),
+    ])
+    return quote_etag(f'{version}-{blake2b(key.encode(), digest_size=8).hexdigest()}')
+
+
+def conditional_get(get_version, lookup='pk', extra=None, last_modified=True, on_not_modified=None):
+    """
+    Decorator for a DRF view method: ``get_version(kwargs[lookup])`` returns
+    the ``(version, modified_at)`` the response depends on.  ``extra(request)``
+    adds anything else the body depends on to the ETag.  With
+    ``last_modified=False`` only the ETag is used (for bodies that also change
+    with time).  ``on_not_modified(request, kwargs[lookup])`` runs when the
+    view is skipped for a 304 (side effects of the read, e.g. counting it).
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+            state = get_version(kwargs.get(lookup))
+            if state is None:
+                return view_method(self, request, *args, **kwargs)
+
+            version, modified_at = state
+            etag = make_etag(request, version, extra(request) if extra else '')
+            timestamp = int(modified_at.timestamp()) if last_modified and modified_at else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+            elif on_not_modified:
+                on_not_modified(request, kwargs.get(lookup))
+            if response.status_code not in (200, 304):
+                return response
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
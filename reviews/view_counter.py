@@ -0,0 +1,222 @@
+"""
+Buffered review view counter.
+
+Counting a view used to be an ``UPDATE ... SET views = views + 1`` (plus a
+re-read) on every ``GET`` of a review, which on SQLite takes the database
+write lock for every read.  Views are now added to an in-process buffer
+instead and written in batches: one ``UPDATE reviews_review SET views = views
++ CASE id WHEN ... END`` per chunk of reviews, when the buffer holds
+``REVIEWS_VIEW_FLUSH_THRESHOLD`` views or ``REVIEWS_VIEW_FLUSH_INTERVAL``
+seconds have passed since the oldest pending view, and at interpreter exit.
+A crash loses at most that many views of this process.  The batches are
+written by a background thread (with its own database connection), so a
+``GET`` never waits for one; ``REVIEWS_VIEW_BACKGROUND_FLUSH = False``
+leaves the writes to ``flush_views()`` and the exit hook (the tests do so).
+
+The same batches carry the hashed viewer keys (user id, or IP address for
+anonymous readers) of each review, which are merged into its
+``ReviewViewerSketch`` (a HyperLogLog, see ``hll.py``) for unique-viewer
+counts, and are added to the current hour's activity rollups (``rollups.py``).
+
+``Review.views`` is the persisted count; ``view_count(review)`` adds the
+views still pending in this process and is what the API returns.  The
+batched ``UPDATE`` bypasses signals, so counting views does not bump the
+product version (ETags) nor clear cached analytics.  Pending views of a
+review are dropped when a review with that id is created or deleted, so they
+never land on a different review.
+"""
+import atexit
+from collections import Counter, defaultdict
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from .hll import HyperLogLog, viewer_hash
+
+FLUSH_CHUNK_SIZE = 500
+
+
+class ViewCounterBuffer:
+    def __init__(self):
+        self._pending = Counter()
+        self._viewers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._wake = threading.Event()
+        self._flusher = None
+
+    @property
+    def threshold(self):
+        return getattr(settings, 'REVIEWS_VIEW_FLUSH_THRESHOLD', 500)
+
+    @property
+    def interval(self):
+        return getattr(settings, 'REVIEWS_VIEW_FLUSH_INTERVAL', 10)
+
+    @property
+    def background(self):
+        return getattr(settings, 'REVIEWS_VIEW_BACKGROUND_FLUSH', True)
+
+    def record(self, review_id, count=1, viewer=None):
+        """Count ``count`` views of a review (by ``viewer``, a hashed key); wakes the flusher if the buffer is due."""
+        with self._lock:
+            if not self._pending:
+                # المهلة تُحسب من أول مشاهدة معلّقة، لا من آخر كتابة (وإلا تُكتب أول مشاهدة بعد فترة هدوء فورًا)
+                self._last_flush = time.monotonic()
+            self._pending[review_id] += count
+            if viewer is not None:
+                self._viewers[review_id].add(viewer)
+            due = self._due()
+        if due:
+            self.schedule_flush()
+
+    def _due(self):
+        # يُستدعى والقفل ممسوك
+        return bool(self._pending) and (sum(self._pending.values()) >= self.threshold
+                                        or time.monotonic() - self._last_flush >= self.interval)
+
+    def schedule_flush(self):
+        """Ask the background thread to write the buffer (started on first use), without waiting for it."""
+        if not self.background:
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name='review-view-flusher', daemon=True)
+                self._flusher.start()
+        self._wake.set()
+
+    def _run_flusher(self):
+        while True:
+            # يستيقظ عند الطلب أو كل interval ثانية (لتُكتب المشاهدات المعلّقة حتى بلا زيارات جديدة)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                due = self._due()
+            if not due or not self.background:
+                continue
+            try:
+                self.flush()
+            except DatabaseError:
+                pass  # flush() أعاد المشاهدات إلى الـ buffer؛ نعيد المحاولة في الدورة التالية
+            finally:
+                connection.close()
+
+    def pending(self, review_id):
+        with self._lock:
+            return self._pending.get(review_id, 0)
+
+    def discard(self, review_id):
+        """Forget the pending views of a review (created or deleted: its id may be reused)."""
+        with self._lock:
+            self._pending.pop(review_id, None)
+            self._viewers.pop(review_id, None)
+
+    def flush(self):
+        """Write every pending view (one ``UPDATE`` per chunk of reviews).  Returns the number of views written."""
+        from .models import Review
+        from .rollups import add_views
+
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            viewers, self._viewers = self._viewers, defaultdict(set)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        items = sorted(pending.items())
+        try:
+            for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+                chunk = items[start:start + FLUSH_CHUNK_SIZE]
+                Review.objects.filter(pk__in=[review_id for review_id, _ in chunk]).update(views=F('views') + Case(
+                    *[When(pk=review_id, then=Value(count)) for review_id, count in chunk],
+                    default=Value(0), output_field=PositiveIntegerField(),
+                ))
+        except Exception:
+            # نعيد ما لم يُكتب إلى الـ buffer حتى لا تضيع المشاهدات
+            with self._lock:
+                self._pending.update(dict(items[start:]))
+                for review_id, hashes in viewers.items():
+                    self._viewers[review_id] |= hashes
+            raise
+        add_views(pending)
+        if viewers:
+            merge_viewer_hashes(viewers)
+        return sum(pending.values())
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._viewers.clear()
+
+
+view_buffer = ViewCounterBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        view_buffer.flush()
+    except DatabaseError:
+        pass
+
+
+def viewer_key(request):
+    """Hashed identity of the reader: the user, or the IP address for anonymous requests."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return viewer_hash(f'user:{user.pk}')
+    return viewer_hash(f"ip:{request.META.get('REMOTE_ADDR', '')}")
+
+
+def record_view(review_id, request=None):
+    view_buffer.record(review_id, viewer=viewer_key(request) if request is not None else None)
+
+
+def view_count(review):
+    """Persisted views of ``review`` plus the views still buffered in this process."""
+    return review.views + view_buffer.pending(review.pk)
+
+
+def flush_views():
+    return view_buffer.flush()
+
+
+def merge_viewer_hashes(viewers):
+    """Merge ``{review_id: {viewer hash, ...}}`` into the reviews' sketches (one read, one upsert)."""
+    from .models import Review, ReviewViewerSketch
+
+    with transaction.atomic():
+        review_ids = set(Review.objects.filter(pk__in=list(viewers)).values_list('pk', flat=True))
+        stored = dict(
+            ReviewViewerSketch.objects.select_for_update().filter(review_id__in=review_ids)
+            .values_list('review_id', 'sketch')
+        )
+        rows = []
+        for review_id in sorted(review_ids):
+            sketch = HyperLogLog.from_bytes(stored.get(review_id))
+            sketch.add_hashes(viewers[review_id])
+            rows.append(ReviewViewerSketch(review_id=review_id, sketch=sketch.to_bytes(),
+                                           unique_viewers=sketch.count()))
+        ReviewViewerSketch.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['review'],
+            update_fields=['sketch', 'unique_viewers', 'updated_at'],
+        )
+
+
+def unique_viewers(review_ids):
+    """
+    Estimated number of distinct viewers across ``review_ids`` (their
+    sketches merged, so someone who read several of them counts once).
+    Returns ``(count, exact)``.
+    """
+    from .models import ReviewViewerSketch
+
+    merged = HyperLogLog()
+    sketches = ReviewViewerSketch.objects.filter(review_id__in=review_ids)\
+        .values_list('sketch', flat=True).iterator(chunk_size=500)
+    for data in sketches:
+        merged.merge(HyperLogLog.from_bytes(data))
+    return merged.count(), merged.is_exact
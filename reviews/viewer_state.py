@@ -0,0 +1,48 @@
+"""
+Per-request state of the current user towards a page of reviews.
+
+``ReviewSerializer`` needs, for every review, whether the viewer reported it,
+interacted with it or voted on it.  Asking each review separately costs
+several queries per row; ``ReviewViewerState`` loads the same information for
+the whole page with one query per relation (none for anonymous users, who
+have no personal state).  Counts come from the counter columns on ``Review``.
+"""
+
+
+# Serializer field -> the relation it needs (both vote fields come from the one vote store).
+VIEWER_FIELDS = {
+    'has_report': 'reports',
+    'user_interacted': 'votes',
+    'user_voted': 'votes',
+}
+
+
+class ReviewViewerState:
+    def __init__(self, reviews, user, fields=None):
+        """``fields``: the serializer fields being rendered; relations nobody asked for are not queried."""
+        from .models import ReviewReport
+        from .votes import user_votes
+
+        self.review_ids = {review.pk for review in reviews}
+        self.reported = set()
+        self.votes = {}
+        if not self.review_ids or user is None or not user.is_authenticated:
+            return
+
+        needed = set(VIEWER_FIELDS.values()) if fields is None else {
+            relation for field, relation in VIEWER_FIELDS.items() if field in fields
+        }
+        ids = list(self.review_ids)
+        if 'reports' in needed:
+            self.reported = set(
+                ReviewReport.objects.filter(user=user, review_id__in=ids).values_list('review_id', flat=True)
+            )
+        if 'votes' in needed:
+            self.votes = user_votes(user, ids)
+
+    @property
+    def interacted(self):
+        return self.votes.keys()
+
+    def covers(self, review):
+        return review.pk in self.review_ids
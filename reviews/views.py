@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import date, timedelta
 import csv
 import openpyxl
 from io import BytesIO
@@ -18,6 +18,7 @@ from rest_framework import viewsets, permissions, status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.settings import api_settings
 from rest_framework.permissions import (
     AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly, IsAdminUser
 )
@@ -26,11 +27,12 @@ from .models import (
     Product,
     Review,
     ReviewComment,
-    ReviewVote,
     ReviewInteraction,
     BannedWord,
     Notification,
     ReviewReport,
+    ReviewBannedWordMatch,
+    ProductRatingStats,
 )
 from .serializers import (
     RegisterSerializer,
@@ -40,11 +42,129 @@ from .serializers import (
     ReviewVoteSerializer,
     BannedWordSerializer,
     NotificationSerializer,
+    sparse_field_names,
 )
+from .columnar import columnar_response
+from .daily_stats import SENTIMENT_FIELDS, STAT_FIELDS, daily_stats
+from .leaderboard import leaderboard_size, top_reviews
+from .pagination import InvalidCursor, KeysetPagination, keyset_page
 from .permissions import IsOwnerOrReadOnly
+from .rating_stats import bulk_set_visibility, rating_summary, with_rating_stats
+from .renderers import ColumnarRenderer
+from .rollups import product_activity, retention_days
+from .response_cache import cached_response, product_tags, response_cache_info
+from .sentiment import score_texts, sentiment_cache_info
+from .sentiment_backends import BACKENDS, get_sentiment_backend
+from .versions import conditional_get, product_version, review_product_version
+from .view_counter import record_view, unique_viewers, view_count
+from .votes import cast_vote, toggle_vote, user_votes
 
 User = get_user_model()
 
+# أقصى عدد مراجعات يمكن قبولها/رفضها في طلب واحد (تحديث واحد UPDATE)
+MODERATION_BULK_LIMIT = 5000
+MODERATION_PAGE_SIZE = 50
+MODERATION_MAX_PAGE_SIZE = 200
+RATING_SUMMARY_BATCH_LIMIT = 100
+# ✅ أطول فترة تُعاد في سلسلة النشاط الزمنية لكل دقة (بالأيام)
+ACTIVITY_MAX_DAYS = {'day': 366, 'hour': 31}
+# ✅ الأجزاء الاختيارية في تحليلات المنتج (?include=)، تُقرأ من نفس صفوف ReviewDailyStats
+ANALYTICS_INCLUDES = {'series', 'sentiment'}
+
+# ✅ حدود ?limit= و ?days= في قوائم التحليلات المخزنة مؤقتًا (تُقص القيم الأكبر)
+ANALYTICS_MAX_LIMIT = 100
+SEARCH_MAX_LIMIT = 200
+
+
+def int_param(request, name, default, minimum, maximum):
+    """``?name=`` as an int clamped to ``minimum``..``maximum`` (``default`` if absent); ValueError if not an int."""
+    raw = request.query_params.get(name, '').strip()
+    try:
+        value = int(raw) if raw else default
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    return min(max(value, minimum), maximum)
+
+
+def top_reviewers_params(request):
+    return {'limit': int_param(request, 'limit', 10, 1, ANALYTICS_MAX_LIMIT)}
+
+
+def top_products_params(request):
+    return {
+        'days': int_param(request, 'days', 30, 1, ACTIVITY_MAX_DAYS['day']),
+        'limit': int_param(request, 'limit', 10, 1, ANALYTICS_MAX_LIMIT),
+    }
+
+
+def keyword_search_params(request):
+    return {
+        'keyword': request.query_params.get('q', '').strip(),
+        'limit': int_param(request, 'limit', 50, 1, SEARCH_MAX_LIMIT),
+    }
+
+
+def viewer_cache_key(request):
+    """Part of a cached response's key for data that depends on who is reading."""
+    user = getattr(request, 'user', None)
+    return f'user:{user.pk}' if user is not None and user.is_authenticated else 'anonymous'
+
+
+# ✅ أنماط ترتيب قائمة المراجعات (sort_by). كلها تنتهي بـ -id ليكون لكل مراجعة موضع فريد
+# للـ cursor؛ newest يستخدم فهرس (product, -created_at)، و most_helpful فهرس درجة Wilson
+REVIEW_SORTS = {
+    'newest': ['-created_at', '-id'],
+    'highest_rating': ['-rating', '-created_at', '-id'],
+    'most_interactive': ['-interaction_count', '-created_at', '-id'],
+    'most_helpful': ['-helpfulness_score', '-id'],
+}
+
+
+def only_rendered_columns(request, queryset):
+    """
+    Trim a review queryset to what ReviewSerializer will render for this
+    request (?fields= / ?omit=): join the author only when ``user`` is
+    rendered and skip the review text when neither ``review_text`` nor
+    ``snippet`` is.
+    """
+    fields = sparse_field_names(request, ReviewSerializer.Meta.fields, ReviewSerializer.Meta.optional_fields)
+    if 'user' in fields:
+        queryset = queryset.select_related('user')
+    if not fields & {'review_text', 'snippet'}:
+        queryset = queryset.defer('review_text')
+    return queryset
+
+
+def filter_by_banned_word_severity(queryset, query_params):
+    """
+    Apply the ``severity`` / ``min_severity`` filters shared by the banned word
+    endpoints.  ``severity`` goes through the indexed match table and
+    ``min_severity`` through the denormalized ``Review.max_severity`` column.
+    Returns ``(queryset, error_response)``.
+    """
+    for param in ('severity', 'min_severity'):
+        value = query_params.get(param)
+        if not value:
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            return queryset, Response(
+                {"detail": f"Invalid {param} parameter"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if value not in [1, 2, 3]:
+            return queryset, Response(
+                {"detail": "Severity must be 1, 2, or 3"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if param == 'severity':
+            matching = ReviewBannedWordMatch.objects.filter(severity=value).values('review_id')
+            queryset = queryset.filter(pk__in=matching)
+        else:
+            queryset = queryset.filter(max_severity__gte=value)
+    return queryset, None
 
 
 # =============================================================================
@@ -59,21 +179,23 @@ class ReviewViewSet(viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination
     lookup_field = 'pk'
 
     def get_queryset(self):
         """
         Optimize queryset with proper joins and filtering based on action.
         """
-        if self.action in ['update', 'partial_update', 'destroy', 'retrieve']:
+        # Per-viewer state and counts are loaded for the whole page by
+        # ReviewSerializer (see viewer_state.py), so nothing is prefetched here.
+        if self.action in ['update', 'partial_update', 'destroy']:
             # For modification actions, return all reviews with optimized queries
-            return Review.objects.select_related('user', 'product')\
-                .prefetch_related('interactions', 'votes', 'reports', 'comments')
+            return Review.objects.select_related('user', 'product')
+        if self.action == 'retrieve':
+            return only_rendered_columns(self.request, Review.objects.all())
     
         # For list actions, only show visible reviews with filters
-        queryset = Review.objects.filter(visible=True)\
-            .select_related('user', 'product')\
-            .prefetch_related('interactions', 'votes', 'reports', 'comments')
+        queryset = only_rendered_columns(self.request, Review.objects.filter(visible=True))
         
         # Filter by product if specified
         product_id = self.request.query_params.get('product')
@@ -96,24 +218,31 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 pass
                 
         # Laith: Added support for sorting reviews
-        sort_by = self.request.query_params.get('sort_by', 'created_at')
-        
-        if sort_by == 'newest':
-            # Sort by creation date (newest first)
-            queryset = queryset.order_by('-created_at')
-        elif sort_by == 'highest_rating':
-            # Sort by rating (highest first)
-            queryset = queryset.order_by('-rating')
-        elif sort_by == 'most_interactive':
-            # Sort by number of interactions (most interactions first)
-            queryset = queryset.annotate(
-                interaction_count=Count('interactions')
-            ).order_by('-interaction_count')
-        else:
-            # Default sorting by created_at (newest first)
-            queryset = queryset.order_by('-created_at')
-            
-        return queryset
+        # (الترتيب الفعلي يطبّقه KeysetPagination حسب get_keyset_ordering)
+        return queryset.order_by(*self.get_keyset_ordering())
+
+    def get_keyset_ordering(self):
+        """
+        Ordering for the current sort mode. Each one ends with ``-id`` so every
+        review has a unique position and cursors stay stable.
+        """
+        if self.action != 'list':
+            return REVIEW_SORTS['newest']
+        sort_by = self.request.query_params.get('sort_by', 'newest')
+        return REVIEW_SORTS.get(sort_by, REVIEW_SORTS['newest'])
+
+
+    def get_renderers(self):
+        """The list also supports ?format=columnar (see columnar.py)."""
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            renderers.append(ColumnarRenderer())
+        return renderers
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == ColumnarRenderer.format:
+            return columnar_response(request, self.get_queryset(), self.paginator, self)
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         """Set the user when creating a review."""
@@ -126,16 +255,19 @@ class ReviewViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    @conditional_get(review_product_version,
+                     on_not_modified=lambda request, pk: record_view(int(pk), request))
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieve a single review and increment view count.
         Fixed: Removed duplicate method and optimized view counting.
+        Conditional requests (If-None-Match / If-Modified-Since) are answered
+        with 304 from the product version, without loading the review; they
+        still count as a view of it.
+        Views are buffered and written in batches (see view_counter.py).
         """
         instance = self.get_object()
-        # Increment views atomically to avoid race conditions
-        instance.views = models.F('views') + 1
-        instance.save(update_fields=["views"])
-        instance.refresh_from_db()
+        record_view(instance.pk, request)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -161,12 +293,8 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # تقييد كل مستخدم بتفاعل واحد لكل مراجعة
-        interaction, created = ReviewInteraction.objects.update_or_create(
-            review=review,
-            user=request.user,
-            defaults={'helpful': helpful}
-        )
+        # تقييد كل مستخدم بتفاعل واحد لكل مراجعة (upsert واحد في مخزن الأصوات، votes.py)
+        _, created, _ = cast_vote(review.pk, request.user.pk, helpful)
         
         action_text = "تم إنشاء" if created else "تم تحديث"
         return Response(
@@ -174,16 +302,40 @@ class ReviewViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    @action(detail=True, methods=['get'], url_path='unique-viewers')
+    def unique_viewers(self, request, pk=None):
+        """Estimated number of distinct viewers of a review (HyperLogLog, exact while small)."""
+        review = self.get_object()
+        count, exact = unique_viewers([review.pk])
+        return Response({'review_id': review.pk, 'unique_viewers': count, 'exact': exact})
+
     @action(detail=False, methods=['get'], url_path='top-review')
+    # الرد يحمل حالة القارئ (user_voted, user_interacted, has_report) ويتبع ?fields= و ?omit=
+    @cached_response('top_review', tags=['reviews', 'interactions'],
+                     params={'product': '', 'k': '', 'fields': '', 'omit': ''}, extra=viewer_cache_key, ttl=60)
     def top_review(self, request):
-        """عرض المراجعة التي حصلت على أكبر عدد من الإعجابات"""
-        
-        top = Review.objects.filter(visible=True).annotate(
-            likes=Count('interactions', filter=models.Q(interactions__helpful=True))
-        ).order_by('-likes', '-created_at').first()  # الأفضلية للأكثر إعجابًا ثم الأحدث
+        """
+        The most helpful visible review (most helpful votes, then newest), of the
+        whole site or of ?product=<id>, read from the materialized leaderboards
+        (leaderboard.py).  ?k=<n> returns the top n (n <= REVIEWS_LEADERBOARD_SIZE)
+        as {"product", "k", "results"} instead of a single review.
+        """
+        size = leaderboard_size()
+        try:
+            product_id = int(request.query_params['product']) if request.query_params.get('product') else None
+            k = int(request.query_params['k']) if request.query_params.get('k') else None
+        except ValueError:
+            return Response({"detail": "product and k must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if k is not None and not 1 <= k <= size:
+            return Response({"detail": f"k must be between 1 and {size}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if k is not None:
+            serializer = self.get_serializer(top_reviews(product_id, k), many=True)
+            return Response({'product': product_id, 'k': k, 'results': serializer.data})
 
+        top = top_reviews(product_id, 1)  # الأفضلية للأكثر إعجابًا ثم الأحدث
         if top:
-            serializer = self.get_serializer(top)
+            serializer = self.get_serializer(top[0])
             return Response(serializer.data)
         return Response(
             {"message": "لا توجد مراجعات بعد"}, 
@@ -224,7 +376,8 @@ class ReviewViewSet(viewsets.ModelViewSet):
         """Approve a review (admin only)."""
         review = self.get_object()
         review.visible = True
-        review.save()
+        review.moderated_at = timezone.now()
+        review.save(update_fields=['visible', 'moderated_at'])
         return Response({'status': 'Review Approved'})
     
     @action(detail=True, methods=['get', 'post'], permission_classes=[IsAuthenticatedOrReadOnly])
@@ -270,16 +423,8 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        vote, created = ReviewVote.objects.get_or_create(
-            review=review,
-            user=user,
-            defaults={'helpful': helpful}
-        )
-        
-        if not created:
-            vote.helpful = helpful
-            vote.save()
-        
+        vote, _, _ = cast_vote(review.pk, user.pk, helpful)
+        vote.user = user  # للـ username دون استعلام إضافي (cast_vote يعيد المعرفات فقط)
         serializer = ReviewVoteSerializer(vote)
         return Response(serializer.data)
 
@@ -288,39 +433,93 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def with_banned_words(self, request):
         """
         Returns reviews containing banned words.
-        Can filter by severity level using the 'severity' query parameter.
+        Can filter by severity level using the 'severity' query parameter,
+        or by the highest severity found using 'min_severity'.
         """
-        severity = request.query_params.get('severity')
-        
         queryset = Review.objects.filter(contains_banned_words=True)\
             .select_related('user', 'product')
+
+        queryset, error = filter_by_banned_word_severity(queryset, request.query_params)
+        if error:
+            return error
         
-        if severity:
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser], url_path='moderation-queue')
+    def moderation_queue(self, request):
+        """
+        Hidden reviews waiting for a moderator, oldest first.
+        Keyset-paginated on (created_at, id): pass back 'next_cursor' as ?cursor=.
+        Optional filters: severity, min_severity, min_reports, limit.
+        """
+        queryset = Review.objects.filter(visible=False, moderated_at__isnull=True)
+
+        queryset, error = filter_by_banned_word_severity(queryset, request.query_params)
+        if error:
+            return error
+
+        min_reports = request.query_params.get('min_reports')
+        if min_reports:
             try:
-                severity = int(severity)
-                if severity in [1, 2, 3]:  # Validate severity
-                    banned_words = BannedWord.objects.filter(severity=severity)\
-                        .values_list('word', flat=True)
-                    
-                    # Use database filtering instead of Python loops for better performance
-                    q_objects = Q()
-                    for word in banned_words:
-                        q_objects |= Q(banned_words_found__icontains=word)
-                    
-                    queryset = queryset.filter(q_objects)
-                else:
-                    return Response(
-                        {"detail": "Severity must be 1, 2, or 3"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                min_reports = int(min_reports)
             except ValueError:
                 return Response(
-                    {"detail": "Invalid severity parameter"}, 
+                    {"detail": "Invalid min_reports parameter"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+            queryset = queryset.filter(reports_count__gte=min_reports)  # العداد المخزّن بدل Count('reports')
+
+        try:
+            limit = min(int(request.query_params.get('limit', MODERATION_PAGE_SIZE)), MODERATION_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = MODERATION_PAGE_SIZE
+
+        rows = queryset.values(
+            'id', 'created_at', 'rating', 'review_text', 'max_severity', 'banned_words_found',
+            product_name=models.F('product__name'), username=models.F('user__username'),
+        )
+        try:
+            page, next_cursor = keyset_page(rows, ['created_at', 'id'],
+                                            request.query_params.get('cursor'), max(limit, 1))
+        except InvalidCursor:
+            return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': page, 'next_cursor': next_cursor})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], url_path='bulk-moderate')
+    def bulk_moderate(self, request):
+        """
+        Approve or reject many reviews at once: {"ids": [...], "action": "approve" | "reject"}.
+        Runs a single UPDATE on the reviews (plus the product rating stats);
+        the reviews are not re-saved or re-analyzed.
+        """
+        ids = request.data.get('ids')
+        moderation_action = request.data.get('action')
+
+        if moderation_action not in ('approve', 'reject'):
+            return Response(
+                {"detail": "action must be 'approve' or 'reject'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return Response(
+                {"detail": "ids must be a non-empty list of integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > MODERATION_BULK_LIMIT:
+            return Response(
+                {"detail": f"At most {MODERATION_BULK_LIMIT} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        updated = bulk_set_visibility(
+            Review.objects.filter(pk__in=set(ids)),
+            visible=(moderation_action == 'approve'),
+            moderated_at=timezone.now(),
+        )
+        return Response({'action': moderation_action, 'updated': updated})
 
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -331,11 +530,21 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
-        """Add computed fields for average rating and review count."""
-        return Product.objects.annotate(
-            average_rating=Avg('reviews__rating', filter=Q(reviews__visible=True)),
-            reviews_count=Count('reviews', filter=Q(reviews__visible=True))
-        ).select_related().prefetch_related('reviews')
+        """
+        Add average rating and review count from the precomputed ProductRatingStats.
+        Optional ?sort_by=rating|reviews orders by the indexed stats columns.
+        """
+        queryset = Product.objects.all()
+        sort_by = self.request.query_params.get('sort_by')
+        fields = sparse_field_names(self.request, ProductSerializer.Meta.fields)
+        # الربط مع جدول الإحصائيات فقط إذا طُلبت حقوله (?fields= / ?omit=)
+        if fields & {'average_rating', 'reviews_count'}:
+            queryset = with_rating_stats(queryset)
+        if sort_by == 'rating':
+            queryset = queryset.order_by('-rating_stats__average_rating', '-id')
+        elif sort_by == 'reviews':
+            queryset = queryset.order_by('-rating_stats__review_count', '-id')
+        return queryset
 
     def get_permissions(self):
         """Admin only for CUD operations, read for everyone else."""
@@ -367,17 +576,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             ])
             
             for review in reviews:
-                helpful_count = review.interactions.filter(helpful=True).count()
-                not_helpful_count = review.interactions.filter(helpful=False).count()
-                
                 writer.writerow([
                     review.user.username,
                     review.rating,
                     review.review_text,
                     review.created_at.strftime('%Y-%m-%d'),
-                    helpful_count,
-                    not_helpful_count,
-                    review.views,
+                    review.helpful_count,
+                    review.unhelpful_count,
+                    view_count(review),
                     review.sentiment
                 ])
             
@@ -398,17 +604,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             
             # كتابة البيانات
             for review in reviews:
-                helpful_count = review.interactions.filter(helpful=True).count()
-                not_helpful_count = review.interactions.filter(helpful=False).count()
-                
                 worksheet.append([
                     review.user.username,
                     review.rating,
                     review.review_text,
                     review.created_at.strftime('%Y-%m-%d'),
-                    helpful_count,
-                    not_helpful_count,
-                    review.views,
+                    review.helpful_count,
+                    review.unhelpful_count,
+                    view_count(review),
                     review.sentiment
                 ])
             
@@ -427,24 +630,125 @@ class ProductViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], url_path='rating-summary', permission_classes=[AllowAny])
+    def rating_summary(self, request, pk=None):
+        """
+        Star histogram, average and count of a product's visible reviews,
+        read from its ProductRatingStats row (no scan of the reviews).
+        """
+        try:
+            pk = int(pk)
+        except ValueError:
+            return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        stats = ProductRatingStats.objects.filter(product_id=pk).first()
+        if stats is None and not Product.objects.filter(pk=pk).exists():
+            return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(rating_summary(stats, pk))
+
+    @action(detail=False, methods=['get'], url_path='rating-summary', permission_classes=[AllowAny])
+    def rating_summaries(self, request):
+        """Batch form: ?ids=1,2,3 returns one summary per existing product, in the order given."""
+        try:
+            ids = list(dict.fromkeys(
+                int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()
+            ))
+        except ValueError:
+            return Response({"detail": "ids must be a comma separated list of integers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"detail": "ids is required (use ?ids=1,2,3)"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > RATING_SUMMARY_BATCH_LIMIT:
+            return Response({"detail": f"At most {RATING_SUMMARY_BATCH_LIMIT} ids per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        stats = ProductRatingStats.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in stats]
+        existing = set(Product.objects.filter(pk__in=missing).values_list('pk', flat=True)) if missing else set()
+        results = [
+            rating_summary(stats.get(pk), pk)
+            for pk in ids if pk in stats or pk in existing
+        ]
+        return Response({
+            'results': results,
+            'not_found': [pk for pk in missing if pk not in existing],
+        })
+
+    @action(detail=True, methods=['get'], url_path='unique-viewers')
+    def unique_viewers(self, request, pk=None):
+        """
+        Estimated number of distinct viewers across all of a product's reviews
+        (their sketches merged, so a reader of several reviews counts once).
+        """
+        product = self.get_object()
+        count, exact = unique_viewers(product.reviews.values('pk'))
+        return Response({'product_id': product.pk, 'unique_viewers': count, 'exact': exact})
+
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def activity(self, request, pk=None):
+        """
+        Views, helpful votes (interactions), comments and new reviews of a product per
+        hour or day, read from the activity rollups only (see rollups.py).
+        ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive, default: the last 7 days)
+        &granularity=day|hour (hourly only within the rollup retention window).
+        """
+        product = self.get_object()
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in ACTIVITY_MAX_DAYS:
+            return Response({"detail": 'granularity must be "day" or "hour"'}, status=status.HTTP_400_BAD_REQUEST)
+        today = timezone.now().date()
+        try:
+            end = date.fromisoformat(request.query_params.get('end', today.isoformat()))
+            start = date.fromisoformat(request.query_params.get('start', (end - timedelta(days=6)).isoformat()))
+        except ValueError:
+            return Response({"detail": "start and end must be dates (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"detail": "start must not be after end"}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days + 1 > ACTIVITY_MAX_DAYS[granularity]:
+            return Response({"detail": f"At most {ACTIVITY_MAX_DAYS[granularity]} days per request "
+                                       f"with granularity={granularity}"}, status=status.HTTP_400_BAD_REQUEST)
+        # الصفوف الساعية تُحذف بعد retention_days() يومًا (expire_hours)، فلا نعيد أصفارًا مكانها
+        oldest_hour = today - timedelta(days=retention_days())
+        if granularity == 'hour' and start < oldest_hour:
+            return Response({"detail": f"Hourly activity is kept for {retention_days()} days "
+                                       f"(start must be {oldest_hour.isoformat()} or later); use granularity=day"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        series, totals = product_activity(product.pk, start, end, granularity)
+        return Response({
+            'product_id': product.pk,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'totals': totals,
+            'series': series,
+        })
+
+    @action(detail=True, methods=['get'],
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer])
+    @conditional_get(product_version)
     def reviews(self, request, pk=None):
-        """Get all visible reviews for a product."""
+        """
+        Get all visible reviews for a product (ETag / 304 from the product version).
+        ?format=columnar returns the page as one array per field (see columnar.py).
+        """
         product = self.get_object()
-        reviews = product.reviews.filter(visible=True)\
-            .select_related('user')\
-            .prefetch_related('interactions', 'votes', 'comments')\
-            .order_by('-created_at')
-        
-        serializer = ReviewSerializer(reviews, many=True, context={'request': request})
-        return Response(serializer.data)
+        # ProductViewSet itself is not paginated, so the paginator is used directly here
+        paginator = KeysetPagination()
+        if request.accepted_renderer.format == ColumnarRenderer.format:
+            return columnar_response(request, product.reviews.filter(visible=True), paginator, self)
+
+        reviews = only_rendered_columns(request, product.reviews.filter(visible=True))
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        serializer = ReviewSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ReviewCommentViewSet(viewsets.ModelViewSet):
     """ViewSet for managing review comments."""
-    queryset = ReviewComment.objects.select_related('user', 'review').order_by('-created_at')
+    queryset = ReviewComment.objects.select_related('user', 'review').order_by('-created_at', '-id')
     serializer_class = ReviewCommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
         """Set the user when creating a comment."""
@@ -453,7 +757,7 @@ class ReviewCommentViewSet(viewsets.ModelViewSet):
 
 class ReviewVoteViewSet(viewsets.ModelViewSet):
     """ViewSet for managing review votes."""
-    queryset = ReviewVote.objects.select_related('user', 'review').order_by('-created_at')
+    queryset = ReviewInteraction.objects.select_related('user', 'review').order_by('-created_at')
     serializer_class = ReviewVoteSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
 
@@ -517,42 +821,89 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
 # =============================================================================
 
 # task8 analytics section (sabah aljajeh)
+def analytics_start(days):
+    # الفترة أيام كاملة (UTC) تنتهي اليوم: نفس الرد (ونفس الـ ETag) طوال اليوم
+    return timezone.now().date() - timedelta(days=days - 1)
+
+
+def analytics_window_key(request):
+    try:
+        return analytics_start(int(request.query_params.get('days', 30))).isoformat()
+    except (TypeError, ValueError, OverflowError):
+        return ''
+
+
+def average_rating(count, rating_sum):
+    return round(rating_sum / count, 2) if count else 0
+
+
 class ProductAnalyticsView(APIView):
     """معدل التقييم خلال فترة"""
     permission_classes = [AllowAny]
 
+    # الرد يتغير أيضًا مع مرور الوقت (مراجعات تخرج من الفترة)، لذلك ETag فقط بدون Last-Modified
+    @conditional_get(product_version, extra=analytics_window_key, last_modified=False)
+    @cached_response('product_analytics', tags=lambda kwargs: product_tags([kwargs['pk']]),
+                     params={'days': '30', 'include': ''}, extra=analytics_window_key)
     def get(self, request, pk):
+        """
+        Average rating and number of visible reviews written in the last ?days=
+        UTC days (today included), summed from at most that many
+        ReviewDailyStats rows (daily_stats.py).  ?include=series,sentiment adds
+        the per-day series and the positive/neutral/negative mix, read from the
+        same rows.
+        """
         try:
             product = Product.objects.get(pk=pk)
         except Product.DoesNotExist:
             return Response({'detail': 'Product not found'}, status=404)
 
-        days = int(request.query_params.get('days', 30))
-        since_date = timezone.now() - timedelta(days=days)
-
-        reviews = Review.objects.filter(
-            product=product, 
-            created_at__gte=since_date, 
-            visible=True
-        )
-        avg_rating = reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-        total_reviews = reviews.count()
-
-        return Response({
+        try:
+            days = int(request.query_params.get('days', 30))
+            start = analytics_start(days)
+        except (ValueError, OverflowError):
+            return Response({'detail': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        include = {part.strip() for part in request.query_params.get('include', '').split(',') if part.strip()}
+        if include - ANALYTICS_INCLUDES:
+            return Response({'detail': f"include must be a comma-separated subset of "
+                                       f"{', '.join(sorted(ANALYTICS_INCLUDES))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if 'series' in include and days > ACTIVITY_MAX_DAYS['day']:
+            return Response({'detail': f"At most {ACTIVITY_MAX_DAYS['day']} days with include=series"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        end = timezone.now().date()
+        by_day = daily_stats(product.pk, start, end)
+        totals = {field: sum(row[field] for row in by_day.values()) for field in STAT_FIELDS}
+
+        data = {
             'product': product.name,
-            'average_rating_last_days': round(avg_rating, 2),
-            'review_count_last_days': total_reviews,
+            'average_rating_last_days': average_rating(totals['count'], totals['rating_sum']),
+            'review_count_last_days': totals['count'],
             'period_days': days
-        })
+        }
+        if 'sentiment' in include:
+            data['sentiment'] = {field: totals[field] for field in SENTIMENT_FIELDS.values()}
+        if 'series' in include:
+            data['series'] = []
+            for offset in range(max(days, 0)):
+                day = start + timedelta(days=offset)
+                row = by_day.get(day, dict.fromkeys(STAT_FIELDS, 0))
+                data['series'].append({
+                    'date': day,
+                    'review_count': row['count'],
+                    'average_rating': average_rating(row['count'], row['rating_sum']),
+                    **{field: row[field] for field in SENTIMENT_FIELDS.values()},
+                })
+        return Response(data)
 
 
 class TopReviewersView(APIView):
     """عرض قائمة بأكثر المستخدمين نشاطًا (مرتّبين حسب عدد المراجعات المكتوبة)."""
     permission_classes = [AllowAny]
 
-    def get(self, request):
-        limit = int(request.query_params.get('limit', 10))
-        
+    @cached_response('top_reviewers', tags=['reviews'], clean=top_reviewers_params)
+    def get(self, request, limit):
         top_users = User.objects.annotate(
             review_count=Count('review', filter=Q(review__visible=True))
         ).filter(review_count__gt=0).order_by('-review_count')[:limit]
@@ -568,9 +919,8 @@ class TopRatedProductsView(APIView):
     """عرض قائمة المنتجات اللي حصلت على أعلى معدل تقييم خلال فترة زمنية (مثلاً آخر 30 يوم)."""
     permission_classes = [AllowAny]
 
-    def get(self, request):
-        days = int(request.query_params.get('days', 30))
-        limit = int(request.query_params.get('limit', 10))
+    @cached_response('top_rated_products', tags=['reviews', 'products'], clean=top_products_params)
+    def get(self, request, days, limit):
         since = timezone.now() - timedelta(days=days)
 
         top_products = Product.objects.annotate(
@@ -600,8 +950,8 @@ class KeywordSearchReviewsView(APIView):
     """يرجع مراجعات تحتوي كلمات أو جمل معيّنة (مثل "سيء", "ممتاز", "سعر")."""
     permission_classes = [AllowAny]
 
-    def get(self, request):
-        keyword = request.query_params.get('q', '').strip()
+    @cached_response('keyword_search', tags=['reviews', 'products'], clean=keyword_search_params, ttl=120)
+    def get(self, request, keyword, limit):
         if not keyword:
             return Response(
                 {"detail": "Keyword is required (use ?q=...)"}, 
@@ -614,7 +964,6 @@ class KeywordSearchReviewsView(APIView):
         ).select_related('product', 'user').order_by('-created_at')
 
         # Add pagination support
-        limit = int(request.query_params.get('limit', 50))
         matching_reviews = matching_reviews[:limit]
 
         result = [
@@ -642,10 +991,10 @@ class BannedWordsReviewsView(APIView):
         Returns reviews that contain banned words.
         Optional query parameters:
         - severity: Filter by banned word severity (1, 2, or 3)
+        - min_severity: Only reviews whose worst banned word is at least this severe
         - days: Filter reviews from the last X days
         """
         days = request.query_params.get('days')
-        severity = request.query_params.get('severity')
         
         reviews = Review.objects.filter(contains_banned_words=True)\
             .select_related('user', 'product')
@@ -661,30 +1010,9 @@ class BannedWordsReviewsView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        if severity:
-            try:
-                severity = int(severity)
-                if severity in [1, 2, 3]:
-                    # Get all banned words with the specified severity
-                    banned_words = BannedWord.objects.filter(severity=severity)\
-                        .values_list('word', flat=True)
-                    
-                    # Filter reviews that contain any of these words
-                    q_objects = Q()
-                    for word in banned_words:
-                        q_objects |= Q(review_text__icontains=word)
-                    
-                    reviews = reviews.filter(q_objects)
-                else:
-                    return Response(
-                        {"detail": "Severity must be 1, 2, or 3"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except ValueError:
-                return Response(
-                    {"detail": "Invalid severity parameter"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        reviews, error = filter_by_banned_word_severity(reviews, request.query_params)
+        if error:
+            return error
         
         result = []
         for review in reviews:
@@ -723,12 +1051,56 @@ class ReviewApproveView(APIView):
             )
         
         review.visible = bool(visible)
-        review.save()
+        review.moderated_at = timezone.now()
+        review.save(update_fields=['visible', 'moderated_at'])
         
         action = "approved" if review.visible else "disapproved"
         return Response({"detail": f"Review {action}"}, status=200)
 
 
+SENTIMENT_BATCH_LIMIT = 1000
+
+
+class SentimentScoreView(APIView):
+    """
+    Score arbitrary texts with the same rules as ``Review.save()``.
+    Body: {"texts": [...], "backend": "textblob" | "lexicon" (optional)}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"detail": 'Body must be an object: {"texts": [...], "backend": ...}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        texts = request.data.get('texts')
+        backend = request.data.get('backend')
+
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return Response(
+                {"detail": "texts must be a non-empty list of strings"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(texts) > SENTIMENT_BATCH_LIMIT:
+            return Response(
+                {"detail": f"At most {SENTIMENT_BATCH_LIMIT} texts per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if backend is not None and (not isinstance(backend, str) or backend not in BACKENDS):
+            return Response(
+                {"detail": f"backend must be one of: {', '.join(BACKENDS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        backend = get_sentiment_backend(backend)
+        results = [
+            {"score": polarity, "label": label}
+            for label, polarity in score_texts(texts, backend)
+        ]
+        return Response({"backend": backend.name, "results": results})
+
+
 class RegisterView(generics.CreateAPIView):
     """API endpoint for user registration."""
     serializer_class = RegisterSerializer
@@ -745,10 +1117,7 @@ def home(request):
     task 10 sabah ( index,html)
     """
     # استعلام جلب المنتجات مع البحث والترتيب
-    products = Product.objects.annotate(
-        average_rating=Avg('reviews__rating', filter=Q(reviews__visible=True)),
-        reviews_count=Count('reviews', filter=Q(reviews__visible=True))
-    )
+    products = with_rating_stats(Product.objects.all())  # من جدول ProductRatingStats بدل Avg/Count
 
     # 🔍 فلترة حسب الاسم
     search_query = request.GET.get('search', '').strip()
@@ -762,9 +1131,9 @@ def home(request):
     elif sort_by == 'price_desc':
         products = products.order_by('-price')
     elif sort_by == 'rating':
-        products = products.order_by('-average_rating')
+        products = products.order_by('-rating_stats__average_rating', '-id')
     elif sort_by == 'reviews':
-        products = products.order_by('-reviews_count')
+        products = products.order_by('-rating_stats__review_count', '-id')
     else:
         products = products.order_by('-id')  # Default to newest products
 
@@ -794,7 +1163,7 @@ def product_detail_view(request, pk=None, product_id=None):
     """Product detail view with reviews and all necessary context"""
     # Handle both pk and product_id parameter names
     product_id = pk or product_id
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(with_rating_stats(Product.objects.all()), id=product_id)
     
     # Get reviews with filtering and sorting
     reviews = Review.objects.filter(product=product).select_related('user')
@@ -815,16 +1184,19 @@ def product_detail_view(request, pk=None, product_id=None):
     elif sort_by == 'lowest':
         reviews = reviews.order_by('rating')
     elif sort_by == 'helpful':
-        # This requires the helpful_users field
-        reviews = reviews.annotate(
-            helpful_count=models.Count('helpful_users')
-        ).order_by('-helpful_count')
+        # درجة Wilson المخزّنة (counters.py)، بنفس ترتيب فهرس (product, -helpfulness_score, -id)
+        reviews = reviews.order_by(*REVIEW_SORTS['most_helpful'])
     
     # Pagination
     from django.core.paginator import Paginator
     paginator = Paginator(reviews, 10)  # 10 reviews per page
     page_number = request.GET.get('page')
     reviews = paginator.get_page(page_number)
+    # صوت المستخدم الحالي على مراجعات الصفحة (استعلام واحد) لتمييز الزر المضغوط
+    reviews.object_list = list(reviews.object_list)
+    votes = user_votes(request.user, [review.pk for review in reviews.object_list])
+    for review in reviews.object_list:
+        review.user_vote = votes.get(review.pk)
     
     # Check if user has already reviewed this product
     user_has_reviewed = False
@@ -1035,49 +1407,26 @@ def review_helpful(request, review_id):
             messages.error(request, 'لا يمكنك التصويت على مراجعتك الخاصة')
             return redirect('product-detail', pk=review.product.id)
         
-        # You'll need to add these fields to your Review model:
-        # helpful_users = models.ManyToManyField(User, related_name='helpful_reviews', blank=True)
-        # unhelpful_users = models.ManyToManyField(User, related_name='unhelpful_reviews', blank=True)
-        
-        if action == 'helpful':
-            # Remove from unhelpful if exists
-            if hasattr(review, 'unhelpful_users') and request.user in review.unhelpful_users.all():
-                review.unhelpful_users.remove(request.user)
-            
-            # Toggle helpful vote
-            if hasattr(review, 'helpful_users'):
-                if request.user in review.helpful_users.all():
-                    review.helpful_users.remove(request.user)
-                    messages.info(request, 'تم إلغاء تصويتك')
-                else:
-                    review.helpful_users.add(request.user)
-                    messages.success(request, 'شكراً لك على التصويت!')
-        
-        elif action == 'unhelpful':
-            # Remove from helpful if exists
-            if hasattr(review, 'helpful_users') and request.user in review.helpful_users.all():
-                review.helpful_users.remove(request.user)
-            
-            # Toggle unhelpful vote
-            if hasattr(review, 'unhelpful_users'):
-                if request.user in review.unhelpful_users.all():
-                    review.unhelpful_users.remove(request.user)
-                    messages.info(request, 'تم إلغاء تصويتك')
-                else:
-                    review.unhelpful_users.add(request.user)
-                    messages.info(request, 'تم تسجيل رأيك')
+        if action in ('helpful', 'unhelpful'):
+            # الضغط على نفس الزر مرة ثانية يلغي الصوت، والزر الآخر يبدّله (votes.py)
+            vote = toggle_vote(review.pk, request.user.pk, action == 'helpful')
+            if vote is None:
+                messages.info(request, 'تم إلغاء تصويتك')
+            elif vote:
+                messages.success(request, 'شكراً لك على التصويت!')
+            else:
+                messages.info(request, 'تم تسجيل رأيك')
         
         # If this is an AJAX request, return JSON response
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            helpful_count = review.helpful_users.count() if hasattr(review, 'helpful_users') else 0
-            unhelpful_count = review.unhelpful_users.count() if hasattr(review, 'unhelpful_users') else 0
-            
+            counts = Review.objects.filter(pk=review.pk).values('helpful_count', 'unhelpful_count').get()
+            vote = user_votes(request.user, [review.pk]).get(review.pk)
             return JsonResponse({
                 'success': True,
-                'helpful_count': helpful_count,
-                'unhelpful_count': unhelpful_count,
-                'user_voted_helpful': request.user in review.helpful_users.all() if hasattr(review, 'helpful_users') else False,
-                'user_voted_unhelpful': request.user in review.unhelpful_users.all() if hasattr(review, 'unhelpful_users') else False,
+                'helpful_count': counts['helpful_count'],
+                'unhelpful_count': counts['unhelpful_count'],
+                'user_voted_helpful': vote is True,
+                'user_voted_unhelpful': vote is False,
             })
         
         return redirect('product-detail', pk=review.product.id)
@@ -1420,6 +1769,10 @@ def admin_dashboard(request):
         'total_reports': ReviewReport.objects.count(),
         'total_banned_words': BannedWord.objects.count(),
     }
+    # عدّادات كاش تحليل المشاعر في هذه العملية (hits / misses)
+    sentiment_cache = sentiment_cache_info()
+    # عدّادات كاش ردود التحليلات العامة (hits / misses / bypasses لكل view)
+    response_cache = response_cache_info()
     
     # Recent activity
     recent_reviews = Review.objects.select_related('user', 'product')\
@@ -1431,6 +1784,8 @@ def admin_dashboard(request):
         'stats': stats,
         'recent_reviews': recent_reviews,
         'recent_reports': recent_reports,
+        'sentiment_cache': sentiment_cache,
+        'response_cache': response_cache,
     }
     
     return render(request, 'admin_dashboard.html', context)
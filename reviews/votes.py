@@ -0,0 +1,135 @@
+"""
+The helpful-vote store.
+
+"Helpful / not helpful" used to be recorded in three places: ``ReviewVote``
+(the ``vote`` action), ``ReviewInteraction`` (``interact``) and the
+``helpful_users`` / ``unhelpful_users`` M2M fields (the web
+``review_helpful`` view).  They are now all rows of ``ReviewInteraction``,
+at most one per (review, user), indexed by review (the unique constraint)
+and by user, and every endpoint writes them through this module:
+
+* ``cast_vote`` is an ``INSERT ... ON CONFLICT (review_id, user_id) DO
+  NOTHING`` (a new vote is that one statement; nothing is read first, so two
+  concurrent clicks can neither create two rows nor fail on the unique
+  constraint), followed for an existing vote by a conditional ``UPDATE``
+  that only switches a different vote;
+* ``retract_vote`` / ``toggle_vote`` remove a vote with one ``DELETE ...
+  RETURNING``.
+
+These statements bypass model signals, so they apply the side effects of
+the ``ReviewInteraction`` signal handlers themselves: the review counters
+(``adjust_counters``), the product version (ETags) and the ``interactions``
+response-cache tag.
+"""
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .counters import adjust_counters, helpful_deltas
+from .response_cache import invalidate_tags
+from .versions import bump_review_products
+
+
+def _table():
+    from .models import ReviewInteraction
+
+    return connection.ops.quote_name(ReviewInteraction._meta.db_table)
+
+
+def _vote_changed(review_id, **deltas):
+    adjust_counters(review_id, **deltas)
+    bump_review_products([review_id])
+    invalidate_tags('interactions')
+
+
+def cast_vote(review_id, user_id, helpful):
+    """
+    Record ``user_id``'s vote on a review (insert, or switch an existing
+    vote).  Returns ``(vote, created, changed)`` where ``vote`` is the
+    ``ReviewInteraction`` as stored (built from ``RETURNING``, not re-read);
+    re-sending the same vote is a no-op ``(vote, False, False)``.
+    """
+    from .models import ReviewInteraction
+
+    helpful = bool(helpful)
+    table = _table()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # الإدراج لا يعيد صفًا عند التعارض، فنعرف هل أُنشئ الصوت من عدد الصفوف المعادة
+            cursor.execute(
+                f"INSERT INTO {table} (review_id, user_id, helpful, created_at) VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (review_id, user_id) DO NOTHING RETURNING id, created_at",
+                [review_id, user_id, helpful, connection.ops.adapt_datetimefield_value(timezone.now())],
+            )
+            row = cursor.fetchone()
+            created = changed = row is not None
+            if not created:
+                cursor.execute(
+                    f"UPDATE {table} SET helpful = %s WHERE review_id = %s AND user_id = %s AND helpful <> %s "
+                    f"RETURNING id, created_at",
+                    [helpful, review_id, user_id, helpful],
+                )
+                row = cursor.fetchone()
+                changed = row is not None
+            if row is None:
+                cursor.execute(f"SELECT id, created_at FROM {table} WHERE review_id = %s AND user_id = %s",
+                               [review_id, user_id])
+                row = cursor.fetchone()
+        if created:
+            _vote_changed(review_id, interaction_count=1, **helpful_deltas(helpful))
+        elif changed:
+            _vote_changed(review_id, **helpful_deltas(not helpful, -1), **helpful_deltas(helpful))
+    vote_id, created_at = row
+    created_at = ReviewInteraction._meta.get_field('created_at').to_python(created_at)
+    if settings.USE_TZ and timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at, dt_timezone.utc)
+    vote = ReviewInteraction(pk=vote_id, review_id=review_id, user_id=user_id, helpful=helpful, created_at=created_at)
+    return vote, created, changed
+
+
+def _delete_vote(review_id, user_id, helpful=None):
+    sql = f"DELETE FROM {_table()} WHERE review_id = %s AND user_id = %s"
+    params = [review_id, user_id]
+    if helpful is not None:
+        sql += " AND helpful = %s"
+        params.append(bool(helpful))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql + " RETURNING helpful", params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        previous = bool(row[0])
+        _vote_changed(review_id, interaction_count=-1, **helpful_deltas(previous, -1))
+    return previous
+
+
+def retract_vote(review_id, user_id):
+    """Remove ``user_id``'s vote on a review; returns the removed vote (``None`` if there was none)."""
+    return _delete_vote(review_id, user_id)
+
+
+def toggle_vote(review_id, user_id, helpful):
+    """
+    The web buttons: clicking the current vote again removes it, anything
+    else casts ``helpful``.  Returns the user's vote afterwards
+    (``True`` / ``False`` / ``None``).
+    """
+    with transaction.atomic():
+        if _delete_vote(review_id, user_id, helpful) is not None:
+            return None
+        cast_vote(review_id, user_id, helpful)
+    return bool(helpful)
+
+
+def user_votes(user, review_ids):
+    """``{review_id: helpful}`` of ``user`` for ``review_ids`` (one query on the user index)."""
+    from .models import ReviewInteraction
+
+    if user is None or not user.is_authenticated or not review_ids:
+        return {}
+    return dict(
+        ReviewInteraction.objects.filter(user=user, review_id__in=list(review_ids)).values_list('review_id', 'helpful')
+    )
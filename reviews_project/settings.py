@@ -136,6 +136,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson based JSON (falls back to the stock classes if orjson is missing)
+    'DEFAULT_RENDERER_CLASSES': [
+        'reviews.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'reviews.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -144,4 +154,38 @@ SIMPLE_JWT = {
 }
 
 LOGIN_REDIRECT_URL = '/'
-LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'
+
+# Each process re-reads the banned-word list version at most this often, so a
+# change made by another process is picked up within this many seconds
+# (reviews/moderation.py).
+REVIEWS_BANNED_WORDS_RECHECK_SECONDS = 5
+# Sentiment analysis runs in a background worker ('queue', see
+# `python manage.py process_sentiment_queue`) or inline on save ('sync').
+REVIEWS_SENTIMENT_MODE = 'queue'
+# Max number of polarity scores kept per process (keyed by a hash of the text).
+REVIEWS_SENTIMENT_CACHE_SIZE = 10000
+# Scorer used for review sentiment: 'textblob' (default) or 'lexicon' (NumPy batch scorer).
+REVIEWS_SENTIMENT_BACKEND = 'textblob'
+# Cursor pagination of review/comment lists: default and maximum ?page_size=.
+REVIEWS_PAGE_SIZE = 50
+REVIEWS_MAX_PAGE_SIZE = 200
+# Cache alias (local-memory or file-based both work) and TTL in seconds for the
+# public analytics responses (reviews/response_cache.py).
+REVIEWS_RESPONSE_CACHE = 'default'
+REVIEWS_RESPONSE_CACHE_TTL = 300
+# Review views are buffered per process and written in batches when this many
+# are pending or this many seconds have passed, by a background thread
+# (reviews/view_counter.py).
+REVIEWS_VIEW_FLUSH_THRESHOLD = 500
+REVIEWS_VIEW_FLUSH_INTERVAL = 10
+REVIEWS_VIEW_BACKGROUND_FLUSH = True
+# Unique viewers per review are kept exactly up to this many viewers, then as a
+# 4 KB HyperLogLog sketch (reviews/hll.py).
+REVIEWS_HLL_EXACT_THRESHOLD = 512
+# Hourly activity rollups older than this many days are deleted once compacted
+# into daily rows (`python manage.py rollup_activity`, reviews/rollups.py).
+REVIEWS_ROLLUP_RETENTION_DAYS = 7
+# Number of reviews kept on each top-review leaderboard (global and per product);
+# also the largest ?k= of /api/reviews/top-review/ (reviews/leaderboard.py).
+REVIEWS_LEADERBOARD_SIZE = 10